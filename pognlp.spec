@@ -7,7 +7,7 @@ block_cipher = None
 
 a = Analysis(['pognlp/pognlp.py'],
              binaries=[],
-             datas=[],
+             datas=[('pognlp/data', 'pognlp/data')],
              hiddenimports=[
                     'srsly.msgpack.util',
                     'cymem.cymem',
@@ -1,11 +1,23 @@
 """Set up sentiment intensity analysis using VADER"""
 
+import math
 from collections import namedtuple
-from typing import Dict, Generator, Union
+from typing import Dict, Generator, List, Mapping, Sequence, Union
 
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+from vaderSentiment.vaderSentiment import (
+    BOOSTER_DICT,
+    C_INCR,
+    N_SCALAR,
+    NEGATE,
+    SPECIAL_CASES,
+    SentimentIntensityAnalyzer,
+    SentiText,
+    normalize,
+    scalar_inc_dec,
+)
 
-from pognlp.vader_lexicon import VADER_LEXICON
+from pognlp.compact_lexicon import default_lexicon
+from pognlp.lexicon_cache import content_hash, lexicon_cache
 from pognlp.model.lexicon import DefaultLexicon, Lexicon
 
 AnalysisResult = namedtuple("AnalysisResult", ["document", "score"])
@@ -16,20 +28,220 @@ AnalysisResult = namedtuple("AnalysisResult", ["document", "score"])
 # pylint: disable=too-few-public-methods
 class CustomSentimentIntensityAnalyzer(SentimentIntensityAnalyzer):
     """
-    Sentiment analyzer with a custom lexicon. `lexicon_file_contents` contains
-    the text of a TSV file in the VADER format, i.e:
+    Sentiment analyzer with a custom lexicon. `lexicon` maps words to their
+    valences, see compile_lexicon.
+    """
+
+    def __init__(self, lexicon: Mapping[str, float]):
+        self.lexicon = lexicon
+
+        self.emojis: Dict[str, str] = {}
+
+
+NEGATE_WORDS = set(NEGATE)
 
-    word1\tscore1
-    word2\tscore2
-    ...
+# Lexicon index -> valence of a word in each lexicon containing it
+LexiconEntries = Dict[int, float]
 
+NO_ENTRIES: LexiconEntries = {}
+
+
+class MultiLexiconSentimentIntensityAnalyzer(CustomSentimentIntensityAnalyzer):
     """
+    Scores text with several lexica at once. Only lexicon lookups differ
+    between lexica, so each text is tokenized, and its capitalization,
+    negations, boosters and punctuation emphasis are found, just once.
+    Scores are identical to those of a CustomSentimentIntensityAnalyzer for
+    each lexicon.
 
-    def __init__(self, lexicon_file_contents: str):
-        self.lexicon_full_filepath = lexicon_file_contents
-        self.lexicon = self.make_lex_dict()
+    This mirrors SentimentIntensityAnalyzer.polarity_scores step by step;
+    keep it in sync when upgrading vaderSentiment.
+    """
 
-        self.emojis: Dict[str, str] = {}
+    def __init__(self, lexica: Dict[str, Mapping[str, float]]):
+        self.lexicon_names = list(lexica)
+        self.lexica = list(lexica.values())
+        self.emojis = {}
+
+        # Word -> its valence in each lexicon, so a token needs one lookup
+        self.entries: Dict[str, LexiconEntries] = {}
+        for index, lexicon in enumerate(self.lexica):
+            for word, valence in lexicon.items():
+                self.entries.setdefault(word, {})[index] = valence
+
+    def polarity_scores_multi(self, text: str) -> Dict[str, Dict[str, float]]:
+        """Return VADER's scores of the text for each lexicon, by name"""
+        # There are no emojis to replace, which leaves just the stripping
+        text = text.strip()
+        sentitext = SentiText(text)
+        words = sentitext.words_and_emoticons
+        lower = [str(word).lower() for word in words]
+        entries = [self.entries.get(word, NO_ENTRIES) for word in lower]
+        punct_emph_amplifier = self._punctuation_emphasis(text)
+
+        hits: List[List[int]] = [[] for _ in self.lexica]
+        for i, word_entries in enumerate(entries):
+            if not word_entries or lower[i] in BOOSTER_DICT:
+                continue
+            if i < len(lower) - 1 and lower[i] == "kind" and lower[i + 1] == "of":
+                continue
+            for index in word_entries:
+                hits[index].append(i)
+
+        scores = {}
+        for index, name in enumerate(self.lexicon_names):
+            sentiments: List[float] = [0.0] * len(words)
+            for i in hits[index]:
+                sentiments[i] = self._lexicon_valence(
+                    index, words, lower, entries, i, sentitext.is_cap_diff
+                )
+            if "but" in lower:
+                sentiments = self._but_check(words, sentiments)
+            scores[name] = self._score_sentiments(sentiments, punct_emph_amplifier)
+        return scores
+
+    def _lexicon_valence(
+        self,
+        index: int,
+        words: Sequence[str],
+        lower: Sequence[str],
+        entries: Sequence[LexiconEntries],
+        i: int,
+        is_cap_diff: bool,
+    ) -> float:
+        """SentimentIntensityAnalyzer.sentiment_valence for a word found in
+        lexicon number `index`"""
+        item_lowercase = lower[i]
+        valence = entries[i][index]
+
+        if item_lowercase == "no" and i != len(words) - 1 and index in entries[i + 1]:
+            valence = 0.0
+        if (
+            (i > 0 and lower[i - 1] == "no")
+            or (i > 1 and lower[i - 2] == "no")
+            or (i > 2 and lower[i - 3] == "no" and lower[i - 1] in ["or", "nor"])
+        ):
+            valence = entries[i][index] * N_SCALAR
+
+        if words[i].isupper() and is_cap_diff:
+            if valence > 0:
+                valence += C_INCR
+            else:
+                valence -= C_INCR
+
+        for start_i in range(0, 3):
+            if i > start_i and index not in entries[i - (start_i + 1)]:
+                scalar = scalar_inc_dec(words[i - (start_i + 1)], valence, is_cap_diff)
+                if start_i == 1 and scalar != 0:
+                    scalar = scalar * 0.95
+                if start_i == 2 and scalar != 0:
+                    scalar = scalar * 0.9
+                valence = valence + scalar
+                valence = negation_check(valence, lower, start_i, i)
+                if start_i == 2:
+                    valence = special_idioms_check(valence, lower, i)
+
+        # _least_check
+        if i > 1 and index not in entries[i - 1] and lower[i - 1] == "least":
+            if lower[i - 2] != "at" and lower[i - 2] != "very":
+                valence = valence * N_SCALAR
+        elif i > 0 and index not in entries[i - 1] and lower[i - 1] == "least":
+            valence = valence * N_SCALAR
+        return valence
+
+    @staticmethod
+    def _score_sentiments(
+        sentiments: List[float], punct_emph_amplifier: float
+    ) -> Dict[str, float]:
+        """SentimentIntensityAnalyzer.score_valence with the punctuation
+        emphasis already computed"""
+        if not sentiments:
+            return {"neg": 0.0, "neu": 0.0, "pos": 0.0, "compound": 0.0}
+        sum_s = float(sum(sentiments))
+        if sum_s > 0:
+            sum_s += punct_emph_amplifier
+        elif sum_s < 0:
+            sum_s -= punct_emph_amplifier
+
+        compound = normalize(sum_s)
+        pos_sum, neg_sum, neu_count = SentimentIntensityAnalyzer._sift_sentiment_scores(
+            sentiments
+        )
+
+        if pos_sum > math.fabs(neg_sum):
+            pos_sum += punct_emph_amplifier
+        elif pos_sum < math.fabs(neg_sum):
+            neg_sum -= punct_emph_amplifier
+
+        total = pos_sum + math.fabs(neg_sum) + neu_count
+        return {
+            "neg": round(math.fabs(neg_sum / total), 3),
+            "neu": round(math.fabs(neu_count / total), 3),
+            "pos": round(math.fabs(pos_sum / total), 3),
+            "compound": round(compound, 4),
+        }
+
+
+def is_negation(word: str) -> bool:
+    """vaderSentiment.negated for a single lowercase word"""
+    return word in NEGATE_WORDS or "n't" in word
+
+
+def negation_check(valence: float, lower: Sequence[str], start_i: int, i: int) -> float:
+    """SentimentIntensityAnalyzer._negation_check on already-lowercased words"""
+    if start_i == 0:
+        if is_negation(lower[i - 1]):
+            valence = valence * N_SCALAR
+    if start_i == 1:
+        if lower[i - 2] == "never" and (lower[i - 1] == "so" or lower[i - 1] == "this"):
+            valence = valence * 1.25
+        elif lower[i - 2] == "without" and lower[i - 1] == "doubt":
+            pass
+        elif is_negation(lower[i - 2]):
+            valence = valence * N_SCALAR
+    if start_i == 2:
+        if (
+            lower[i - 3] == "never"
+            and (lower[i - 2] == "so" or lower[i - 2] == "this")
+            or (lower[i - 1] == "so" or lower[i - 1] == "this")
+        ):
+            valence = valence * 1.25
+        elif lower[i - 3] == "without" and (
+            lower[i - 2] == "doubt" or lower[i - 1] == "doubt"
+        ):
+            pass
+        elif is_negation(lower[i - 3]):
+            valence = valence * N_SCALAR
+    return valence
+
+
+def special_idioms_check(valence: float, lower: Sequence[str], i: int) -> float:
+    """SentimentIntensityAnalyzer._special_idioms_check on already-lowercased
+    words"""
+    onezero = f"{lower[i - 1]} {lower[i]}"
+    twoonezero = f"{lower[i - 2]} {lower[i - 1]} {lower[i]}"
+    twoone = f"{lower[i - 2]} {lower[i - 1]}"
+    threetwoone = f"{lower[i - 3]} {lower[i - 2]} {lower[i - 1]}"
+    threetwo = f"{lower[i - 3]} {lower[i - 2]}"
+
+    for sequence in [onezero, twoonezero, twoone, threetwoone, threetwo]:
+        if sequence in SPECIAL_CASES:
+            valence = SPECIAL_CASES[sequence]
+            break
+
+    if len(lower) - 1 > i:
+        zeroone = f"{lower[i]} {lower[i + 1]}"
+        if zeroone in SPECIAL_CASES:
+            valence = SPECIAL_CASES[zeroone]
+    if len(lower) - 1 > i + 1:
+        zeroonetwo = f"{lower[i]} {lower[i + 1]} {lower[i + 2]}"
+        if zeroonetwo in SPECIAL_CASES:
+            valence = SPECIAL_CASES[zeroonetwo]
+
+    for n_gram in [threetwoone, threetwo, twoone]:
+        if n_gram in BOOSTER_DICT:
+            valence = valence + BOOSTER_DICT[n_gram]
+    return valence
 
 
 def get_lexicon_file_lines(lexicon: Lexicon) -> Generator[str, None, None]:
@@ -43,13 +255,52 @@ def get_lexicon_file_lines(lexicon: Lexicon) -> Generator[str, None, None]:
         yield f"{string}\t{word.score}"
 
 
-def get_analyzer(lexicon: Union[Lexicon, DefaultLexicon]) -> SentimentIntensityAnalyzer:
-    """Given a lexicon, return a VADER SentimentIntensityAnalyzer instance that
-    analyzes documents using that lexicon"""
+def get_lexicon_file_contents(lexicon: Union[Lexicon, DefaultLexicon]) -> str:
+    """Get a lexicon as the text of a TSV file in the VADER format"""
+    if isinstance(lexicon, DefaultLexicon):
+        # Only imported when needed; it's a big string
+        # pylint: disable=import-outside-toplevel
+        from pognlp.vader_lexicon import VADER_LEXICON
+
+        return VADER_LEXICON
+    return "\n".join(get_lexicon_file_lines(lexicon))
+
+
+def parse_lexicon(lexicon_file_contents: str) -> Dict[str, float]:
+    """Parse the text of a lexicon TSV file into a dict of words to valences,
+    exactly like SentimentIntensityAnalyzer.make_lex_dict does"""
+    lexicon = {}
+    for line in lexicon_file_contents.rstrip("\n").split("\n"):
+        if not line:
+            continue
+        word, measure = line.strip().split("\t")[0:2]
+        lexicon[word] = float(measure)
+    return lexicon
 
+
+def compile_lexicon(lexicon: Union[Lexicon, DefaultLexicon]) -> Mapping[str, float]:
+    """Get a lexicon as a mapping of words to valences. The default lexicon is
+    prebuilt (see pognlp.compact_lexicon) and others are parsed once and
+    cached (see pognlp.lexicon_cache)."""
     if isinstance(lexicon, DefaultLexicon):
-        return CustomSentimentIntensityAnalyzer(VADER_LEXICON)
+        return default_lexicon()
+    contents = get_lexicon_file_contents(lexicon)
+    return lexicon_cache.get(contents, lambda: parse_lexicon(contents))
+
+
+def lexicon_content_hash(lexicon: Union[Lexicon, DefaultLexicon]) -> str:
+    """Hash of a lexicon's words and valences, which changes whenever the
+    lexicon is edited"""
+    if isinstance(lexicon, DefaultLexicon):
+        return default_lexicon().content_hash()
+    return content_hash(get_lexicon_file_contents(lexicon))
+
 
-    # turn the custom lexicon into a TSV and pass it to VADER
-    lexicon_file_contents = "\n".join(get_lexicon_file_lines(lexicon))
-    return CustomSentimentIntensityAnalyzer(lexicon_file_contents)
+def get_multi_analyzer(
+    lexica: Dict[str, Union[Lexicon, DefaultLexicon]],
+) -> MultiLexiconSentimentIntensityAnalyzer:
+    """Given lexica by name, return an analyzer that scores documents with
+    all of them in one pass"""
+    return MultiLexiconSentimentIntensityAnalyzer(
+        {name: compile_lexicon(lexicon) for name, lexicon in lexica.items()}
+    )
@@ -0,0 +1,466 @@
+"""Vectorized VADER scoring of batches of documents with NumPy
+
+Documents are tokenized the same way VADER tokenizes them, then flattened
+into one array of token IDs. Lexicon membership, valences and VADER's rules
+(negation, boosters, capitalization, idioms, "least" and "but") become array
+lookups and element-wise operations over all tokens and lexica of the batch,
+and the per-document sums are taken with np.bincount.
+
+Unrounded scores are computed with the same floating-point operations in
+the same order as SentimentIntensityAnalyzer.polarity_scores. The rounded
+scores can still differ by up to TOLERANCE, one unit in the last place:
+np.round can round a value that sits right on a rounding boundary
+differently than Python's round does.
+"""
+
+from typing import Dict, List, Mapping, Sequence, Tuple, Union
+
+import numpy as np
+from vaderSentiment.vaderSentiment import (
+    BOOSTER_DICT,
+    C_INCR,
+    N_SCALAR,
+    NEGATE,
+    SPECIAL_CASES,
+    SentimentIntensityAnalyzer,
+    SentiText,
+)
+
+from pognlp.analyze import compile_lexicon
+from pognlp.model.lexicon import DefaultLexicon, Lexicon
+
+# Order of the scores along the last axis of score_batch's result
+SCORE_FIELDS = ("pos", "neu", "neg", "compound")
+
+# Largest difference from VADER's scores, per field. See above.
+TOLERANCE = {"pos": 0.001, "neu": 0.001, "neg": 0.001, "compound": 0.0001}
+
+NEGATE_WORDS = set(NEGATE)
+
+# Words VADER's rules refer to by name
+RULE_WORDS = [
+    "no",
+    "or",
+    "nor",
+    "kind",
+    "of",
+    "least",
+    "at",
+    "very",
+    "never",
+    "so",
+    "this",
+    "without",
+    "doubt",
+    "but",
+]
+
+
+class BatchSentimentScorer:
+    """Scores batches of documents with several lexica at once"""
+
+    def __init__(self, lexica: Dict[str, Mapping[str, float]]):
+        self.lexicon_names = list(lexica)
+        self.lexica = list(lexica.values())
+
+        # Every (lowercase) word seen so far gets an ID, so that the
+        # properties of words are computed once and then looked up by ID
+        self.vocabulary: Dict[str, int] = {}
+        self.words: List[str] = []
+        self.in_lexicon = np.zeros((0, len(self.lexica)), dtype=bool)
+        self.valence = np.zeros((0, len(self.lexica)), dtype=np.float64)
+        self.booster = np.zeros(0, dtype=np.float64)
+        self.is_booster = np.zeros(0, dtype=bool)
+        self.is_negation = np.zeros(0, dtype=bool)
+
+        self.rule_ids = {word: self.word_id(word) for word in RULE_WORDS}
+        # Multi-word phrases as tuples of word IDs
+        self.special_cases = [
+            (tuple(self.word_id(word) for word in phrase.split()), value)
+            for phrase, value in SPECIAL_CASES.items()
+        ]
+        self.booster_phrases = [
+            (tuple(self.word_id(word) for word in phrase.split()), value)
+            for phrase, value in BOOSTER_DICT.items()
+            if " " in phrase
+        ]
+        self.update_word_properties()
+
+    def word_id(self, word: str) -> int:
+        """Get the ID of a lowercase word, adding it to the vocabulary if
+        it's new"""
+        word_id = self.vocabulary.get(word)
+        if word_id is None:
+            word_id = len(self.words)
+            self.vocabulary[word] = word_id
+            self.words.append(word)
+        return word_id
+
+    def update_word_properties(self) -> None:
+        """Compute the properties of words added to the vocabulary since the
+        last update"""
+        known = len(self.booster)
+        new_words = self.words[known:]
+        if not new_words:
+            return
+        in_lexicon = np.array(
+            [[word in lexicon for lexicon in self.lexica] for word in new_words],
+            dtype=bool,
+        ).reshape(len(new_words), len(self.lexica))
+        valence = np.array(
+            [[lexicon.get(word, 0.0) for lexicon in self.lexica] for word in new_words],
+            dtype=np.float64,
+        ).reshape(len(new_words), len(self.lexica))
+        self.in_lexicon = np.concatenate([self.in_lexicon, in_lexicon])
+        self.valence = np.concatenate([self.valence, valence])
+        self.booster = np.concatenate(
+            [self.booster, [BOOSTER_DICT.get(word, 0.0) for word in new_words]]
+        )
+        self.is_booster = np.concatenate(
+            [self.is_booster, [word in BOOSTER_DICT for word in new_words]]
+        )
+        self.is_negation = np.concatenate(
+            [
+                self.is_negation,
+                [word in NEGATE_WORDS or "n't" in word for word in new_words],
+            ]
+        )
+
+    def tokenize(
+        self, bodies: Sequence[str]
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Tokenize documents like VADER. Returns flat arrays of token IDs,
+        whether each token is all caps, and the document each token belongs
+        to, plus each document's punctuation emphasis."""
+        ids: List[int] = []
+        upper: List[bool] = []
+        lengths: List[int] = []
+        emphasis: List[float] = []
+        for body in bodies:
+            text = body.strip()
+            words = SentiText(text).words_and_emoticons
+            ids.extend(self.word_id(word.lower()) for word in words)
+            upper.extend(word.isupper() for word in words)
+            lengths.append(len(words))
+            emphasis.append(
+                SentimentIntensityAnalyzer._amplify_ep(text)
+                + SentimentIntensityAnalyzer._amplify_qm(text)
+            )
+        self.update_word_properties()
+        doc = np.repeat(np.arange(len(bodies)), lengths)
+        return (
+            np.array(ids, dtype=np.int64),
+            np.array(upper, dtype=bool),
+            doc,
+            np.array(emphasis, dtype=np.float64),
+        )
+
+    def score_batch(self, bodies: Sequence[str]) -> np.ndarray:
+        """Score documents with every lexicon. Returns an array of shape
+        (documents, lexica, 4) holding the scores in SCORE_FIELDS order."""
+        ids, upper, doc, emphasis = self.tokenize(bodies)
+        n_docs = len(bodies)
+        n_tokens = len(ids)
+        rule = self.rule_ids
+
+        # Position of each token within its document, and its document's length
+        lengths = np.bincount(doc, minlength=n_docs)
+        starts = np.concatenate([[0], np.cumsum(lengths)[:-1]]).astype(np.int64)
+        position = np.arange(n_tokens) - starts[doc]
+        length = lengths[doc]
+
+        def shifted(values: np.ndarray, offset: int, fill: int = -1) -> np.ndarray:
+            """values[t + offset] for each token t, or `fill` where that's
+            outside the token's document"""
+            result = np.full(n_tokens, fill, dtype=values.dtype)
+            target = position + offset
+            valid = (target >= 0) & (target < length)
+            result[valid] = values[np.flatnonzero(valid) + offset]
+            return result
+
+        # Word IDs of neighbouring tokens; -1 outside the document
+        prev = {k: shifted(ids, -k) for k in (1, 2, 3)}
+        following = {k: shifted(ids, k) for k in (1, 2)}
+        prev_upper = {k: shifted(upper, -k, False) for k in (1, 2, 3)}
+
+        # Word properties need a valid ID, so look up -1 as an ID that's
+        # then masked out
+        def lookup(table: np.ndarray, word_ids: np.ndarray) -> np.ndarray:
+            values: np.ndarray = table[np.maximum(word_ids, 0)]
+            return values
+
+        upper_count = np.bincount(doc, weights=upper, minlength=n_docs)
+        cap_differential = (lengths - upper_count > 0) & (
+            lengths - upper_count < lengths
+        )
+        is_cap_diff = cap_differential[doc]
+
+        # Tokens that are skipped rather than scored
+        skip = self.is_booster[ids] | (
+            (ids == rule["kind"]) & (following[1] == rule["of"])
+        )
+        hit = self.in_lexicon[ids] & ~skip[:, None]
+        base = self.valence[ids]
+        valence = base.copy()
+
+        # "no" before another lexicon word is neutral; words after "no" are
+        # negated
+        no_before_word = (ids == rule["no"])[:, None] & (
+            (following[1] >= 0)[:, None] & lookup(self.in_lexicon, following[1])
+        )
+        valence[no_before_word] = 0.0
+        after_no = (
+            (prev[1] == rule["no"])
+            | (prev[2] == rule["no"])
+            | (
+                (prev[3] == rule["no"])
+                & ((prev[1] == rule["or"]) | (prev[1] == rule["nor"]))
+            )
+        )
+        valence = np.where(after_no[:, None], base * N_SCALAR, valence)
+
+        capitalized = (upper & is_cap_diff)[:, None]
+        valence = np.where(
+            capitalized,
+            np.where(valence > 0, valence + C_INCR, valence - C_INCR),
+            valence,
+        )
+
+        negation_factors = self.negation_factors(prev)
+        idiom_first, idiom_next, idiom_next_two, booster_add = self.idioms(
+            ids, prev, following
+        )
+        for start_i, k in enumerate((1, 2, 3)):
+            applies = (prev[k] >= 0)[:, None] & ~lookup(self.in_lexicon, prev[k])
+
+            # scalar_inc_dec of the k-th preceding word
+            booster = lookup(self.booster, prev[k])[:, None]
+            scalar = np.where(valence < 0, -booster, booster)
+            capital_booster = (
+                lookup(self.is_booster, prev[k]) & prev_upper[k] & is_cap_diff
+            )
+            scalar = np.where(
+                capital_booster[:, None],
+                np.where(valence > 0, scalar + C_INCR, scalar - C_INCR),
+                scalar,
+            )
+            if start_i == 1:
+                scalar = np.where(scalar != 0, scalar * 0.95, scalar)
+            if start_i == 2:
+                scalar = np.where(scalar != 0, scalar * 0.9, scalar)
+
+            updated = (valence + scalar) * negation_factors[start_i][:, None]
+            if start_i == 2:
+                updated = np.where(
+                    np.isnan(idiom_first)[:, None], updated, idiom_first[:, None]
+                )
+                updated = np.where(
+                    np.isnan(idiom_next)[:, None], updated, idiom_next[:, None]
+                )
+                updated = np.where(
+                    np.isnan(idiom_next_two)[:, None], updated, idiom_next_two[:, None]
+                )
+                updated = np.where(
+                    (booster_add != 0)[:, None], updated + booster_add[:, None], updated
+                )
+            valence = np.where(applies, updated, valence)
+
+        # "least" negates, unless it's "at least" or "very least"
+        least = (
+            (prev[1] == rule["least"])[:, None]
+            & ~lookup(self.in_lexicon, prev[1])
+            & ((prev[2] != rule["at"]) & (prev[2] != rule["very"]))[:, None]
+        )
+        valence = np.where(least, valence * N_SCALAR, valence)
+
+        sentiments = np.where(hit, valence, 0.0)
+
+        # Sentiments before "but" count half, after it one and a half. VADER
+        # finds each sentiment with list.index, which scales the wrong one
+        # when an already-scaled sentiment equals a later one. To match it
+        # exactly, the (few) documents with "but" go through VADER's own code.
+        for index in np.unique(doc[ids == rule["but"]]):
+            start = starts[index]
+            stop = start + lengths[index]
+            words = [self.words[word_id] for word_id in ids[start:stop]]
+            for column in sentiments[start:stop].T:
+                column[:] = SentimentIntensityAnalyzer._but_check(
+                    words, column.tolist()
+                )
+
+        return self.aggregate(sentiments, doc, n_docs, emphasis, lengths)
+
+    def negation_factors(self, prev: Dict[int, np.ndarray]) -> List[np.ndarray]:
+        """The factor SentimentIntensityAnalyzer._negation_check multiplies
+        each token's valence by, for each start_i"""
+        rule = self.rule_ids
+
+        def negation(word_ids: np.ndarray) -> np.ndarray:
+            negations: np.ndarray = (word_ids >= 0) & self.is_negation[
+                np.maximum(word_ids, 0)
+            ]
+            return negations
+
+        def one_of(word_ids: np.ndarray, *words: str) -> np.ndarray:
+            return np.isin(word_ids, [rule[word] for word in words])
+
+        first = np.where(negation(prev[1]), N_SCALAR, 1.0)
+
+        never_so = (prev[2] == rule["never"]) & one_of(prev[1], "so", "this")
+        without_doubt = (prev[2] == rule["without"]) & (prev[1] == rule["doubt"])
+        second = np.where(
+            never_so,
+            1.25,
+            np.where(~without_doubt & negation(prev[2]), N_SCALAR, 1.0),
+        )
+
+        never_so = (
+            (prev[3] == rule["never"]) & one_of(prev[2], "so", "this")
+        ) | one_of(prev[1], "so", "this")
+        without_doubt = (prev[3] == rule["without"]) & (
+            (prev[2] == rule["doubt"]) | (prev[1] == rule["doubt"])
+        )
+        third = np.where(
+            never_so,
+            1.25,
+            np.where(~without_doubt & negation(prev[3]), N_SCALAR, 1.0),
+        )
+        return [first, second, third]
+
+    def idioms(
+        self,
+        ids: np.ndarray,
+        prev: Dict[int, np.ndarray],
+        following: Dict[int, np.ndarray],
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """What SentimentIntensityAnalyzer._special_idioms_check does to each
+        token's valence: the value of the first special case ending at or
+        just before the token, of a special case starting at the token (two
+        words, then three), each NaN if there's none, and the sum of
+        multi-word boosters just before the token"""
+        windows = {
+            # The token's offsets of each sequence VADER checks, in order
+            "onezero": (prev[1], ids),
+            "twoonezero": (prev[2], prev[1], ids),
+            "twoone": (prev[2], prev[1]),
+            "threetwoone": (prev[3], prev[2], prev[1]),
+            "threetwo": (prev[3], prev[2]),
+            "zeroone": (ids, following[1]),
+            "zeroonetwo": (ids, following[1], following[2]),
+        }
+
+        def phrase_values(
+            window: Tuple[np.ndarray, ...],
+            phrases: List[Tuple[Tuple[int, ...], float]],
+        ) -> np.ndarray:
+            values = np.full(len(ids), np.nan)
+            for phrase, value in phrases:
+                if len(phrase) != len(window):
+                    continue
+                matches = np.ones(len(ids), dtype=bool)
+                for word_ids, phrase_id in zip(window, phrase):
+                    matches &= word_ids == phrase_id
+                values[matches] = value
+            return values
+
+        first = np.full(len(ids), np.nan)
+        for name in ("onezero", "twoonezero", "twoone", "threetwoone", "threetwo"):
+            values = phrase_values(windows[name], self.special_cases)
+            first = np.where(np.isnan(first), values, first)
+        next_two = phrase_values(windows["zeroone"], self.special_cases)
+        next_three = phrase_values(windows["zeroonetwo"], self.special_cases)
+
+        booster_add = np.zeros(len(ids))
+        for name in ("threetwoone", "threetwo", "twoone"):
+            values = phrase_values(windows[name], self.booster_phrases)
+            booster_add += np.nan_to_num(values)
+        return first, next_two, next_three, booster_add
+
+    @staticmethod
+    def aggregate(
+        sentiments: np.ndarray,
+        doc: np.ndarray,
+        n_docs: int,
+        emphasis: np.ndarray,
+        lengths: np.ndarray,
+    ) -> np.ndarray:
+        """SentimentIntensityAnalyzer.score_valence for every document and
+        lexicon at once"""
+        n_lexica = sentiments.shape[1]
+        scores = np.zeros((n_docs, n_lexica, len(SCORE_FIELDS)))
+        emphasis = emphasis[:, None]
+        # np.bincount adds up each document's tokens in order, like VADER
+        sums = np.stack(
+            [
+                np.bincount(doc, weights=sentiments[:, index], minlength=n_docs)
+                for index in range(n_lexica)
+            ],
+            axis=1,
+        )
+        pos_sum = np.stack(
+            [
+                np.bincount(
+                    doc,
+                    weights=np.where(column > 0, column + 1, 0.0),
+                    minlength=n_docs,
+                )
+                for column in sentiments.T
+            ],
+            axis=1,
+        )
+        neg_sum = np.stack(
+            [
+                np.bincount(
+                    doc,
+                    weights=np.where(column < 0, column - 1, 0.0),
+                    minlength=n_docs,
+                )
+                for column in sentiments.T
+            ],
+            axis=1,
+        )
+        neu_count = np.stack(
+            [
+                np.bincount(doc, weights=column == 0, minlength=n_docs)
+                for column in sentiments.T
+            ],
+            axis=1,
+        )
+
+        sums = np.where(
+            sums > 0, sums + emphasis, np.where(sums < 0, sums - emphasis, sums)
+        )
+        compound = np.clip(sums / np.sqrt(sums * sums + 15), -1.0, 1.0)
+
+        more_positive = pos_sum > np.fabs(neg_sum)
+        more_negative = pos_sum < np.fabs(neg_sum)
+        pos_sum = np.where(more_positive, pos_sum + emphasis, pos_sum)
+        neg_sum = np.where(more_negative, neg_sum - emphasis, neg_sum)
+        total = pos_sum + np.fabs(neg_sum) + neu_count
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scores[:, :, 0] = np.round(np.fabs(pos_sum / total), 3)
+            scores[:, :, 1] = np.round(np.fabs(neu_count / total), 3)
+            scores[:, :, 2] = np.round(np.fabs(neg_sum / total), 3)
+        scores[:, :, 3] = np.round(compound, 4)
+        # Documents without any tokens score 0 across the board
+        scores[lengths == 0] = 0.0
+        return scores
+
+
+def get_batch_scorer(
+    lexica: Dict[str, Union[Lexicon, DefaultLexicon]],
+) -> BatchSentimentScorer:
+    """Given lexica by name, return a scorer for batches of documents"""
+    return BatchSentimentScorer(
+        {name: compile_lexicon(lexicon) for name, lexicon in lexica.items()}
+    )
+
+
+def score_batch(
+    bodies: Sequence[str], lexica: Dict[str, Union[Lexicon, DefaultLexicon]]
+) -> np.ndarray:
+    """Score documents with each of the given lexica. Returns an array of
+    shape (documents, lexica, 4) holding the scores in SCORE_FIELDS order.
+    To score many batches, make a BatchSentimentScorer once instead."""
+    return get_batch_scorer(lexica).score_batch(bodies)
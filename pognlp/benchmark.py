@@ -0,0 +1,216 @@
+"""Benchmarks of PogNLP's storage and analysis on synthetic data, for choosing
+settings on a given machine. Run with `python -m pognlp.benchmark <name>`."""
+
+import argparse
+import os
+import random
+import string
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+from pognlp.compact_lexicon import default_lexicon
+import pognlp.store as store
+
+# Seed for the synthetic corpus, so runs are comparable
+SEED = 0
+
+SUBREDDITS = ["gaming", "pcgaming", "Games", "truegaming", "leagueoflegends"]
+
+# Mixed in with lexicon words so synthetic English has some grammar to tag
+FUNCTION_WORDS = (
+    "the a an is are was were be been being have has had do does did i you he "
+    "she it we they me him her us them my your his its our their this that "
+    "these those and but or not no so to of in on at for with by from up out "
+    "as if when than then there here what who which how all some any can will "
+    "would could should just very really too"
+).split()
+
+
+def make_vocabulary(size: int, rng: random.Random) -> List[str]:
+    """Random lowercase words"""
+    return [
+        "".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 9)))
+        for _ in range(size)
+    ]
+
+
+def make_records(count: int, seed: int = SEED) -> List[store.CommentRecord]:
+    """Synthetic comments with Zipf-distributed words, so they compress
+    roughly like real text"""
+    rng = random.Random(seed)
+    vocabulary = make_vocabulary(5000, rng)
+    weights = [1 / rank for rank in range(1, len(vocabulary) + 1)]
+    start = 1609459200
+    records = []
+    for index in range(count):
+        words = rng.choices(vocabulary, weights, k=rng.randint(3, 80))
+        records.append(
+            store.CommentRecord(
+                body=" ".join(words),
+                created_utc=start + index * 7 + rng.randint(0, 6),
+                score=int(rng.paretovariate(1.5)) - rng.randint(0, 2),
+                id=f"{rng.getrandbits(40):x}",
+                link_id=f"{rng.getrandbits(32):x}",
+                subreddit=rng.choice(SUBREDDITS),
+                author=rng.choice(vocabulary),
+                parent_id=f"t1_{rng.getrandbits(40):x}",
+            )
+        )
+    return records
+
+
+def make_english_bodies(count: int, seed: int = SEED) -> List[str]:
+    """Synthetic comments of real English words (function words and the words
+    of VADER's lexicon, many of them inflected), for benchmarking NLP"""
+    rng = random.Random(seed)
+    content_words = [word for word in default_lexicon() if word.isalpha()]
+    bodies = []
+    for _ in range(count):
+        words = [
+            rng.choice(FUNCTION_WORDS if rng.random() < 0.6 else content_words)
+            for _ in range(rng.randint(3, 80))
+        ]
+        bodies.append(" ".join(words).capitalize() + rng.choice([".", "!", "?"]))
+    return bodies
+
+
+def directory_size(directory: str) -> int:
+    """Total size in bytes of the files under `directory`"""
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(directory)
+        for name in names
+    )
+
+
+def benchmark_codecs(args: argparse.Namespace) -> None:
+    """Compression ratio and decode throughput of each codec"""
+    records = make_records(args.documents)
+    print(
+        f"{len(records):,} synthetic documents, "
+        f"{args.shard_size:,} documents per shard\n"
+    )
+    print(
+        f"{'codec':<8}{'size (MB)':>12}{'ratio':>8}{'write (s)':>12}"
+        f"{'read (docs/s)':>16}{'read (MB/s)':>14}"
+    )
+    uncompressed_size = None
+    for codec in store.CODECS:
+        with tempfile.TemporaryDirectory() as directory:
+            shards: List[Dict[str, object]] = []
+            writer = store.StoreWriter(
+                directory,
+                on_flush=lambda shard, partition: shards.append(shard),
+                shard_size=args.shard_size,
+                codec=codec,
+            )
+            write_start = time.perf_counter()
+            for record in records:
+                writer.append(record)
+            writer.flush()
+            write_seconds = time.perf_counter() - write_start
+
+            size = directory_size(directory)
+            if uncompressed_size is None:
+                uncompressed_size = size
+
+            # Take the best of a few runs to reduce noise from the OS
+            read_seconds = min(
+                timed(
+                    lambda: sum(
+                        1
+                        for _ in store.iterate_rows(
+                            directory, shards, read_ahead=args.read_ahead
+                        )
+                    )
+                )
+                for _ in range(args.repeat)
+            )
+            print(
+                f"{codec:<8}{size / 1e6:>12.2f}{uncompressed_size / size:>8.2f}"
+                f"{write_seconds:>12.2f}{len(records) / read_seconds:>16,.0f}"
+                f"{uncompressed_size / 1e6 / read_seconds:>14.1f}"
+            )
+
+
+def benchmark_lemmatizers(args: argparse.Namespace) -> None:
+    """Speed of each lemmatization mode, and how often "lookup" lemmas differ
+    from "rule" lemmas"""
+    # pylint: disable=import-outside-toplevel
+    from pognlp.lemmatize import LEMMATIZERS, Lemmatizer
+
+    bodies = make_english_bodies(args.documents)
+    print(f"{len(bodies):,} synthetic documents\n")
+    print(f"{'mode':<8}{'load (s)':>10}{'docs/s':>10}{'tokens/s':>12}")
+    lemmas_by_mode: Dict[str, List[List[str]]] = {}
+    seconds_by_mode: Dict[str, float] = {}
+    for mode in LEMMATIZERS:
+        load_start = time.perf_counter()
+        lemmatizer = Lemmatizer(mode)
+        load_seconds = time.perf_counter() - load_start
+
+        start = time.perf_counter()
+        lemmas = [
+            lemmatizer.lemmas(doc)
+            for doc in lemmatizer.nlp.pipe(bodies, batch_size=args.batch_size)
+        ]
+        seconds = time.perf_counter() - start
+        lemmas_by_mode[mode] = lemmas
+        seconds_by_mode[mode] = seconds
+        token_count = sum(len(doc_lemmas) for doc_lemmas in lemmas)
+        print(
+            f"{mode:<8}{load_seconds:>10.2f}{len(bodies) / seconds:>10,.0f}"
+            f"{token_count / seconds:>12,.0f}"
+        )
+
+    # Both modes use the same tokenizer, so tokens line up
+    different = total = 0
+    for rule_lemmas, lookup_lemmas in zip(
+        lemmas_by_mode["rule"], lemmas_by_mode["lookup"]
+    ):
+        total += len(rule_lemmas)
+        different += sum(a != b for a, b in zip(rule_lemmas, lookup_lemmas))
+    print(
+        f"\nSpeedup of lookup over rule: "
+        f"{seconds_by_mode['rule'] / seconds_by_mode['lookup']:.1f}x"
+    )
+    print(f"Tokens lemmatized differently: {100 * different / (total or 1):.2f}%")
+
+
+def timed(function: Callable[[], object]) -> float:
+    """Number of seconds it takes to call `function`"""
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    """Parse arguments and run the chosen benchmark"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    codecs_parser = subparsers.add_parser("codecs", help=benchmark_codecs.__doc__)
+    codecs_parser.add_argument("--documents", type=int, default=200000)
+    codecs_parser.add_argument(
+        "--shard-size", type=int, default=store.DEFAULT_SHARD_SIZE
+    )
+    codecs_parser.add_argument(
+        "--read-ahead", type=int, default=store.DEFAULT_READ_AHEAD
+    )
+    codecs_parser.add_argument("--repeat", type=int, default=3)
+    codecs_parser.set_defaults(function=benchmark_codecs)
+
+    lemmatizers_parser = subparsers.add_parser(
+        "lemmatizers", help=benchmark_lemmatizers.__doc__
+    )
+    lemmatizers_parser.add_argument("--documents", type=int, default=20000)
+    lemmatizers_parser.add_argument("--batch-size", type=int, default=256)
+    lemmatizers_parser.set_defaults(function=benchmark_lemmatizers)
+
+    args = parser.parse_args()
+    args.function(args)
+
+
+if __name__ == "__main__":
+    main()
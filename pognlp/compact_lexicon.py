@@ -0,0 +1,104 @@
+"""Compact, memory-mapped form of a lexicon, used to ship VADER's default
+lexicon prebuilt instead of parsing it at runtime
+
+A compact lexicon is a pair of .npy files: the lexicon's words as
+fixed-width UTF-8 byte strings in sorted order, and their valences. Lookups
+are binary searches over the memory-mapped words, so loading one costs
+nothing up front and every process running a report shares the same pages.
+
+Rebuild the default lexicon's files with `python -m pognlp.compact_lexicon`
+after changing pognlp/vader_lexicon.py.
+"""
+
+import functools
+import hashlib
+import os
+from typing import Iterator, Mapping
+
+import numpy as np
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+DEFAULT_LEXICON_NAME = "vader_lexicon"
+
+
+def write_compact_lexicon(
+    directory: str, name: str, lexicon: Mapping[str, float]
+) -> None:
+    """Write `lexicon` as the compact lexicon `name` in `directory`"""
+    encoded = sorted(
+        (word.encode("utf-8"), valence) for word, valence in lexicon.items()
+    )
+    width = max((len(word) for word, _ in encoded), default=1)
+    words = np.array([word for word, _ in encoded], dtype=f"S{width}")
+    valences = np.array([valence for _, valence in encoded], dtype="<f8")
+    os.makedirs(directory, exist_ok=True)
+    np.save(os.path.join(directory, f"{name}.words.npy"), words)
+    np.save(os.path.join(directory, f"{name}.valences.npy"), valences)
+
+
+class CompactLexicon(Mapping[str, float]):
+    """Read-only word -> valence mapping backed by the files written by
+    write_compact_lexicon"""
+
+    def __init__(self, directory: str, name: str):
+        self.words = np.load(
+            os.path.join(directory, f"{name}.words.npy"), mmap_mode="r"
+        )
+        self.valences = np.load(
+            os.path.join(directory, f"{name}.valences.npy"), mmap_mode="r"
+        )
+        self.width = self.words.dtype.itemsize
+
+    def content_hash(self) -> str:
+        """Hash of the words and valences, like pognlp.lexicon_cache's hash
+        of a lexicon's text"""
+        digest = hashlib.sha256(self.words.tobytes())
+        digest.update(self.valences.tobytes())
+        return digest.hexdigest()
+
+    def index(self, word: str) -> int:
+        """Position of `word` in the sorted words, or -1 if it's missing"""
+        key = word.encode("utf-8")
+        # NumPy drops trailing NUL bytes from fixed-width strings, so such
+        # keys would match a shorter word
+        if len(key) > self.width or key.endswith(b"\0"):
+            return -1
+        i = int(np.searchsorted(self.words, key))
+        if i < len(self.words) and self.words[i] == key:
+            return i
+        return -1
+
+    def __getitem__(self, word: str) -> float:
+        i = self.index(word)
+        if i < 0:
+            raise KeyError(word)
+        return float(self.valences[i])
+
+    def __contains__(self, word: object) -> bool:
+        return isinstance(word, str) and self.index(word) >= 0
+
+    def __iter__(self) -> Iterator[str]:
+        return (word.decode("utf-8") for word in self.words.tolist())
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+
+@functools.lru_cache(maxsize=None)
+def default_lexicon() -> CompactLexicon:
+    """VADER's default lexicon. Opened the first time it's needed."""
+    return CompactLexicon(DATA_PATH, DEFAULT_LEXICON_NAME)
+
+
+def main() -> None:
+    """Rebuild the default lexicon's files from pognlp/vader_lexicon.py"""
+    # pylint: disable=import-outside-toplevel
+    from pognlp.analyze import parse_lexicon
+    from pognlp.vader_lexicon import VADER_LEXICON
+
+    write_compact_lexicon(DATA_PATH, DEFAULT_LEXICON_NAME, parse_lexicon(VADER_LEXICON))
+
+
+if __name__ == "__main__":
+    main()
@@ -20,3 +20,5 @@ corpora_path = os.path.join(storage_path, "corpora")
 lexica_path = os.path.join(storage_path, "lexica")
 
 reports_path = os.path.join(storage_path, "reports")
+
+lexicon_cache_path = os.path.join(storage_path, "lexicon_cache")
@@ -0,0 +1,376 @@
+"""Persistent cache of per-document analysis results, so re-running a report
+only analyzes what changed
+
+The cache lives next to the corpus (see Corpus.cache_directory) and holds
+tables of results keyed by a hash of each document's comment ID and body:
+
+- a lemma table per lemmatizer (mode and spaCy model version), holding each
+  document's lemmas, from which token counts and lexicon frequencies are
+  counted again cheaply
+- a score table per lexicon (by content hash) and scoring backend, holding
+  each document's VADER scores with that lexicon
+
+Table names also include ANALYZER_VERSION; bump it whenever analysis gives
+different results for the same inputs so stale tables are ignored.
+
+A table is a directory of immutable segments. Each segment is a few .npy
+files: its keys, sorted, and the values in the same order. Looking keys up
+is a binary search per segment. New results are collected in memory and
+written as a new segment once there are enough of them, so several
+processes can add to a table at once without coordinating. Once a table has
+more than MAX_SEGMENTS segments, they're merged into one, so lookups stay
+fast however many runs added to it.
+
+Score tables of old versions of lexica pile up as lexica are edited, so
+after each run, the ones no report uses any more are deleted (see
+prune_score_tables).
+"""
+
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+import glob
+import hashlib
+import os
+import shutil
+import time
+import uuid
+from typing import (
+    Dict,
+    Generic,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
+
+import numpy as np
+
+CACHE_NAME = "document_cache"
+
+ANALYZER_VERSION = 1
+
+# Results collected before they're written as a segment
+FLUSH_SIZE = 100000
+
+# Segments a table may have before they're merged into one
+MAX_SEGMENTS = 16
+
+KEY_DTYPE = "S16"
+
+V = TypeVar("V")
+
+
+def document_key(comment_id: str, body: str) -> bytes:
+    """Key of a document's results: a hash of its comment ID and body"""
+    return hashlib.blake2b(
+        f"{comment_id}\0{body}".encode("utf-8"), digest_size=16
+    ).digest()
+
+
+def segment_path(directory: str, segment: str, column: str) -> str:
+    """Path of one column file of a segment"""
+    return os.path.join(directory, f"{segment}.{column}.npy")
+
+
+def save_column(directory: str, segment: str, column: str, array: np.ndarray) -> None:
+    """Write one column file of a segment atomically"""
+    path = segment_path(directory, segment, column)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as column_file:
+        np.save(column_file, array)
+    os.replace(temp_path, path)
+
+
+def new_segment_name() -> str:
+    """Name of a new segment. Unique across processes; sorts roughly by
+    age."""
+    return f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+
+
+def score_table_name(lexicon_version: str) -> str:
+    """Name of the score table of a lexicon version, which is the scoring
+    backend and the lexicon's content hash joined by a hyphen"""
+    return f"scores-{lexicon_version}-v{ANALYZER_VERSION}"
+
+
+def prune_score_tables(directory: str, lexicon_hashes: Iterable[str]) -> None:
+    """Delete the score tables in the cache in `directory` of lexica whose
+    content hash isn't one of `lexicon_hashes`, e.g. of lexica since edited
+    or deleted"""
+    keep = set(lexicon_hashes)
+    for path in glob.glob(os.path.join(directory, score_table_name("*-*"))):
+        lexicon_hash = os.path.basename(path).split("-")[2]
+        if lexicon_hash not in keep:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+class CacheTable(ABC, Generic[V]):
+    """Keyed values of one kind, e.g. scores with one lexicon"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        # Sorted keys and the segment they're in, for each segment
+        self.segments: List[Tuple[np.ndarray, str]] = []
+        for keys_path in sorted(glob.glob(os.path.join(directory, "*.keys.npy"))):
+            segment = os.path.basename(keys_path)[: -len(".keys.npy")]
+            self.segments.append((np.load(keys_path, mmap_mode="r"), segment))
+        self.values: Dict[str, object] = {}
+        # Results not written yet
+        self.pending: Dict[bytes, V] = {}
+
+    @abstractmethod
+    def load_values(self, segment: str) -> object:
+        """Load the values of a segment"""
+
+    @abstractmethod
+    def get_value(self, values: object, index: int) -> V:
+        """Get the value at `index` of a segment's values"""
+
+    @abstractmethod
+    def save_values(self, segment: str, values: Sequence[V]) -> None:
+        """Write the values of a new segment"""
+
+    @abstractmethod
+    def save_merged(
+        self, segment: str, sources: Sequence[str], indices: np.ndarray
+    ) -> None:
+        """Write the values of a new segment made of other segments' values:
+        the ones at `indices` of the source segments' values, concatenated"""
+
+    def lookup(self, keys: Sequence[bytes]) -> List[Optional[V]]:
+        """Get the value of each key, or None for keys that aren't cached"""
+        results: List[Optional[V]] = [self.pending.get(key) for key in keys]
+        if not self.segments or not keys:
+            return results
+        wanted = np.array(keys, dtype=KEY_DTYPE)
+        missing = np.array([result is None for result in results])
+        for segment_keys, segment in self.segments:
+            if not missing.any():
+                break
+            indices = np.searchsorted(segment_keys, wanted)
+            found_indices = np.minimum(indices, len(segment_keys) - 1)
+            found = missing & (segment_keys[found_indices] == wanted)
+            if not found.any():
+                continue
+            if segment not in self.values:
+                try:
+                    self.values[segment] = self.load_values(segment)
+                except FileNotFoundError:
+                    # Merged or pruned by another process since; its
+                    # documents just aren't cached
+                    continue
+            values = self.values[segment]
+            for i in np.flatnonzero(found):
+                results[i] = self.get_value(values, int(indices[i]))
+            missing &= ~found
+        return results
+
+    def add(self, key: bytes, value: V) -> None:
+        """Cache a value. It's written to disk on the next flush."""
+        self.pending[key] = value
+        if len(self.pending) >= FLUSH_SIZE:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write pending values as a new segment"""
+        if not self.pending:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        keys = sorted(self.pending)
+        segment = new_segment_name()
+        self.save_values(segment, [self.pending[key] for key in keys])
+        # The keys file is written last, so readers never see half a segment
+        key_array = np.array(keys, dtype=KEY_DTYPE)
+        save_column(self.directory, segment, "keys", key_array)
+        self.segments.append((key_array, segment))
+        self.pending = {}
+        if len(self.segments) > MAX_SEGMENTS:
+            self.compact()
+
+    def compact(self) -> None:
+        """Merge all segments into one. Of values cached more than once, the
+        oldest is kept."""
+        if len(self.segments) < 2:
+            return
+        sources = [segment for _, segment in self.segments]
+        keys, indices = np.unique(
+            np.concatenate([segment_keys for segment_keys, _ in self.segments]),
+            return_index=True,
+        )
+        segment = new_segment_name()
+        try:
+            self.save_merged(segment, sources, indices)
+        except FileNotFoundError:
+            # Another process merged or pruned the segments first
+            self.remove_segment(segment)
+            return
+        save_column(self.directory, segment, "keys", keys)
+        for source in sources:
+            self.remove_segment(source)
+        self.segments = [(keys, segment)]
+        self.values = {}
+
+    def remove_segment(self, segment: str) -> None:
+        """Delete a segment's files, the keys file first so readers never
+        see a segment without its values"""
+        paths = glob.glob(os.path.join(self.directory, f"{segment}.*"))
+        keys_path = segment_path(self.directory, segment, "keys")
+        for path in sorted(paths, key=lambda path: path != keys_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+# pos, neu, neg and compound, in pognlp.batch_vader.SCORE_FIELDS order
+Scores = Tuple[float, float, float, float]
+
+
+class ScoreTable(CacheTable[Scores]):
+    """Documents' VADER scores with one lexicon"""
+
+    def load_values(self, segment: str) -> object:
+        return np.load(segment_path(self.directory, segment, "scores"), mmap_mode="r")
+
+    def get_value(self, values: object, index: int) -> Scores:
+        assert isinstance(values, np.ndarray)
+        pos, neu, neg, compound = values[index].tolist()
+        return (pos, neu, neg, compound)
+
+    def save_values(self, segment: str, values: Sequence[Scores]) -> None:
+        save_column(
+            self.directory, segment, "scores", np.array(values, dtype=np.float64)
+        )
+
+    def save_merged(
+        self, segment: str, sources: Sequence[str], indices: np.ndarray
+    ) -> None:
+        scores = np.concatenate(
+            [
+                np.load(segment_path(self.directory, source, "scores"), mmap_mode="r")
+                for source in sources
+            ]
+        )
+        save_column(self.directory, segment, "scores", scores[indices])
+
+
+class LemmaTable(CacheTable[List[str]]):
+    """Documents' lemmas. Each segment stores its distinct lemmas once, and
+    each document's lemmas as indices into them."""
+
+    def load_values(self, segment: str) -> object:
+        vocabulary = np.load(segment_path(self.directory, segment, "vocabulary"))
+        return (
+            vocabulary.tolist(),
+            np.load(segment_path(self.directory, segment, "offsets"), mmap_mode="r"),
+            np.load(segment_path(self.directory, segment, "lemmas"), mmap_mode="r"),
+        )
+
+    def get_value(self, values: object, index: int) -> List[str]:
+        assert isinstance(values, tuple)
+        vocabulary, offsets, lemma_ids = values
+        start, end = offsets[index : index + 2].tolist()
+        return [vocabulary[lemma_id] for lemma_id in lemma_ids[start:end].tolist()]
+
+    def save_values(self, segment: str, values: Sequence[List[str]]) -> None:
+        lemma_ids: Dict[str, int] = {}
+        flat = [
+            lemma_ids.setdefault(lemma, len(lemma_ids))
+            for lemmas in values
+            for lemma in lemmas
+        ]
+        offsets = np.zeros(len(values) + 1, dtype=np.int64)
+        np.cumsum([len(lemmas) for lemmas in values], out=offsets[1:])
+        save_column(
+            self.directory, segment, "vocabulary", np.array(list(lemma_ids), dtype=str)
+        )
+        save_column(self.directory, segment, "offsets", offsets)
+        save_column(self.directory, segment, "lemmas", np.array(flat, dtype=np.int32))
+
+    def save_merged(
+        self, segment: str, sources: Sequence[str], indices: np.ndarray
+    ) -> None:
+        # Map each source's lemma IDs to IDs in one merged vocabulary
+        lemma_ids: Dict[str, int] = {}
+        all_lemmas = []
+        all_lengths = []
+        for source in sources:
+            values = self.load_values(source)
+            assert isinstance(values, tuple)
+            vocabulary, offsets, source_lemmas = values
+            ids = np.array(
+                [lemma_ids.setdefault(lemma, len(lemma_ids)) for lemma in vocabulary],
+                dtype=np.int32,
+            )
+            all_lemmas.append(ids[source_lemmas])
+            all_lengths.append(np.diff(offsets))
+        lemmas = np.concatenate(all_lemmas)
+        lengths = np.concatenate(all_lengths)
+        starts = np.cumsum(lengths) - lengths
+        # Gather the lemmas of the documents at `indices`, in that order
+        new_lengths = lengths[indices]
+        offsets = np.zeros(len(indices) + 1, dtype=np.int64)
+        np.cumsum(new_lengths, out=offsets[1:])
+        gather = np.repeat(starts[indices] - offsets[:-1], new_lengths) + np.arange(
+            offsets[-1]
+        )
+        save_column(
+            self.directory, segment, "vocabulary", np.array(list(lemma_ids), dtype=str)
+        )
+        save_column(self.directory, segment, "offsets", offsets)
+        save_column(self.directory, segment, "lemmas", lemmas[gather])
+
+
+class PendingResults(NamedTuple):
+    """Results collected by a DocumentCache but not written yet"""
+
+    lemmas: Dict[bytes, List[str]]
+    # Lexicon name -> key -> scores
+    scores: Dict[str, Dict[bytes, Scores]]
+
+
+class DocumentCache:
+    """The tables one report run reads and adds to"""
+
+    def __init__(
+        self, directory: str, lemmatizer_version: str, lexicon_versions: Dict[str, str]
+    ):
+        """`lemmatizer_version` identifies how lemmas are made, and
+        `lexicon_versions` how scores are made with each lexicon, by name"""
+        self.lemmas = LemmaTable(
+            os.path.join(directory, f"lemmas-{lemmatizer_version}-v{ANALYZER_VERSION}")
+        )
+        self.scores = {
+            name: ScoreTable(os.path.join(directory, score_table_name(version)))
+            for name, version in lexicon_versions.items()
+        }
+
+    def take_pending(self) -> PendingResults:
+        """Remove and return the results not written yet, e.g. to send them
+        from a worker process to the one writing the cache"""
+        pending = PendingResults(
+            self.lemmas.pending,
+            {name: table.pending for name, table in self.scores.items()},
+        )
+        self.lemmas.pending = {}
+        for table in self.scores.values():
+            table.pending = {}
+        return pending
+
+    def add_pending(self, pending: PendingResults) -> None:
+        """Add results taken from another DocumentCache with take_pending"""
+        for key, lemmas in pending.lemmas.items():
+            self.lemmas.add(key, lemmas)
+        for name, scores in pending.scores.items():
+            for key, value in scores.items():
+                self.scores[name].add(key, value)
+
+    def flush(self) -> None:
+        """Write all pending results"""
+        self.lemmas.flush()
+        for table in self.scores.values():
+            table.flush()
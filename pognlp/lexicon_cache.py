@@ -0,0 +1,171 @@
+"""Cache of compiled lexica, so that building an analyzer doesn't parse the
+lexicon's TSV text every time
+
+A compiled lexicon is the word -> valence dict VADER's make_lex_dict builds
+from the text of a lexicon. Entries are keyed by a hash of that text, so
+editing a lexicon gives it a new key and its old entry is never used again
+(it ages out of the cache instead). Recently used entries are kept in memory,
+and every entry is also written to disk in a binary format that loads without
+any parsing, so new processes and later runs can skip parsing too.
+
+Compiled lexica are shared between analyzers and must not be modified.
+"""
+
+import functools
+import glob
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+import pognlp.constants as constants
+
+# Compiled lexica kept in memory
+MEMORY_ENTRIES = 16
+
+# Compiled lexica kept on disk. The least recently used ones are deleted
+# beyond that.
+DISK_ENTRIES = 64
+
+EXTENSION = ".lex"
+
+# Start of every cache file. Bump the version when the format changes.
+MAGIC = b"PNLPLEX1"
+
+# Header after MAGIC: number of words, length of the words in bytes
+HEADER = np.dtype([("word_count", "<u8"), ("words_size", "<u8")])
+
+CompiledLexicon = Dict[str, float]
+
+
+# Memoized since the same (e.g. default) lexicon text is hashed over and over
+@functools.lru_cache(maxsize=MEMORY_ENTRIES)
+def content_hash(lexicon_file_contents: str) -> str:
+    """Key of a lexicon's compiled form in the cache"""
+    return hashlib.sha256(lexicon_file_contents.encode("utf-8")).hexdigest()
+
+
+def write_compiled(path: str, lexicon: CompiledLexicon) -> None:
+    """Write a compiled lexicon to `path`. Words never contain newlines (they
+    separate lines in the TSV), so words are stored as one newline-separated
+    block of UTF-8 followed by their valences as float64s."""
+    words = "\n".join(lexicon).encode("utf-8")
+    header = np.array([(len(lexicon), len(words))], dtype=HEADER)
+    valences = np.fromiter(lexicon.values(), dtype="<f8", count=len(lexicon))
+    # Unique temp file so concurrent writers of the same entry don't collide
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, "wb") as lexicon_file:
+        lexicon_file.write(MAGIC)
+        lexicon_file.write(header.tobytes())
+        lexicon_file.write(words)
+        lexicon_file.write(valences.tobytes())
+    os.replace(temp_path, path)
+
+
+def read_compiled(path: str) -> Optional[CompiledLexicon]:
+    """Read a compiled lexicon written by write_compiled, or return None if
+    there's no valid one at `path`"""
+    try:
+        with open(path, "rb") as lexicon_file:
+            data = lexicon_file.read()
+    except FileNotFoundError:
+        return None
+    header_end = len(MAGIC) + HEADER.itemsize
+    if not data.startswith(MAGIC) or len(data) < header_end:
+        return None
+    header = np.frombuffer(data, dtype=HEADER, count=1, offset=len(MAGIC))[0]
+    word_count = int(header["word_count"])
+    words_end = header_end + int(header["words_size"])
+    if len(data) != words_end + 8 * word_count:
+        return None
+    if not word_count:
+        return {}
+    words = data[header_end:words_end].decode("utf-8").split("\n")
+    valences = np.frombuffer(data, dtype="<f8", offset=words_end).tolist()
+    return dict(zip(words, valences))
+
+
+class LexiconCache:
+    """Compiled lexica by content hash, in memory (LRU) and on disk. Safe to
+    use from several threads, and several processes can share a directory."""
+
+    def __init__(
+        self,
+        directory: str,
+        memory_entries: int = MEMORY_ENTRIES,
+        disk_entries: int = DISK_ENTRIES,
+    ):
+        self.directory = directory
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self.entries: OrderedDict[str, CompiledLexicon] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def path(self, key: str) -> str:
+        """Path of the file holding an entry"""
+        return os.path.join(self.directory, f"{key}{EXTENSION}")
+
+    def get(
+        self,
+        lexicon_file_contents: str,
+        compile_lexicon: Callable[[], CompiledLexicon],
+    ) -> CompiledLexicon:
+        """Get a lexicon's compiled form, calling `compile_lexicon` to make it
+        if it's in neither the memory nor the disk cache"""
+        key = content_hash(lexicon_file_contents)
+        with self.lock:
+            lexicon = self.entries.get(key)
+            if lexicon is not None:
+                self.entries.move_to_end(key)
+                return lexicon
+
+        path = self.path(key)
+        lexicon = read_compiled(path)
+        if lexicon is not None:
+            # Mark it as recently used for pruning
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                pass
+        else:
+            lexicon = compile_lexicon()
+            os.makedirs(self.directory, exist_ok=True)
+            write_compiled(path, lexicon)
+            self.prune_disk()
+
+        with self.lock:
+            self.entries[key] = lexicon
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.memory_entries:
+                self.entries.popitem(last=False)
+        return lexicon
+
+    def prune_disk(self) -> None:
+        """Delete the least recently used files beyond `disk_entries`"""
+        paths = glob.glob(os.path.join(self.directory, f"*{EXTENSION}"))
+        if len(paths) <= self.disk_entries:
+            return
+        by_last_use = []
+        for path in paths:
+            try:
+                by_last_use.append((os.path.getmtime(path), path))
+            except FileNotFoundError:
+                # Pruned by another process
+                continue
+        by_last_use.sort()
+        for _, path in by_last_use[: len(by_last_use) - self.disk_entries]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+
+    def clear(self) -> None:
+        """Empty the memory cache. The disk cache is left alone."""
+        with self.lock:
+            self.entries.clear()
+
+
+lexicon_cache = LexiconCache(constants.lexicon_cache_path)
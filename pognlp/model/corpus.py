@@ -3,18 +3,64 @@
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
-from typing import Any, Callable, Dict, Iterable, List, Generator, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Deque,
+    Dict,
+    Hashable,
+    Iterable,
+    List,
+    Generator,
+    Optional,
+    Tuple,
+)
+from collections import deque
 import datetime
 import glob
+import json
+import multiprocessing
 import os
+import queue
+import re
 import shutil
+import threading
 
 import compress_pickle
 import rtoml as toml
 import praw
 from psaw import PushshiftAPI
+import zstandard
 
 import pognlp.constants as constants
+from pognlp.document_cache import CACHE_NAME
+from pognlp.stats import CorpusStats
+import pognlp.store as store
+import pognlp.util as util
+
+# Downloads are split into windows of this many days per subreddit
+DEFAULT_WINDOW_DAYS = 7
+
+# Number of (subreddit, window) cells downloaded at once
+DEFAULT_WORKERS = 4
+
+# Pushshift requests per minute, shared between all download workers
+DEFAULT_REQUESTS_PER_MINUTE = 60
+
+# Number of records a download worker collects before handing them off
+FETCH_BATCH_SIZE = 100
+
+# Size in bytes of the chunks of decompressed NDJSON that Pushshift dumps are
+# parsed in
+DUMP_CHUNK_SIZE = 16 * 1024 * 1024
+
+# Pushshift dumps are compressed with a long window
+DUMP_MAX_WINDOW_SIZE = 2**31
+
+# Matches the month in the name of a monthly Pushshift comment dump
+DUMP_NAME_PATTERN = re.compile(r"RC_(\d{4})-(\d{2})")
 
 
 class Corpus(ABC):
@@ -56,7 +102,14 @@ class Corpus(ABC):
         with open(toml_path, encoding="utf-8") as toml_file:
             corpus_dict = toml.load(toml_file)
 
-            corpus_by_type = {corpus.corpus_type: corpus for corpus in (RedditCorpus,)}
+            corpus_by_type = {
+                corpus.corpus_type: corpus
+                for corpus in (
+                    RedditCorpus,
+                    PushshiftDumpCorpus,
+                    FilteredRedditCorpus,
+                )
+            }
             corpus_class = corpus_by_type[corpus_dict["type"]]
             del corpus_dict["type"]
             return corpus_class.from_dict({"name": name, **corpus_dict})
@@ -75,12 +128,29 @@ class Corpus(ABC):
 
     @abstractmethod
     def compile(
-        self, compile_params: Dict[str, Any], progress_cb: Callable[[int], None]
+        self,
+        compile_params: Dict[str, Any],
+        progress_cb: Callable[[util.Progress], None],
     ) -> None:
         """Perform any work (e.g. downloading) necessary to analyze the
         documents and mark the corpus as ready for analysis"""
         self.compiled = True
 
+    def refresh(self) -> None:
+        """Bring the document count and statistics up to date, if they can
+        go stale. Nothing to do for most corpora."""
+
+    @property
+    def cache_directory(self) -> str:
+        """Where results of analyzing the corpus' documents are cached, see
+        pognlp.document_cache"""
+        return os.path.join(self.directory, CACHE_NAME)
+
+    def load_stats(self) -> Optional[CorpusStats]:
+        """Load the summary statistics computed when the corpus was compiled,
+        if there are any"""
+        return CorpusStats.load(self.directory)
+
     def delete(self) -> None:
         """Delete the corpus from disk"""
         shutil.rmtree(self.directory)
@@ -107,12 +177,24 @@ class RedditCorpus(Corpus):
         end_time: datetime.datetime,
         document_count: int = 0,
         compiled: bool = False,
+        shards: Optional[List[Dict[str, Any]]] = None,
     ):
-        super().__init__(name, document_count=document_count)
+        super().__init__(name, document_count=document_count, compiled=compiled)
         self.subreddits = subreddits
         self.start_time = start_time
         self.end_time = end_time
+        # Legacy corpora stored a gzipped pickle of praw Comment objects
         self.comments_pickle_path = os.path.join(self.directory, "comments.pickle.gz")
+        self.store_path = os.path.join(self.directory, "comments")
+        self.checkpoint_path = os.path.join(self.directory, "checkpoint.toml")
+
+        # Manifest of the shards written to the store so far, in order. Each
+        # entry has the shard's "name", its number of "rows", and a summary of
+        # the subreddits and time range it covers.
+        self.shards = shards or []
+
+        # Statistics of the documents in the shards above
+        self.stats = CorpusStats()
 
         self.write()
 
@@ -125,90 +207,868 @@ class RedditCorpus(Corpus):
             start_time=datetime.datetime.fromisoformat(corpus_dict["start_time"]),
             end_time=datetime.datetime.fromisoformat(corpus_dict["end_time"]),
             compiled=corpus_dict["compiled"],
+            shards=corpus_dict.get("shards"),
         )
 
-    def write(self) -> None:
-        if not os.path.exists(self.directory):
-            os.makedirs(self.directory, exist_ok=True)
-        corpus_dict = {
-            "type": RedditCorpus.corpus_type,
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize to a dict that can be written as TOML"""
+        return {
+            "type": self.corpus_type,
             "subreddits": self.subreddits,
             "start_time": self.start_time.isoformat(),
             "end_time": self.end_time.isoformat(),
             "document_count": self.document_count,
             "compiled": self.compiled,
+            "shards": self.shards,
         }
+
+    def write(self) -> None:
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory, exist_ok=True)
         with open(self.toml_path, "w", encoding="utf-8") as toml_file:
-            toml.dump(corpus_dict, toml_file)
+            toml.dump(self.to_dict(), toml_file)
 
     def compile(
         self,
         compile_params: Dict[str, Any],
-        progress_cb: Optional[Callable[[int], None]] = None,
+        progress_cb: Optional[Callable[[util.Progress], None]] = None,
     ) -> None:
+        """Download the corpus. The date range is split into windows and
+        progress through each (subreddit, window) cell is checkpointed
+        whenever a shard is written, so calling compile again after an
+        interruption resumes where the last shard left off."""
         if self.compiled:
             return
 
-        client_id = compile_params["client_id"]
-        client_secret = compile_params["client_secret"]
-
-        reddit = praw.Reddit(
-            client_id=client_id,
-            client_secret=client_secret,
-            user_agent=constants.reddit_user_agent,
-            check_for_updates=False,
-            comment_kind="t1",
-            message_kind="t4",
-            redditor_kind="t2",
-            submission_kind="t3",
-            subreddit_kind="t5",
-            trophy_kind="t6",
-            oauth_url="https://oauth.reddit.com",
-            reddit_url="https://www.reddit.com",
-            short_url="https://redd.it",
-            ratelimit_seconds=5,
-            timeout=16,
-        )
-        api = PushshiftAPI(reddit)
-        comments = []
+        start_epoch = int(self.start_time.timestamp())
+        end_epoch = int(self.end_time.timestamp())
+
+        checkpoint = self.load_checkpoint()
+        if checkpoint is None or (
+            checkpoint["subreddits"],
+            checkpoint["start"],
+            checkpoint["end"],
+        ) != (self.subreddits, start_epoch, end_epoch):
+            # Start over, discarding anything not covered by a checkpoint
+            if os.path.exists(self.store_path):
+                shutil.rmtree(self.store_path)
+            self.shards = []
+            window_seconds = int(
+                compile_params.get("window_days", DEFAULT_WINDOW_DAYS) * 24 * 60 * 60
+            )
+            cells = make_cells(self.subreddits, start_epoch, end_epoch, window_seconds)
+            self.stats = CorpusStats()
+        else:
+            cells = checkpoint["cells"]
+            self.shards = checkpoint["shards"]
+            self.stats = CorpusStats.from_dict(checkpoint["stats"])
+            self.remove_orphaned_shards()
+        self.document_count = sum(shard["rows"] for shard in self.shards)
+        self.finish_download(cells, compile_params, progress_cb)
+
+    def extend(
+        self,
+        compile_params: Dict[str, Any],
+        new_end_time: Optional[datetime.datetime] = None,
+        extra_subreddits: Optional[List[str]] = None,
+        progress_cb: Optional[Callable[[util.Progress], None]] = None,
+    ) -> None:
+        """Extend a compiled corpus to a later end time and/or more
+        subreddits, downloading only the (subreddit, window) cells it's
+        missing and appending them to the existing store.
+
+        The corpus is marked as not compiled until the new cells are
+        downloaded. If the download is interrupted, calling compile resumes
+        it."""
+        if not self.compiled:
+            raise ValueError("Only a compiled corpus can be extended.")
+        # The new cells go after the existing shards, so those must exist
+        self.migrate()
+
+        old_end_epoch = int(self.end_time.timestamp())
+        if new_end_time is not None and new_end_time > self.end_time:
+            self.end_time = new_end_time
+        new_subreddits = [
+            subreddit
+            for subreddit in extra_subreddits or []
+            if subreddit not in self.subreddits
+        ]
+        self.subreddits = [*self.subreddits, *new_subreddits]
 
         start_epoch = int(self.start_time.timestamp())
         end_epoch = int(self.end_time.timestamp())
+        window_seconds = int(
+            compile_params.get("window_days", DEFAULT_WINDOW_DAYS) * 24 * 60 * 60
+        )
+        cells = [
+            # The new time range for the subreddits we already have...
+            *make_cells(
+                [
+                    subreddit
+                    for subreddit in self.subreddits
+                    if subreddit not in new_subreddits
+                ],
+                old_end_epoch,
+                end_epoch,
+                window_seconds,
+            ),
+            # ...and the whole time range for the new subreddits
+            *make_cells(new_subreddits, start_epoch, end_epoch, window_seconds),
+        ]
+        if not cells:
+            return
+
+        self.stats = self.load_stats() or self.compute_stats()
+        self.compiled = False
+        self.finish_download(cells, compile_params, progress_cb)
+
+    def finish_download(
+        self,
+        cells: List[Dict[str, Any]],
+        compile_params: Dict[str, Any],
+        progress_cb: Optional[Callable[[util.Progress], None]] = None,
+    ) -> None:
+        """Download the remaining cells and mark the corpus as compiled"""
+        self.write_checkpoint(cells)
+        self.write()
+
+        self.download_cells(cells, compile_params, progress_cb)
 
-        progress = 0
-        for subreddit in self.subreddits:
-            # Collect all comments matching the search parameters in a list
-            for comment in api.search_comments(
-                after=start_epoch, before=end_epoch, subreddit=subreddit
-            ):
-                comments.append(comment)
-                progress += 1
-                if progress_cb is not None:
-                    progress_cb(progress)
-
-        if not comments:
+        if not self.document_count:
             raise ValueError(
                 "No comments found. Double-check your search parameters and API credentials."
             )
 
-        self.document_count = len(comments)
+        self.compiled = True
+        self.write()
+        os.remove(self.checkpoint_path)
 
-        with open(self.comments_pickle_path, "wb") as pickle_file:
-            compress_pickle.dump(comments, pickle_file, compression="gzip")
+    def download_cells(
+        self,
+        cells: List[Dict[str, Any]],
+        compile_params: Dict[str, Any],
+        progress_cb: Optional[Callable[[util.Progress], None]] = None,
+    ) -> None:
+        """Download all unfinished cells into the store, several at a time,
+        checkpointing whenever a shard is written"""
 
-        self.compiled = True
+        # Timestamp and IDs of the latest comments received for each cell
+        latest_utc: Dict[int, int] = {}
+        latest_ids: Dict[int, List[str]] = {}
+        # Statistics of the comments received for each cell but not yet
+        # written to disk
+        pending_stats: Dict[int, CorpusStats] = {}
+
+        def on_flush(shard: Dict[str, Any], cell_index: Hashable) -> None:
+            # Everything received for the cell so far is now on disk, so its
+            # cursor can advance to the latest comment received
+            assert isinstance(cell_index, int)
+            cells[cell_index]["cursor"] = latest_utc[cell_index]
+            cells[cell_index]["cursor_ids"] = list(latest_ids[cell_index])
+            self.add_shard(shard, pending_stats.pop(cell_index))
+            # The checkpoint's shard list is authoritative when resuming, so
+            # a crash before this line just means the shard is redownloaded
+            self.write_checkpoint(cells)
+
+        # Each cell is its own partition, so every shard holds comments from
+        # a single cell in order of creation
+        writer = store.StoreWriter(
+            self.store_path,
+            on_flush=on_flush,
+            first_shard_index=len(self.shards),
+            shard_size=compile_params.get("shard_size", store.DEFAULT_SHARD_SIZE),
+            codec=compile_params.get("codec", store.DEFAULT_CODEC),
+        )
+
+        # The number of comments to come isn't known, so this reports the
+        # number downloaded and the download rate
+        reporter = (
+            util.ProgressReporter(progress_cb, initial=self.document_count)
+            if progress_cb is not None
+            else None
+        )
+
+        def on_batch(
+            cell_index: int, batch: Optional[List[store.CommentRecord]]
+        ) -> None:
+            if batch is None:
+                writer.flush(cell_index)
+                cells[cell_index]["done"] = True
+                self.write_checkpoint(cells)
+                return
+            for record in batch:
+                if record.created_utc != latest_utc.get(cell_index):
+                    latest_utc[cell_index] = record.created_utc
+                    latest_ids[cell_index] = []
+                latest_ids[cell_index].append(record.id)
+                pending_stats.setdefault(cell_index, CorpusStats()).add(record)
+                writer.append(record, cell_index)
+            if reporter is not None:
+                reporter.advance(len(batch))
+
+        fetch_cells(cells, compile_params, on_batch)
+        if reporter is not None:
+            reporter.finish()
+
+    def load_checkpoint(self) -> Optional[Dict[str, Any]]:
+        """Load the checkpoint of an interrupted download, if there is one"""
+        try:
+            with open(self.checkpoint_path, encoding="utf-8") as checkpoint_file:
+                checkpoint: Dict[str, Any] = toml.load(checkpoint_file)
+                return checkpoint
+        except FileNotFoundError:
+            return None
+
+    def write_checkpoint(self, cells: List[Dict[str, Any]]) -> None:
+        """Persist download progress. Written to a temporary file first so a
+        crash can't leave a half-written checkpoint behind."""
+        temp_path = f"{self.checkpoint_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as checkpoint_file:
+            toml.dump(
+                {
+                    "subreddits": self.subreddits,
+                    "start": int(self.start_time.timestamp()),
+                    "end": int(self.end_time.timestamp()),
+                    "cells": cells,
+                    "shards": self.shards,
+                    "stats": self.stats.to_dict(),
+                },
+                checkpoint_file,
+            )
+        os.replace(temp_path, self.checkpoint_path)
+
+    def remove_orphaned_shards(self) -> None:
+        """Delete shards written after the last checkpoint. Their comments
+        will be downloaded again."""
+        if not os.path.exists(self.store_path):
+            return
+        known = {shard["name"] for shard in self.shards}
+        for name in os.listdir(self.store_path):
+            if name not in known:
+                shutil.rmtree(os.path.join(self.store_path, name))
+
+    def add_shard(self, shard: Dict[str, Any], stats: CorpusStats) -> None:
+        """Record a newly written shard and the statistics of its documents,
+        and persist both"""
+        self.shards.append(shard)
+        self.document_count += shard["rows"]
+        self.stats.merge(stats)
+        self.stats.write(self.directory)
         self.write()
 
-    def iterate_documents(self) -> Generator[Dict[str, Any], None, None]:
+    def compute_stats(self) -> CorpusStats:
+        """Compute statistics by scanning the whole corpus, for corpora
+        compiled before statistics were collected"""
+        self.migrate()
+        stats = CorpusStats()
+        for row in store.iterate_rows(self.store_path, self.shards):
+            stats.add(store.CommentRecord(**row))
+        return stats
+
+    def migrate(self) -> None:
+        """Convert a legacy comments.pickle.gz corpus to the columnar store"""
+        if self.shards or not os.path.exists(self.comments_pickle_path):
+            return
+        self.document_count = 0
+        self.stats = CorpusStats()
+        pending_stats = CorpusStats()
+
+        def on_flush(shard: Dict[str, Any], _: Hashable) -> None:
+            nonlocal pending_stats
+            self.add_shard(shard, pending_stats)
+            pending_stats = CorpusStats()
+
+        writer = store.StoreWriter(self.store_path, on_flush=on_flush)
         with open(self.comments_pickle_path, "rb") as pickle_file:
             for comment in compress_pickle.load(pickle_file, compression="gzip"):
-                yield {
-                    "body": comment.body,
-                    "timestamp": datetime.datetime.utcfromtimestamp(
-                        comment.created_utc
-                    ),
-                    "score": comment.score,
-                    "comment ID": comment.id,
-                    "submission ID": comment.submission.id,
-                    "subreddit": comment.subreddit.name,
+                record = comment_to_record(comment)
+                pending_stats.add(record)
+                writer.append(record)
+        writer.flush()
+        os.remove(self.comments_pickle_path)
+
+    def iterate_documents(
+        self, row_filter: Optional[store.Filter] = None
+    ) -> Generator[Dict[str, Any], None, None]:
+        """Iterate through the documents stored in the corpus, optionally
+        only those matching a filter. Filtering uses the store's index, so
+        only the matching rows are read."""
+        self.migrate()
+        for row in store.iterate_rows(
+            self.store_path, self.shards, row_filter=row_filter
+        ):
+            yield {
+                "body": row["body"],
+                "timestamp": datetime.datetime.utcfromtimestamp(row["created_utc"]),
+                "score": row["score"],
+                "comment ID": row["id"],
+                "submission ID": row["link_id"],
+                "subreddit": row["subreddit"],
+            }
+
+
+class PushshiftDumpCorpus(RedditCorpus):
+    """A corpus of Reddit comments read from monthly Pushshift comment dumps
+    (zstd-compressed NDJSON, e.g. RC_2021-04.zst) on local disk instead of
+    downloaded through the API"""
+
+    corpus_type = "pushshift_dump"
+
+    def __init__(
+        self,
+        name: str,
+        dump_paths: List[str],
+        subreddits: List[str],
+        start_time: datetime.datetime,
+        end_time: datetime.datetime,
+        document_count: int = 0,
+        compiled: bool = False,
+        shards: Optional[List[Dict[str, Any]]] = None,
+    ):
+        self.dump_paths = dump_paths
+        super().__init__(
+            name,
+            subreddits=subreddits,
+            start_time=start_time,
+            end_time=end_time,
+            document_count=document_count,
+            compiled=compiled,
+            shards=shards,
+        )
+
+    @staticmethod
+    def from_dict(corpus_dict: Dict[str, Any]) -> PushshiftDumpCorpus:
+        return PushshiftDumpCorpus(
+            name=corpus_dict["name"],
+            dump_paths=corpus_dict["dump_paths"],
+            document_count=corpus_dict["document_count"],
+            subreddits=corpus_dict["subreddits"],
+            start_time=datetime.datetime.fromisoformat(corpus_dict["start_time"]),
+            end_time=datetime.datetime.fromisoformat(corpus_dict["end_time"]),
+            compiled=corpus_dict["compiled"],
+            shards=corpus_dict.get("shards"),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {**super().to_dict(), "dump_paths": self.dump_paths}
+
+    def compile(
+        self,
+        compile_params: Dict[str, Any],
+        progress_cb: Optional[Callable[[util.Progress], None]] = None,
+    ) -> None:
+        """Stream the dumps, keeping the comments from the corpus' subreddits
+        and time range. Dumps are decompressed in chunks and only a shard's
+        worth of comments is held in memory at once.
+
+        If compile_params["processes"] is more than 1, chunks are parsed and
+        filtered by that many worker processes while this one decompresses."""
+        if self.compiled:
+            return
+
+        shutil.rmtree(self.store_path, ignore_errors=True)
+        self.shards = []
+        self.document_count = 0
+        self.stats = CorpusStats()
+        self.write()
+
+        row_filter = store.Filter(
+            subreddits=self.subreddits,
+            start=int(self.start_time.timestamp()),
+            end=int(self.end_time.timestamp()),
+        )
+        dump_paths = [
+            path
+            for path in self.dump_paths
+            if dump_may_match(os.path.basename(path), row_filter)
+        ]
+        total_bytes = sum(os.path.getsize(path) for path in dump_paths) or 1
+
+        pending_stats = CorpusStats()
+
+        def on_flush(shard: Dict[str, Any], _: Hashable) -> None:
+            nonlocal pending_stats
+            self.add_shard(shard, pending_stats)
+            pending_stats = CorpusStats()
+
+        writer = store.StoreWriter(
+            self.store_path,
+            on_flush=on_flush,
+            shard_size=compile_params.get("shard_size", store.DEFAULT_SHARD_SIZE),
+            codec=compile_params.get("codec", store.DEFAULT_CODEC),
+        )
+
+        reporter = (
+            util.ProgressReporter(progress_cb, total=total_bytes, unit="bytes")
+            if progress_cb is not None
+            else None
+        )
+        bytes_done = 0
+        for path in dump_paths:
+            with open(path, "rb") as dump_file:
+                for records in parse_dump(
+                    dump_file, row_filter, compile_params.get("processes", 1)
+                ):
+                    for record in records:
+                        pending_stats.add(record)
+                        writer.append(record)
+                    if reporter is not None:
+                        reporter.update(bytes_done + dump_file.tell())
+            bytes_done += os.path.getsize(path)
+        writer.flush()
+        if reporter is not None:
+            reporter.finish()
+
+        if not self.document_count:
+            raise ValueError(
+                "No comments found. Double-check the dump files and search parameters."
+            )
+        self.compiled = True
+        self.write()
+
+    def extend(
+        self,
+        compile_params: Dict[str, Any],
+        new_end_time: Optional[datetime.datetime] = None,
+        extra_subreddits: Optional[List[str]] = None,
+        progress_cb: Optional[Callable[[util.Progress], None]] = None,
+    ) -> None:
+        raise ValueError(
+            "Corpora read from Pushshift dumps can't be extended. "
+            "Create a new corpus from the dumps instead."
+        )
+
+
+class FilteredRedditCorpus(Corpus):
+    """A lightweight view of a subset of a parent RedditCorpus, e.g. one
+    subreddit or one week. Stores no documents of its own: iterating reads
+    only the matching rows from the parent's store using its index."""
+
+    corpus_type = "filtered_reddit"
+
+    document_metadata_fields = RedditCorpus.document_metadata_fields
+
+    def __init__(
+        self,
+        name: str,
+        parent_name: str,
+        subreddits: Optional[List[str]] = None,
+        start_time: Optional[datetime.datetime] = None,
+        end_time: Optional[datetime.datetime] = None,
+        document_count: int = 0,
+        compiled: bool = False,
+        parent_shard_count: Optional[int] = None,
+    ):
+        super().__init__(name, document_count=document_count, compiled=compiled)
+        self.parent_name = parent_name
+        # None means no restriction
+        self.subreddits = subreddits
+        self.start_time = start_time
+        self.end_time = end_time
+        # Number of shards the parent had when the view was compiled. The
+        # parent's store is append-only, so a different number means it was
+        # extended and the count and statistics are stale.
+        self.parent_shard_count = parent_shard_count
+
+        self.write()
+
+    @staticmethod
+    def from_dict(corpus_dict: Dict[str, Any]) -> FilteredRedditCorpus:
+        # TOML has no null, so unrestricted fields are simply left out
+        start_time = corpus_dict.get("start_time")
+        end_time = corpus_dict.get("end_time")
+        return FilteredRedditCorpus(
+            name=corpus_dict["name"],
+            parent_name=corpus_dict["parent_name"],
+            subreddits=corpus_dict.get("subreddits"),
+            start_time=(
+                datetime.datetime.fromisoformat(start_time) if start_time else None
+            ),
+            end_time=datetime.datetime.fromisoformat(end_time) if end_time else None,
+            document_count=corpus_dict["document_count"],
+            compiled=corpus_dict["compiled"],
+            parent_shard_count=corpus_dict.get("parent_shard_count"),
+        )
+
+    def write(self) -> None:
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory, exist_ok=True)
+        corpus_dict: Dict[str, Any] = {
+            "type": FilteredRedditCorpus.corpus_type,
+            "parent_name": self.parent_name,
+            "document_count": self.document_count,
+            "compiled": self.compiled,
+        }
+        if self.subreddits is not None:
+            corpus_dict["subreddits"] = self.subreddits
+        if self.start_time is not None:
+            corpus_dict["start_time"] = self.start_time.isoformat()
+        if self.end_time is not None:
+            corpus_dict["end_time"] = self.end_time.isoformat()
+        if self.parent_shard_count is not None:
+            corpus_dict["parent_shard_count"] = self.parent_shard_count
+        with open(self.toml_path, "w", encoding="utf-8") as toml_file:
+            toml.dump(corpus_dict, toml_file)
+
+    @property
+    def row_filter(self) -> store.Filter:
+        """The filter selecting this corpus' documents from the parent"""
+        return store.Filter(
+            subreddits=self.subreddits,
+            start=int(self.start_time.timestamp()) if self.start_time else None,
+            end=int(self.end_time.timestamp()) if self.end_time else None,
+        )
+
+    def load_parent(self) -> RedditCorpus:
+        """Load the parent corpus"""
+        parent = Corpus.load(self.parent_name)
+        if not isinstance(parent, RedditCorpus):
+            raise ValueError(f'Corpus "{self.parent_name}" is not a Reddit corpus.')
+        return parent
+
+    def compile(
+        self,
+        compile_params: Dict[str, Any],
+        progress_cb: Optional[Callable[[util.Progress], None]] = None,
+    ) -> None:
+        """Count the matching documents and compute their statistics. Nothing
+        needs to be downloaded."""
+        parent = self.load_parent()
+        if not parent.compiled:
+            raise ValueError(f'Corpus "{self.parent_name}" is not compiled yet.')
+        self.count_documents(parent)
+
+    def count_documents(self, parent: RedditCorpus) -> None:
+        """Count the documents matching the filter in the parent and compute
+        their statistics"""
+        parent.migrate()
+        stats = CorpusStats()
+        for row in store.iterate_rows(
+            parent.store_path, parent.shards, row_filter=self.row_filter
+        ):
+            stats.add(store.CommentRecord(**row))
+        stats.write(self.directory)
+        self.document_count = stats.document_count
+        self.parent_shard_count = len(parent.shards)
+        self.compiled = True
+        self.write()
+
+    def refresh(self) -> None:
+        """Recount the documents if the parent has been extended since the
+        view was compiled. While an extension is still downloading, the old
+        count is kept."""
+        self.update(self.load_parent())
+
+    def update(self, parent: RedditCorpus) -> None:
+        """Recount the documents if `parent` has changed since the view was
+        compiled"""
+        if parent.compiled and len(parent.shards) != self.parent_shard_count:
+            self.count_documents(parent)
+
+    def load_stats(self) -> Optional[CorpusStats]:
+        self.refresh()
+        return super().load_stats()
+
+    def iterate_documents(self) -> Generator[Dict[str, Any], None, None]:
+        parent = self.load_parent()
+        self.update(parent)
+        return parent.iterate_documents(self.row_filter)
+
+    @property
+    def cache_directory(self) -> str:
+        """The parent's cache, since the documents are the parent's"""
+        return os.path.join(constants.corpora_path, self.parent_name, CACHE_NAME)
+
+
+class RateLimitedPushshiftAPI(PushshiftAPI):
+    """A PushshiftAPI whose requests also wait on a rate limiter that can be
+    shared with other instances in other threads"""
+
+    def __init__(self, reddit: praw.Reddit, limiter: util.RateLimiter, **kwargs: Any):
+        self.limiter = limiter
+        super().__init__(reddit, **kwargs)
+
+    def _impose_rate_limit(self, nth_request: int = 0) -> None:
+        self.limiter.wait()
+        super()._impose_rate_limit(nth_request)
+
+
+def make_pushshift_api(
+    compile_params: Dict[str, Any], limiter: util.RateLimiter
+) -> PushshiftAPI:
+    """Set up a Pushshift API client backed by praw. Neither is thread-safe,
+    so each download thread needs its own."""
+    reddit = praw.Reddit(
+        client_id=compile_params["client_id"],
+        client_secret=compile_params["client_secret"],
+        user_agent=constants.reddit_user_agent,
+        check_for_updates=False,
+        comment_kind="t1",
+        message_kind="t4",
+        redditor_kind="t2",
+        submission_kind="t3",
+        subreddit_kind="t5",
+        trophy_kind="t6",
+        oauth_url="https://oauth.reddit.com",
+        reddit_url="https://www.reddit.com",
+        short_url="https://redd.it",
+        ratelimit_seconds=5,
+        timeout=16,
+    )
+    return RateLimitedPushshiftAPI(
+        reddit,
+        limiter,
+        rate_limit_per_minute=compile_params.get(
+            "requests_per_minute", DEFAULT_REQUESTS_PER_MINUTE
+        ),
+    )
+
+
+def fetch_cells(
+    cells: List[Dict[str, Any]],
+    compile_params: Dict[str, Any],
+    on_batch: Callable[[int, Optional[List[store.CommentRecord]]], None],
+) -> None:
+    """Download all unfinished cells on a bounded pool of worker threads that
+    share one rate limiter.
+
+    `on_batch` is called in the calling thread with (cell index, records) as
+    batches of records arrive, and with (cell index, None) once a cell has
+    been fully downloaded. Batches from a single cell arrive in order. If a
+    worker fails, the others are stopped and its exception is raised here."""
+    workers = compile_params.get("workers", DEFAULT_WORKERS)
+    limiter = util.RateLimiter(
+        60 / compile_params.get("requests_per_minute", DEFAULT_REQUESTS_PER_MINUTE)
+    )
+    # Bounded so that memory use stays flat if downloads outpace writes
+    results: queue.Queue[Tuple[int, Any]] = queue.Queue(maxsize=workers * 4)
+    stop = threading.Event()
+    thread_local = threading.local()
+
+    def put(item: Tuple[int, Any]) -> None:
+        while not stop.is_set():
+            try:
+                results.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def fetch(cell_index: int) -> None:
+        if stop.is_set():
+            return
+        try:
+            if not hasattr(thread_local, "api"):
+                thread_local.api = make_pushshift_api(compile_params, limiter)
+            batch = []
+            for record in download_cell(thread_local.api, cells[cell_index]):
+                if stop.is_set():
+                    return
+                batch.append(record)
+                if len(batch) >= FETCH_BATCH_SIZE:
+                    put((cell_index, batch))
+                    batch = []
+            put((cell_index, batch))
+            put((cell_index, None))
+        except Exception as error:  # pylint: disable=broad-except
+            put((cell_index, error))
+
+    pending = [index for index, cell in enumerate(cells) if not cell["done"]]
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        for cell_index in pending:
+            executor.submit(fetch, cell_index)
+        remaining = len(pending)
+        while remaining:
+            cell_index, item = results.get()
+            if isinstance(item, Exception):
+                raise item
+            if item is None:
+                remaining -= 1
+            on_batch(cell_index, item)
+    finally:
+        stop.set()
+        executor.shutdown(wait=True)
+
+
+def make_cells(
+    subreddits: List[str], start_epoch: int, end_epoch: int, window_seconds: int
+) -> List[Dict[str, Any]]:
+    """Split a download into (subreddit, time window) cells. Each cell covers
+    comments created in [start, end) and tracks its own progress."""
+    cells = []
+    for subreddit in subreddits:
+        for window_start in range(start_epoch, end_epoch, window_seconds):
+            cells.append(
+                {
+                    "subreddit": subreddit,
+                    "start": window_start,
+                    "end": min(window_start + window_seconds, end_epoch),
+                    "done": False,
                 }
+            )
+    return cells
+
+
+def download_cell(
+    api: PushshiftAPI, cell: Dict[str, Any]
+) -> Generator[store.CommentRecord, None, None]:
+    """Download the comments in a cell in order of creation, starting from
+    the cell's cursor if it has one"""
+
+    # Pushshift's `after` and `before` are exclusive. Comments created at
+    # the cursor itself are fetched again and the ones already stored are
+    # skipped, since not all comments sharing that timestamp may have been
+    # stored yet.
+    if "cursor" in cell:
+        after = cell["cursor"] - 1
+        current_utc = cell["cursor"]
+        seen = set(cell["cursor_ids"])
+    else:
+        after = cell["start"] - 1
+        current_utc = None
+        seen = set()
+
+    for comment in api.search_comments(
+        after=after,
+        before=cell["end"],
+        subreddit=cell["subreddit"],
+        sort="asc",
+        sort_type="created_utc",
+    ):
+        record = comment_to_record(comment)
+        # Comments arrive in order of creation, so any duplicates (e.g. at
+        # page boundaries) share a timestamp and only the IDs seen at the
+        # current timestamp need to be remembered
+        if record.created_utc != current_utc:
+            current_utc = record.created_utc
+            seen = set()
+        elif record.id in seen:
+            continue
+        seen.add(record.id)
+        yield record
+
+
+def comment_to_record(comment: praw.models.Comment) -> store.CommentRecord:
+    """Flatten a praw comment into a plain record. Only reads attributes
+    that Pushshift already populated, so this never triggers an API request."""
+    return store.CommentRecord(
+        body=comment.body,
+        created_utc=int(comment.created_utc),
+        score=comment.score,
+        id=comment.id,
+        # link_id is the submission's fullname, e.g. "t3_abc123"
+        link_id=comment.link_id.split("_")[-1],
+        subreddit=comment.subreddit.display_name,
+        author=comment.author.name if comment.author else "",
+        parent_id=comment.parent_id,
+    )
+
+
+def dump_may_match(file_name: str, row_filter: store.Filter) -> bool:
+    """Whether a monthly dump with the given file name may contain comments
+    in the filter's time range. Dumps not named like RC_YYYY-MM are always
+    read."""
+    match = DUMP_NAME_PATTERN.search(file_name)
+    if match is None:
+        return True
+    year, month = int(match.group(1)), int(match.group(2))
+    month_start = datetime.datetime(year, month, 1, tzinfo=datetime.timezone.utc)
+    month_end = datetime.datetime(
+        year + month // 12, month % 12 + 1, 1, tzinfo=datetime.timezone.utc
+    )
+    return store.Filter(start=row_filter.start, end=row_filter.end).matches_summary(
+        {
+            "min_created_utc": int(month_start.timestamp()),
+            "max_created_utc": int(month_end.timestamp()) - 1,
+        }
+    )
+
+
+def iterate_dump_chunks(dump_file: BinaryIO) -> Generator[bytes, None, None]:
+    """Decompress a zstd-compressed NDJSON dump into chunks of about
+    DUMP_CHUNK_SIZE bytes, each ending at a line break"""
+    reader = zstandard.ZstdDecompressor(
+        max_window_size=DUMP_MAX_WINDOW_SIZE
+    ).stream_reader(dump_file)
+    remainder = b""
+    while True:
+        data = reader.read(DUMP_CHUNK_SIZE)
+        if not data:
+            break
+        data = remainder + data
+        end = data.rfind(b"\n") + 1
+        remainder = data[end:]
+        if end:
+            yield data[:end]
+    if remainder:
+        yield remainder
+
+
+def parse_dump_chunk(
+    chunk: bytes, row_filter: store.Filter
+) -> List[store.CommentRecord]:
+    """Parse the comments in a chunk of NDJSON, keeping the ones matching a
+    filter"""
+    subreddits = (
+        None
+        if row_filter.subreddits is None
+        else {subreddit.lower() for subreddit in row_filter.subreddits}
+    )
+    records = []
+    for line in chunk.splitlines():
+        if not line.strip():
+            continue
+        comment = json.loads(line)
+        # Some older dumps store timestamps as strings
+        created_utc = int(comment["created_utc"])
+        if row_filter.start is not None and created_utc < row_filter.start:
+            continue
+        if row_filter.end is not None and created_utc >= row_filter.end:
+            continue
+        if subreddits is not None and comment["subreddit"].lower() not in subreddits:
+            continue
+        records.append(dump_comment_to_record(comment, created_utc))
+    return records
+
+
+def parse_dump(
+    dump_file: BinaryIO, row_filter: store.Filter, processes: int = 1
+) -> Generator[List[store.CommentRecord], None, None]:
+    """Decompress a dump and yield the matching comments of each chunk, in
+    order. With more than one process, chunks are parsed in a pool of worker
+    processes; at most two chunks per worker are in flight at once, so memory
+    use stays bounded."""
+    chunks = iterate_dump_chunks(dump_file)
+    if processes <= 1:
+        for chunk in chunks:
+            yield parse_dump_chunk(chunk, row_filter)
+        return
+
+    with multiprocessing.Pool(processes) as pool:
+        in_flight: Deque[multiprocessing.pool.AsyncResult[List[store.CommentRecord]]]
+        in_flight = deque()
+        for chunk in chunks:
+            in_flight.append(pool.apply_async(parse_dump_chunk, (chunk, row_filter)))
+            if len(in_flight) >= processes * 2:
+                yield in_flight.popleft().get()
+        while in_flight:
+            yield in_flight.popleft().get()
+
+
+def dump_comment_to_record(
+    comment: Dict[str, Any], created_utc: int
+) -> store.CommentRecord:
+    """Flatten a comment from a Pushshift dump into a plain record, the same
+    way comment_to_record does for comments from the API"""
+    author = comment.get("author") or ""
+    return store.CommentRecord(
+        body=comment["body"],
+        created_utc=created_utc,
+        score=int(comment.get("score") or 0),
+        id=comment["id"],
+        link_id=comment["link_id"].split("_")[-1],
+        subreddit=comment["subreddit"],
+        # praw reports deleted authors as None, which is stored as ""
+        author="" if author == "[deleted]" else author,
+        parent_id=comment.get("parent_id") or "",
+    )
@@ -2,30 +2,344 @@
 
 from __future__ import annotations
 
+import array
 import shutil
 import os
 import glob
-from typing import Callable, Dict, Iterable, List, Optional
+import itertools
+import multiprocessing
+import multiprocessing.pool
+import uuid
+from typing import (
+    Any,
+    Callable,
+    DefaultDict,
+    Deque,
+    Dict,
+    Generator,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    TypeVar,
+    Union,
+)
 import csv
-from collections import defaultdict, Counter
+from collections import defaultdict, deque, Counter
 
-import en_core_web_sm
+import numpy as np
 import pandas as pd
 import rtoml as toml
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 
 import pognlp.util as util
-from pognlp.analyze import get_analyzer
+from pognlp.analyze import (
+    MultiLexiconSentimentIntensityAnalyzer,
+    get_multi_analyzer,
+    lexicon_content_hash,
+)
+from pognlp.batch_vader import SCORE_FIELDS, BatchSentimentScorer, get_batch_scorer
 import pognlp.constants as constants
+from pognlp.document_cache import (
+    KEY_DTYPE,
+    DocumentCache,
+    PendingResults,
+    document_key,
+    prune_score_tables,
+)
 from pognlp.model.corpus import Corpus
 from pognlp.model.lexicon import DefaultLexicon, Lexicon
+from pognlp.lemmatize import Lemmatizer, LemmatizerUnavailableError
+from pognlp.phrase_matcher import PhraseMatcher
+from pognlp.results_cache import results_cache
+from pognlp.results_table import (
+    COLUMNS_NAME,
+    SCORE_COLUMNS,
+    ResultsTable,
+    ResultsWriter,
+    column_kinds,
+    write_tsv,
+)
+from pognlp.rollups import Rollups
+from pognlp.sketches import DEFAULT_QUANTILES, Sketches
+from pognlp.run_state import RunState, make_documents
 
 TOML_NAME = "report.toml"
+RESULTS_NAME = "results"
+# Where results were stored before they were columnar
 OUTPUT_NAME = "output.tsv"
 FREQUENCY_NAME = "frequency.tsv"
 
 DELIMITER = "\t"
 
+# Number of documents spaCy lemmatizes at once
+DEFAULT_BATCH_SIZE = 256
+
+# Number of documents sent to a worker process at a time
+CHUNK_SIZE = 2000
+
+# Length of a document's key in the document cache
+KEY_SIZE = np.dtype(KEY_DTYPE).itemsize
+
+# Ways of computing VADER scores: "vader" scores one document at a time with
+# VADER's own rules, "numpy" scores batches of documents at once with a
+# vectorized port of them (see pognlp.batch_vader for how close it is)
+BACKENDS = ("vader", "numpy")
+
+T = TypeVar("T")
+
+
+class PartialResult(NamedTuple):
+    """What a worker process returns for a chunk of documents"""
+
+    rows: List[Dict[str, Any]]
+    frequencies: Counter[str]
+    token_count: int
+    # New results for the main process to add to the document cache
+    pending: Optional[PendingResults]
+    # Keys of the documents, concatenated, and their numbers of tokens
+    document_keys: bytes
+    document_token_counts: Sequence[int]
+
+
+class DocumentAnalyzer:
+    """Lemmatizes and scores documents, producing output rows and counting
+    the lexicon entries and tokens seen so far. Loading spaCy and the
+    analyzers is expensive, so each process makes just one of these.
+
+    With a `cache_directory`, lemmas and scores already in the document
+    cache there are reused, and new ones are added to it. Without
+    `lemmatize`, documents are only scored, and no tokens or lexicon entries
+    are counted."""
+
+    def __init__(
+        self,
+        lexica: Dict[str, Union[Lexicon, DefaultLexicon]],
+        metadata_fields: List[str],
+        lexicon_matcher: PhraseMatcher,
+        include_body: bool,
+        backend: str = "vader",
+        lemmatizer: Union[str, Lemmatizer] = "rule",
+        cache_directory: Optional[str] = None,
+        lemmatize: bool = True,
+    ):
+        if backend not in BACKENDS:
+            raise ValueError(
+                f'Unknown backend "{backend}". Choose one of {", ".join(BACKENDS)}.'
+            )
+        self.lexica = lexica
+        self.metadata_fields = metadata_fields
+        # Counts lemmatized lexicon entries, keyed by their space-joined lemmas
+        self.lexicon_matcher = lexicon_matcher
+        self.include_body = include_body
+        self.backend = backend
+        # Use Spacy for lemmatization, see pognlp.lemmatize for the modes.
+        # Analyzers in the same process can share one Lemmatizer.
+        self.lemmatizer = (
+            lemmatizer if isinstance(lemmatizer, Lemmatizer) else Lemmatizer(lemmatizer)
+        )
+        self.lemmatize = lemmatize
+        # Lexicon names -> scorer for just those lexica. Either kind scores
+        # documents with all of its lexica in one pass.
+        self.scorers: Dict[
+            Tuple[str, ...],
+            Union[MultiLexiconSentimentIntensityAnalyzer, BatchSentimentScorer],
+        ] = {}
+        self.cache: Optional[DocumentCache] = None
+        if cache_directory is not None:
+            self.cache = DocumentCache(
+                cache_directory,
+                self.lemmatizer.version,
+                {
+                    name: f"{backend}-{lexicon_content_hash(lexicon)}"
+                    for name, lexicon in lexica.items()
+                },
+            )
+        self.frequencies = Counter[str]()
+        # the total word count for relative frequency counts
+        self.token_count = 0
+        # Each document's key and number of tokens, for the report's RunState
+        self.document_keys = bytearray()
+        self.document_token_counts = array.array("q")
+
+    def analyze(
+        self,
+        documents: Iterable[Dict[str, Any]],
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        n_process: int = 1,
+    ) -> Generator[Dict[str, Any], None, None]:
+        """Yield an output row for each document, in order"""
+        # Each document rides along with its body through the pipeline, so it
+        # stays paired with its doc however spaCy batches or distributes them.
+        # Documents whose lemmas are cached pass an empty text instead.
+        docs = self.lemmatizer.nlp.pipe(
+            self.with_cached_lemmas(documents, batch_size),
+            as_tuples=True,
+            batch_size=batch_size,
+            n_process=n_process,
+        )
+        for batch in iterate_chunks(docs, batch_size):
+            keys = [key for _, (_, key, _) in batch]
+            all_scores = self.score_cached(
+                keys, [document["body"] for _, (document, _, _) in batch]
+            )
+            for (doc, (document, key, lemmas)), scores_by_lexicon in zip(
+                batch, all_scores
+            ):
+                if lemmas is None:
+                    lemmas = self.lemmatizer.lemmas(doc)
+                    if self.cache is not None:
+                        self.cache.lemmas.add(key, lemmas)
+                self.token_count += len(lemmas)
+                self.lexicon_matcher.count(lemmas, self.frequencies)
+                self.document_keys += key
+                self.document_token_counts.append(len(lemmas))
+
+                output_row_dict = {
+                    field: document[field] for field in self.metadata_fields
+                }
+                if self.include_body:
+                    sanitized_body = (
+                        document["body"].replace("\n", " ").replace("\t", " ")
+                    )
+                    output_row_dict["body"] = sanitized_body
+                for lexicon_name, scores in scores_by_lexicon.items():
+                    for score, column in SCORE_COLUMNS.items():
+                        output_row_dict[f"{lexicon_name} {column}"] = scores[score]
+
+                yield output_row_dict
+
+    def with_cached_lemmas(
+        self, documents: Iterable[Dict[str, Any]], batch_size: int
+    ) -> Generator[
+        Tuple[str, Tuple[Dict[str, Any], bytes, Optional[List[str]]]], None, None
+    ]:
+        """Pair each document with the text to lemmatize, and with its cache
+        key and cached lemmas, if any"""
+        for batch in iterate_chunks(documents, batch_size):
+            keys = [
+                document_key(document.get("comment ID", ""), document["body"])
+                for document in batch
+            ]
+            all_lemmas: List[Optional[List[str]]]
+            if not self.lemmatize:
+                all_lemmas = [[] for _ in batch]
+            elif self.cache is not None:
+                all_lemmas = self.cache.lemmas.lookup(keys)
+            else:
+                all_lemmas = [None] * len(batch)
+            for document, key, lemmas in zip(batch, keys, all_lemmas):
+                text = document["body"] if lemmas is None else ""
+                yield text, (document, key, lemmas)
+
+    def score_cached(
+        self, keys: List[bytes], bodies: List[str]
+    ) -> List[Dict[str, Dict[str, float]]]:
+        """Get the VADER scores of each document for each lexicon, by name,
+        scoring each document with just the lexica it has no cached scores
+        for"""
+        names = list(self.lexica)
+        cached = {
+            name: (
+                self.cache.scores[name].lookup(keys)
+                if self.cache is not None
+                else [None] * len(keys)
+            )
+            for name in names
+        }
+        # Group documents by the lexica they need scores for
+        missing: DefaultDict[Tuple[str, ...], List[int]] = defaultdict(list)
+        for i in range(len(keys)):
+            missing_names = tuple(name for name in names if cached[name][i] is None)
+            if missing_names:
+                missing[missing_names].append(i)
+
+        all_scores: List[Dict[str, Dict[str, float]]] = [{} for _ in keys]
+        for name, cached_scores in cached.items():
+            for scores_by_lexicon, cached_value in zip(all_scores, cached_scores):
+                if cached_value is not None:
+                    scores_by_lexicon[name] = dict(zip(SCORE_FIELDS, cached_value))
+        for missing_names, indices in missing.items():
+            new_scores = self.score([bodies[i] for i in indices], missing_names)
+            for i, scores_by_lexicon in zip(indices, new_scores):
+                all_scores[i].update(scores_by_lexicon)
+                if self.cache is None:
+                    continue
+                for name, new_value in scores_by_lexicon.items():
+                    pos, neu, neg, compound = (
+                        new_value[field] for field in SCORE_FIELDS
+                    )
+                    self.cache.scores[name].add(keys[i], (pos, neu, neg, compound))
+        # Lexicon order, as in the output columns
+        return [{name: scores[name] for name in names} for scores in all_scores]
+
+    def score(
+        self, bodies: List[str], names: Tuple[str, ...]
+    ) -> List[Dict[str, Dict[str, float]]]:
+        """Get the VADER scores of each document for each of the named
+        lexica, by name"""
+        scorer = self.scorers.get(names)
+        if scorer is None:
+            lexica = {name: self.lexica[name] for name in names}
+            if self.backend == "numpy":
+                scorer = get_batch_scorer(lexica)
+            else:
+                scorer = get_multi_analyzer(lexica)
+            self.scorers[names] = scorer
+        if isinstance(scorer, MultiLexiconSentimentIntensityAnalyzer):
+            return [scorer.polarity_scores_multi(body) for body in bodies]
+        return [
+            {
+                name: dict(zip(SCORE_FIELDS, lexicon_scores))
+                for name, lexicon_scores in zip(names, document_scores)
+            }
+            for document_scores in scorer.score_batch(bodies).tolist()
+        ]
+
+
+# The DocumentAnalyzer of a worker process, or why it couldn't be made
+_worker_analyzer: Optional[DocumentAnalyzer] = None
+_worker_error: Optional[Exception] = None
+
+
+def _init_worker(*args: Any) -> None:
+    global _worker_analyzer, _worker_error  # pylint: disable=global-statement
+    # A pool replaces workers whose initializer fails, forever, so the error
+    # is raised by each task instead, which passes it on to the parent
+    try:
+        _worker_analyzer = DocumentAnalyzer(*args)
+    except Exception as error:  # pylint: disable=broad-except
+        _worker_error = error
+
+
+def _analyze_chunk(documents: List[Dict[str, Any]], batch_size: int) -> PartialResult:
+    if _worker_error is not None:
+        raise _worker_error
+    assert _worker_analyzer is not None
+    _worker_analyzer.frequencies = Counter[str]()
+    _worker_analyzer.token_count = 0
+    _worker_analyzer.document_keys = bytearray()
+    _worker_analyzer.document_token_counts = array.array("q")
+    rows = list(_worker_analyzer.analyze(documents, batch_size))
+    cache = _worker_analyzer.cache
+    return PartialResult(
+        rows,
+        _worker_analyzer.frequencies,
+        _worker_analyzer.token_count,
+        cache.take_pending() if cache is not None else None,
+        bytes(_worker_analyzer.document_keys),
+        _worker_analyzer.document_token_counts,
+    )
+
+
+def iterate_chunks(items: Iterable[T], size: int) -> Generator[List[T], None, None]:
+    """Group items into lists of `size` (the last one may be shorter)"""
+    iterator = iter(items)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
 
 class Report:
     """A pairing of a corpus and a set of lexica used to analyze that corpus"""
@@ -36,17 +350,25 @@ class Report:
         corpus_name: str,
         lexicon_names: List[str],
         complete: bool = False,
+        lemmatizer: Optional[str] = None,
+        run_id: Optional[str] = None,
     ):
         self.name = name
         self.corpus_name = corpus_name
         self.lexicon_names = lexicon_names
         self.complete = complete
+        # Lemmatization mode of the last run, see pognlp.lemmatize
+        self.lemmatizer = lemmatizer
+        # Changes every time a run completes, see pognlp.results_cache
+        self.run_id = run_id
         self.in_progress = util.Observable[bool](False)
 
-        # None when no run in progress
-        self.progress = util.Observable[int](0)
+        # None when no run in progress. Updated at most once per percent or
+        # util.DEFAULT_PROGRESS_INTERVAL.
+        self.progress = util.Observable[Optional[util.Progress]](None)
         self.directory = os.path.join(constants.reports_path, name)
         self.toml_path = os.path.join(self.directory, TOML_NAME)
+        self.results_path = os.path.join(self.directory, RESULTS_NAME)
         self.output_path = os.path.join(self.directory, OUTPUT_NAME)
         self.frequency_path = os.path.join(self.directory, FREQUENCY_NAME)
         self.write()
@@ -75,23 +397,62 @@ class Report:
             "lexicon_names": self.lexicon_names,
             "complete": self.complete,
         }
+        # TOML has no null
+        if self.lemmatizer is not None:
+            report_dict["lemmatizer"] = self.lemmatizer
+        if self.run_id is not None:
+            report_dict["run_id"] = self.run_id
         with open(self.toml_path, "w", encoding="utf-8") as toml_file:
             toml.dump(report_dict, toml_file)
 
     def delete(self) -> None:
         """Delete a report"""
+        results_cache.discard(self.directory)
         shutil.rmtree(self.directory)
 
     def run(
         self,
         include_body: bool = False,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        n_process: int = 1,
+        processes: int = 1,
+        backend: str = "vader",
+        lemmatizer: str = "rule",
+        use_cache: bool = True,
+        incremental: bool = False,
     ) -> None:
         """Run the report
 
         Where the magic happens. For each lexicon, get sentiment scores for
         each document in the corpus and count the frequency of each word in the
-        lexicon. Store results in TSV files on disk in the report's directory.
-        Optionally include the body of each document in the report's output."""
+        lexicon. Store the results in a results table (see
+        pognlp.results_table) and the frequencies in a TSV file in the
+        report's directory. Optionally include the body of each document in
+        the report's output.
+
+        Documents are lemmatized by spaCy in batches of `batch_size`, using
+        `n_process` processes. Alternatively, if `processes` is more than 1,
+        the corpus is split into chunks that are lemmatized and scored by
+        that many worker processes, and their results are merged in order.
+        Either way, the output is the same.
+
+        `backend` is one of BACKENDS and picks how VADER scores are computed.
+        `lemmatizer` is one of pognlp.lemmatize.LEMMATIZERS and picks how
+        documents and lexicon entries are lemmatized for frequency counts.
+
+        With `use_cache`, lemmas and scores are reused from the corpus'
+        document cache where possible, and new ones are added to it, so
+        re-running a report only analyzes what changed. Afterwards, cached
+        scores of lexica no report uses any more are deleted.
+
+        With `incremental`, if the last run completed with the same settings,
+        its output is brought up to date instead of being made from scratch;
+        see run_incremental."""
+
+        previous_state = None
+        if incremental and self.complete:
+            self.migrate()
+            previous_state = RunState.load(self.directory)
 
         self.in_progress.set(True)
 
@@ -100,129 +461,577 @@ class Report:
 
         try:
             corpus = Corpus.load(self.corpus_name)
+            corpus.refresh()
+            lexica = {
+                lexicon_name: Lexicon.load(lexicon_name)
+                for lexicon_name in self.lexicon_names
+            }
+            # Everything besides the corpus and lexica that the output depends on
+            settings = {
+                "include_body": include_body,
+                "backend": backend,
+                "lemmatizer": lemmatizer,
+                "metadata_fields": corpus.document_metadata_fields,
+            }
+            cache_directory = corpus.cache_directory if use_cache else None
+            reporter = util.ProgressReporter(
+                self.progress.set, total=corpus.document_count
+            )
+            if previous_state is not None and previous_state.settings == settings:
+                state = self.run_incremental(
+                    corpus,
+                    lexica,
+                    settings,
+                    previous_state,
+                    batch_size,
+                    cache_directory,
+                    reporter,
+                )
+            else:
+                state = self.run_full(
+                    corpus,
+                    lexica,
+                    settings,
+                    batch_size,
+                    n_process,
+                    processes,
+                    cache_directory,
+                    reporter,
+                )
+            state.write(self.directory)
+            if cache_directory is not None:
+                prune_score_tables(cache_directory, Report.lexicon_hashes_in_use())
+            reporter.finish()
+        except LemmatizerUnavailableError as error:
+            alternative = (
+                ' or switch back to "rule" lemmatization'
+                if lemmatizer != "rule"
+                else ""
+            )
+            raise ValueError(
+                f'Can\'t lemmatize in "{lemmatizer}" mode: {error}. '
+                f"Install it{alternative}."
+            ) from error
+        finally:
+            self.progress.set(None)
+            self.in_progress.set(False)
 
-            output_fieldnames = [*corpus.document_metadata_fields]
-            analyzers: Dict[str, SentimentIntensityAnalyzer] = {}
-            if include_body:
-                output_fieldnames.insert(0, "body")
+        self.complete = True
+        self.lemmatizer = lemmatizer
+        self.run_id = uuid.uuid4().hex
 
-            frequencies = Counter[str]()
-            frequency_fieldnames = [
-                "lemmatized word",
-                "lexicon name",
-                "frequency per 10,000",
-            ]
+        self.write()
+
+    @staticmethod
+    def lexicon_hashes_in_use() -> Set[str]:
+        """Content hashes of the lexica of every report, as they are now"""
+        lexicon_names = set()
+        for report_name in Report.ls():
+            try:
+                lexicon_names.update(Report.load(report_name).lexicon_names)
+            except FileNotFoundError:
+                # Deleted meanwhile
+                continue
+        lexicon_hashes = set()
+        for lexicon_name in lexicon_names:
+            try:
+                lexicon_hashes.add(lexicon_content_hash(Lexicon.load(lexicon_name)))
+            except FileNotFoundError:
+                continue
+        return lexicon_hashes
+
+    def run_full(
+        self,
+        corpus: Corpus,
+        lexica: Dict[str, Union[Lexicon, DefaultLexicon]],
+        settings: Dict[str, Any],
+        batch_size: int,
+        n_process: int,
+        processes: int,
+        cache_directory: Optional[str],
+        reporter: util.ProgressReporter,
+    ) -> RunState:
+        """Analyze every document and write the output from scratch"""
+        frequencies = Counter[str]()
+
+        # Counts all lexica's entries, multi-word ones included, in one
+        # pass over each document
+        lexicon_matcher = PhraseMatcher()
 
-            # To get a meaningful frequency count, lemmatize the words before
-            # counting them. Lemmatization reduces a word to its base form. See
-            # https://en.wikipedia.org/wiki/Lemmatisation.
-
-            # Keep track of the set of lexica that each lemma belongs to. Lambda is
-            # necessary here since defaultdict expects a factory function, and
-            # anyways we need a separate instance of set for each key
-            # pylint: disable=unnecessary-lambda
-            lexicon_lemmas = defaultdict(lambda: set())
-
-            # the set of all lemmas
-            all_lexicon_lemmas = set()
-
-            # the total word count in the corpus for relative frequency counts
-            total_token_count = 0
-
-            # Use Spacy for lemmatization
-            nlp = en_core_web_sm.load(disable=["parser", "ner"])
-
-            for lexicon_name in self.lexicon_names:
-                lexicon = Lexicon.load(lexicon_name)
-                analyzer = get_analyzer(lexicon)
-                analyzers[lexicon_name] = analyzer
-                output_fieldnames.append(f"{lexicon_name} positive")
-                output_fieldnames.append(f"{lexicon_name} neutral")
-                output_fieldnames.append(f"{lexicon_name} negative")
-                output_fieldnames.append(f"{lexicon_name} compound")
-                if not isinstance(lexicon, DefaultLexicon):
-                    for word in lexicon.words:
-                        lemmatized = " ".join(
-                            token.lemma_ for token in nlp(word.string)
-                        ).lower()
-                        lexicon_lemmas[lexicon_name].add(lemmatized)
-                        all_lexicon_lemmas.add(lemmatized)
-
-            # Open both output TSV files for writing
-            with open(self.output_path, "w", encoding="utf-8") as output_file, open(
-                self.frequency_path, "w", encoding="utf-8"
-            ) as frequency_file:
-                output_writer = csv.DictWriter(
-                    output_file, fieldnames=output_fieldnames, delimiter=DELIMITER
+        # the total word count in the corpus for relative frequency counts
+        total_token_count = 0
+
+        analyzer_args = (
+            lexica,
+            corpus.document_metadata_fields,
+            lexicon_matcher,
+            settings["include_body"],
+            settings["backend"],
+            settings["lemmatizer"],
+            cache_directory,
+        )
+        analyzer = DocumentAnalyzer(*analyzer_args)
+
+        lexicon_entries = self.lemmatize_lexica(analyzer.lemmatizer, lexica, batch_size)
+        for entries in lexicon_entries.values():
+            for lemmatized, lemmas in entries.items():
+                lexicon_matcher.add(lemmas, lemmatized)
+
+        document_keys = bytearray()
+        document_token_counts = array.array("q")
+        rollups = Rollups(list(lexica))
+        sketches = Sketches(list(lexica))
+        with ResultsWriter(
+            self.results_path,
+            self.output_columns(corpus, lexica, settings),
+            on_flush=(rollups.add_block, sketches.add_block),
+        ) as output_writer:
+            if processes > 1:
+                results = self.run_in_pool(
+                    corpus.iterate_documents(),
+                    processes,
+                    batch_size,
+                    analyzer_args,
+                    reporter,
                 )
-                output_writer.writeheader()
+                for result in results:
+                    for output_row_dict in result.rows:
+                        output_writer.append(output_row_dict)
+                    frequencies.update(result.frequencies)
+                    total_token_count += result.token_count
+                    document_keys += result.document_keys
+                    document_token_counts.extend(result.document_token_counts)
+                    # Only this process writes to the cache
+                    if analyzer.cache is not None and result.pending is not None:
+                        analyzer.cache.add_pending(result.pending)
+            else:
+                rows = analyzer.analyze(
+                    corpus.iterate_documents(), batch_size, n_process
+                )
+                for index, output_row_dict in enumerate(rows):
+                    output_writer.append(output_row_dict)
+                    reporter.update(index + 1)
+                frequencies = analyzer.frequencies
+                total_token_count = analyzer.token_count
+                document_keys = analyzer.document_keys
+                document_token_counts = analyzer.document_token_counts
+
+        if analyzer.cache is not None:
+            analyzer.cache.flush()
+
+        counts = {
+            lexicon_name: {lemma: frequencies[lemma] for lemma in entries}
+            for lexicon_name, entries in lexicon_entries.items()
+        }
+        self.write_frequencies(counts, total_token_count)
+        rollups.write(self.directory)
+        sketches.write(self.directory)
+        return RunState(
+            settings,
+            {name: lexicon_content_hash(lexicon) for name, lexicon in lexica.items()},
+            counts,
+            make_documents(bytes(document_keys), document_token_counts),
+        )
+
+    def run_incremental(
+        self,
+        corpus: Corpus,
+        lexica: Dict[str, Union[Lexicon, DefaultLexicon]],
+        settings: Dict[str, Any],
+        previous_state: RunState,
+        batch_size: int,
+        cache_directory: Optional[str],
+        reporter: util.ProgressReporter,
+    ) -> RunState:
+        """Bring the output of the last run up to date: analyze documents
+        added to the corpus since, score the other documents with just the
+        lexica added or edited since, and drop lexica removed since. Everything
+        else is copied from the last run's results table, so this takes about
+        as long as reading the corpus and the results, plus analyzing what
+        changed.
+
+        Documents that were in the corpus before keep their rows as long as
+        they keep their order, as they do in corpora that grow by appending.
+        Others are analyzed again. If documents were removed, their lexicon
+        frequencies can't be subtracted, so every lexicon's entries are
+        counted again, from cached lemmas where possible. Always runs in one
+        process."""
+        lexicon_hashes = {
+            name: lexicon_content_hash(lexicon) for name, lexicon in lexica.items()
+        }
+        changed = [
+            name
+            for name in lexica
+            if previous_state.lexicon_hashes.get(name) != lexicon_hashes[name]
+        ]
 
-                frequency_writer = csv.DictWriter(
-                    frequency_file, fieldnames=frequency_fieldnames, delimiter=DELIMITER
+        old_documents = previous_state.documents
+        positions = self.find_previous_rows(corpus, old_documents["key"])
+        reused_count = sum(1 for position in positions if position >= 0)
+        recounted = list(lexica) if reused_count < len(old_documents) else changed
+
+        lemmatizer = Lemmatizer(settings["lemmatizer"])
+        lexicon_entries = self.lemmatize_lexica(lemmatizer, lexica, batch_size)
+
+        # Analyzes new documents with every lexicon
+        new_matcher = PhraseMatcher()
+        for entries in lexicon_entries.values():
+            for lemmatized, lemmas in entries.items():
+                new_matcher.add(lemmas, lemmatized)
+        new_analyzer = DocumentAnalyzer(
+            lexica,
+            corpus.document_metadata_fields,
+            new_matcher,
+            settings["include_body"],
+            settings["backend"],
+            lemmatizer,
+            cache_directory,
+        )
+
+        # Analyzes the other documents with just the lexica that changed, if
+        # anything about them needs updating
+        old_matcher = PhraseMatcher()
+        for lexicon_name in recounted:
+            for lemmatized, lemmas in lexicon_entries[lexicon_name].items():
+                old_matcher.add(lemmas, lemmatized)
+        old_analyzer = None
+        if recounted:
+            old_analyzer = DocumentAnalyzer(
+                {name: lexica[name] for name in changed},
+                corpus.document_metadata_fields,
+                old_matcher,
+                settings["include_body"],
+                settings["backend"],
+                lemmatizer,
+                cache_directory,
+                lemmatize=any(lexicon_entries[name] for name in recounted),
+            )
+        changed_columns = [
+            f"{name} {column}" for name in changed for column in SCORE_COLUMNS.values()
+        ]
+
+        output_columns = self.output_columns(corpus, lexica, settings)
+        old_results = ResultsTable(self.results_path)
+        kept_columns = [
+            name
+            for name in output_columns
+            if name in old_results.columns and name not in changed_columns
+        ]
+        document_keys = bytearray()
+        document_token_counts = array.array("q")
+        rollups = Rollups(list(lexica))
+        sketches = Sketches(list(lexica))
+        with ResultsWriter(
+            self.results_path,
+            output_columns,
+            on_flush=(rollups.add_block, sketches.add_block),
+        ) as output_writer:
+            done = 0
+            for chunk in iterate_chunks(corpus.iterate_documents(), CHUNK_SIZE):
+                chunk_positions = positions[done : done + len(chunk)]
+                new_rows = new_analyzer.analyze(
+                    [
+                        document
+                        for document, position in zip(chunk, chunk_positions)
+                        if position < 0
+                    ],
+                    batch_size,
                 )
-                frequency_writer.writeheader()
-
-                for index, document in enumerate(corpus.iterate_documents()):
-                    doc = nlp(document["body"])
-                    for token in doc:
-                        total_token_count += 1
-                        lemma = token.lemma_.lower()
-                        if lemma in all_lexicon_lemmas:
-                            frequencies[lemma] += 1
-
-                    output_row_dict = {
-                        field: document[field]
-                        for field in corpus.document_metadata_fields
-                    }
-                    if include_body:
-                        sanitized_body = (
-                            document["body"].replace("\n", " ").replace("\t", " ")
-                        )
-                        output_row_dict["body"] = sanitized_body
-                    for lexicon_name in self.lexicon_names:
-                        scores = analyzers[lexicon_name].polarity_scores(
-                            document["body"]
-                        )
-                        output_row_dict[f"{lexicon_name} positive"] = scores["pos"]
-                        output_row_dict[f"{lexicon_name} neutral"] = scores["neu"]
-                        output_row_dict[f"{lexicon_name} negative"] = scores["neg"]
-                        output_row_dict[f"{lexicon_name} compound"] = scores["compound"]
-
-                    output_writer.writerow(output_row_dict)
-
-                    self.progress.set(int(100 * (index / (corpus.document_count or 1))))
-
-                for lexicon_name in self.lexicon_names:
-                    for lemma in lexicon_lemmas[lexicon_name]:
-                        try:
-                            relative_frequency = (
-                                frequencies[lemma] * 10000 / total_token_count
-                            )
-                        except ZeroDivisionError:
-                            relative_frequency = 0
-                        frequency_writer.writerow(
-                            {
-                                "lemmatized word": lemma,
-                                "lexicon name": lexicon_name,
-                                "frequency per 10,000": relative_frequency,
-                            }
+                old_rows = iter(
+                    old_results.take(
+                        [position for position in chunk_positions if position >= 0],
+                        kept_columns,
+                    )
+                )
+                updated_rows = (
+                    old_analyzer.analyze(
+                        [
+                            document
+                            for document, position in zip(chunk, chunk_positions)
+                            if position >= 0
+                        ],
+                        batch_size,
+                    )
+                    if old_analyzer is not None
+                    else None
+                )
+                for position in chunk_positions:
+                    if position < 0:
+                        output_writer.append(next(new_rows))
+                        document_keys += new_analyzer.document_keys[-KEY_SIZE:]
+                        document_token_counts.append(
+                            new_analyzer.document_token_counts[-1]
                         )
-        finally:
-            self.in_progress.set(False)
+                        continue
+                    row = next(old_rows)
+                    if updated_rows is not None:
+                        updated_row = next(updated_rows)
+                        for column in changed_columns:
+                            row[column] = updated_row[column]
+                    output_writer.append(row)
+                    document_keys += old_documents["key"][
+                        position : position + 1
+                    ].tobytes()
+                    document_token_counts.append(
+                        int(old_documents["token_count"][position])
+                    )
+                done += len(chunk)
+                reporter.update(done)
+            # The new table replaces the old one when the writer closes
+            old_results.close()
 
-        self.complete = True
+        for analyzer in (new_analyzer, old_analyzer):
+            if analyzer is not None and analyzer.cache is not None:
+                analyzer.cache.flush()
 
-        self.write()
+        counts = {}
+        for lexicon_name, entries in lexicon_entries.items():
+            previous_counts = previous_state.counts.get(lexicon_name, {})
+            counts[lexicon_name] = {
+                lemma: new_analyzer.frequencies[lemma]
+                + (
+                    old_analyzer.frequencies[lemma]
+                    if lexicon_name in recounted and old_analyzer is not None
+                    else previous_counts.get(lemma, 0)
+                )
+                for lemma in entries
+            }
+        documents = make_documents(bytes(document_keys), document_token_counts)
+        self.write_frequencies(counts, int(documents["token_count"].sum()))
+        rollups.write(self.directory)
+        sketches.write(self.directory)
+        return RunState(settings, lexicon_hashes, counts, documents)
+
+    @staticmethod
+    def find_previous_rows(
+        corpus: Corpus, previous_keys: np.ndarray
+    ) -> array.array[int]:
+        """For each document in the corpus, the position of its row in the
+        last run's output, or -1 if it has none. Positions only increase, so
+        the last output can be read in one pass; a document whose row comes
+        before the last one found is treated as having none."""
+        order = np.argsort(previous_keys, kind="stable")
+        sorted_keys = previous_keys[order]
+        positions = array.array("q")
+        last_position = -1
+        for chunk in iterate_chunks(corpus.iterate_documents(), CHUNK_SIZE):
+            keys = np.array(
+                [
+                    document_key(document.get("comment ID", ""), document["body"])
+                    for document in chunk
+                ],
+                dtype=KEY_DTYPE,
+            )
+            if not len(sorted_keys):
+                positions.extend([-1] * len(chunk))
+                continue
+            indices = np.minimum(
+                np.searchsorted(sorted_keys, keys), len(sorted_keys) - 1
+            )
+            found = sorted_keys[indices] == keys
+            for position in np.where(found, order[indices], -1).tolist():
+                if position > last_position:
+                    positions.append(position)
+                    last_position = position
+                else:
+                    positions.append(-1)
+        return positions
+
+    @staticmethod
+    def output_columns(
+        corpus: Corpus,
+        lexica: Dict[str, Union[Lexicon, DefaultLexicon]],
+        settings: Dict[str, Any],
+    ) -> Dict[str, str]:
+        """Names and kinds (see pognlp.results_table) of the output columns"""
+        fieldnames = [*corpus.document_metadata_fields]
+        if settings["include_body"]:
+            fieldnames.insert(0, "body")
+        score_columns = [
+            f"{lexicon_name} {column}"
+            for lexicon_name in lexica
+            for column in SCORE_COLUMNS.values()
+        ]
+        return column_kinds(fieldnames + score_columns, score_columns)
+
+    @staticmethod
+    def lemmatize_lexica(
+        lemmatizer: Lemmatizer,
+        lexica: Dict[str, Union[Lexicon, DefaultLexicon]],
+        batch_size: int,
+    ) -> Dict[str, Dict[str, List[str]]]:
+        """Lemmatize each lexicon's entries. Returns, for each lexicon, its
+        entries' lemmas keyed by the lemmas joined with spaces."""
+        # To get a meaningful frequency count, lemmatize the words before
+        # counting them. Lemmatization reduces a word to its base form. See
+        # https://en.wikipedia.org/wiki/Lemmatisation.
+        lexicon_entries: Dict[str, Dict[str, List[str]]] = {}
+        for lexicon_name, lexicon in lexica.items():
+            entries: Dict[str, List[str]] = {}
+            if not isinstance(lexicon, DefaultLexicon):
+                for doc in lemmatizer.nlp.pipe(
+                    (word.string for word in lexicon.words), batch_size=batch_size
+                ):
+                    lemmas = lemmatizer.lemmas(doc)
+                    entries[" ".join(lemmas)] = lemmas
+            lexicon_entries[lexicon_name] = entries
+        return lexicon_entries
+
+    def write_frequencies(
+        self, counts: Dict[str, Dict[str, int]], total_token_count: int
+    ) -> None:
+        """Write each lexicon's entries' frequencies per 10,000 tokens, given
+        their numbers of occurrences"""
+        frequency_fieldnames = [
+            "lemmatized word",
+            "lexicon name",
+            "frequency per 10,000",
+        ]
+        with open(self.frequency_path, "w", encoding="utf-8") as frequency_file:
+            frequency_writer = csv.DictWriter(
+                frequency_file, fieldnames=frequency_fieldnames, delimiter=DELIMITER
+            )
+            frequency_writer.writeheader()
+            for lexicon_name, lexicon_counts in counts.items():
+                for lemma, count in lexicon_counts.items():
+                    try:
+                        relative_frequency = count * 10000 / total_token_count
+                    except ZeroDivisionError:
+                        relative_frequency = 0
+                    frequency_writer.writerow(
+                        {
+                            "lemmatized word": lemma,
+                            "lexicon name": lexicon_name,
+                            "frequency per 10,000": relative_frequency,
+                        }
+                    )
+
+    def run_in_pool(
+        self,
+        documents: Iterable[Dict[str, Any]],
+        processes: int,
+        batch_size: int,
+        analyzer_args: Tuple[Any, ...],
+        reporter: util.ProgressReporter,
+    ) -> Generator[PartialResult, None, None]:
+        """Split documents into chunks, analyze them in a pool of worker
+        processes, and yield the results in the original order. At most two
+        chunks per worker are in flight at once, so memory use stays bounded.
+        An exception in a worker is raised here."""
+        done = 0
+        # Don't fork: the GUI runs reports in a thread alongside Tk's
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(
+            processes, initializer=_init_worker, initargs=analyzer_args
+        ) as pool:
+            in_flight: Deque[multiprocessing.pool.AsyncResult[PartialResult]]
+            in_flight = deque()
+            for chunk in iterate_chunks(documents, CHUNK_SIZE):
+                in_flight.append(pool.apply_async(_analyze_chunk, (chunk, batch_size)))
+                if len(in_flight) >= processes * 2:
+                    result = in_flight.popleft().get()
+                    done += len(result.rows)
+                    reporter.update(done)
+                    yield result
+            while in_flight:
+                result = in_flight.popleft().get()
+                done += len(result.rows)
+                reporter.update(done)
+                yield result
+
+    def migrate(self) -> None:
+        """Convert the output.tsv of a report run before results were
+        columnar to a results table"""
+        if os.path.exists(self.results_path) or not os.path.exists(self.output_path):
+            return
+        with open(self.output_path, encoding="utf-8", newline="") as output_file:
+            reader = csv.DictReader(output_file, delimiter=DELIMITER)
+            fieldnames = reader.fieldnames or []
+            score_columns = [
+                name
+                for name in fieldnames
+                if name.rpartition(" ")[2] in SCORE_COLUMNS.values()
+            ]
+            with ResultsWriter(
+                self.results_path, column_kinds(fieldnames, score_columns)
+            ) as writer:
+                for row in reader:
+                    writer.append(row)
+        os.remove(self.output_path)
 
-    def get_results(self) -> pd.DataFrame:
-        """Return a dataframe of the report results"""
+    def get_results(self, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """Return a dataframe of the report results, with just the given
+        columns (default all). Only those columns are read from disk, and
+        only if they aren't in the results cache already."""
         if not self.complete:
             return None
+        self.migrate()
+        return results_cache.get(
+            self.directory,
+            ("results", None if columns is None else tuple(columns)),
+            self.cache_token(os.path.join(self.results_path, COLUMNS_NAME)),
+            lambda: ResultsTable(self.results_path).to_dataframe(columns),
+        )
+
+    def export_tsv(self, path: str) -> None:
+        """Write the report results to `path` as TSV"""
+        self.migrate()
+        write_tsv(ResultsTable(self.results_path), path, DELIMITER)
+
+    def get_rollups(self) -> Optional[Rollups]:
+        """Return the sentiment aggregates of the report results by hour, by
+        day and by subreddit, see pognlp.rollups"""
+        if not self.complete:
+            return None
+        rollups = Rollups.load(self.directory)
+        if rollups is None:
+            self.migrate()
+            rollups = Rollups.from_table(ResultsTable(self.results_path))
+            rollups.write(self.directory)
+        return rollups
+
+    def export_trends(self, path: str, grouping: str = "day") -> None:
+        """Write document counts and sentiment means and standard deviations
+        by bucket of a grouping (one of pognlp.rollups.GROUPINGS) to `path`
+        as TSV"""
+        rollups = self.get_rollups()
+        if rollups is None:
+            return
+        rollups.summary(grouping).to_csv(path, sep=DELIMITER)
 
-        return pd.read_csv(self.output_path, sep=DELIMITER, parse_dates=True)
+    def get_sketches(self) -> Optional[Sketches]:
+        """Return the quantile, histogram and hit rate sketches of each
+        lexicon's scores, see pognlp.sketches"""
+        if not self.complete:
+            return None
+        sketches = Sketches.load(self.directory)
+        if sketches is None:
+            self.migrate()
+            sketches = Sketches.from_table(ResultsTable(self.results_path))
+            sketches.write(self.directory)
+        return sketches
+
+    def summary(
+        self, quantiles: Sequence[float] = DEFAULT_QUANTILES
+    ) -> Optional[pd.DataFrame]:
+        """Return summary statistics of each lexicon's scores, indexed by
+        lexicon, without reading the results; see Sketches.summary"""
+        sketches = self.get_sketches()
+        if sketches is None:
+            return None
+        return sketches.summary(quantiles)
 
     def get_frequencies(self) -> pd.DataFrame:
         """Return a dataframe of the word frequencies"""
         if not self.complete:
             return None
-        return pd.read_csv(self.frequency_path, sep=DELIMITER)
+        return results_cache.get(
+            self.directory,
+            ("frequencies",),
+            self.cache_token(self.frequency_path),
+            lambda: pd.read_csv(self.frequency_path, sep=DELIMITER),
+        )
+
+    def cache_token(self, path: str) -> Tuple[Optional[str], int]:
+        """Identifies the version of a file of the report's results"""
+        return self.run_id, os.stat(path).st_mtime_ns
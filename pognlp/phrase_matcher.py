@@ -0,0 +1,91 @@
+"""Counting occurrences of lexicon entries, single- and multi-word, in
+documents' lemmas
+
+Lexicon entries are lemmatized into sequences of lemmas (e.g. "kill you"
+becomes ("kill", "you")). The matcher is an Aho-Corasick automaton over
+lemma IDs: a trie of the entries plus, for each node, a link to the longest
+proper suffix that is also in the trie. That lets it find every occurrence
+of every entry, overlapping or nested ones included, in one pass over a
+document, taking time linear in the number of lemmas.
+"""
+
+from collections import deque
+from typing import Counter, Dict, List, Sequence
+
+# ID of lemmas that don't appear in any entry
+UNKNOWN = -1
+
+ROOT = 0
+
+
+class PhraseMatcher:
+    """Aho-Corasick automaton over sequences of lemmas"""
+
+    def __init__(self) -> None:
+        self.lemma_ids: Dict[str, int] = {}
+        # Node -> lemma ID -> next node
+        self.transitions: List[Dict[int, int]] = [{}]
+        # Node -> the node of its longest proper suffix in the trie
+        self.failures: List[int] = [ROOT]
+        # Node -> keys of the entries ending at it
+        self.keys: List[List[str]] = [[]]
+        # Node -> keys of the entries ending at it or at its suffixes
+        self.outputs: List[List[str]] = [[]]
+        self.built = True
+
+    def add(self, lemmas: Sequence[str], key: str) -> None:
+        """Add an entry. `key` is counted whenever `lemmas` occur in order."""
+        if not lemmas:
+            return
+        node = ROOT
+        for lemma in lemmas:
+            lemma_id = self.lemma_ids.setdefault(lemma, len(self.lemma_ids))
+            next_node = self.transitions[node].get(lemma_id)
+            if next_node is None:
+                next_node = len(self.transitions)
+                self.transitions[node][lemma_id] = next_node
+                self.transitions.append({})
+                self.keys.append([])
+            node = next_node
+        if key not in self.keys[node]:
+            self.keys[node].append(key)
+        self.built = False
+
+    def build(self) -> None:
+        """Compute the failure links breadth first, so a node's failure node
+        is done before it, and with them each node's outputs"""
+        self.outputs = [list(keys) for keys in self.keys]
+        self.failures = [ROOT] * len(self.transitions)
+        queue = deque(self.transitions[ROOT].values())
+        while queue:
+            node = queue.popleft()
+            for lemma_id, child in self.transitions[node].items():
+                failure = self.failures[node]
+                while failure != ROOT and lemma_id not in self.transitions[failure]:
+                    failure = self.failures[failure]
+                failure = self.transitions[failure].get(lemma_id, ROOT)
+                self.failures[child] = failure
+                self.outputs[child].extend(self.outputs[failure])
+                queue.append(child)
+        self.built = True
+
+    def count(self, lemmas: Sequence[str], counts: Counter[str]) -> None:
+        """Add the number of occurrences of each entry in `lemmas` to
+        `counts`"""
+        if not self.built:
+            self.build()
+        transitions = self.transitions
+        failures = self.failures
+        outputs = self.outputs
+        lemma_ids = self.lemma_ids
+        node = ROOT
+        for lemma in lemmas:
+            lemma_id = lemma_ids.get(lemma, UNKNOWN)
+            if lemma_id == UNKNOWN:
+                node = ROOT
+                continue
+            while node != ROOT and lemma_id not in transitions[node]:
+                node = failures[node]
+            node = transitions[node].get(lemma_id, ROOT)
+            for key in outputs[node]:
+                counts[key] += 1
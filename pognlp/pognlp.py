@@ -1,11 +1,13 @@
 """Main entry point, GUI setup, and root-level controller"""
 
+import datetime
+import multiprocessing
 from typing import Any, Dict, List, Optional, Tuple, Type, Union
 
 import rtoml as toml
 from tkthread import tk, TkThread
 
-from pognlp.model.corpus import Corpus
+from pognlp.model.corpus import Corpus, FilteredRedditCorpus, RedditCorpus
 from pognlp.model.lexicon import DefaultLexicon, Lexicon
 from pognlp.model.report import Report
 from pognlp.view.corpus_list import CorpusListView
@@ -178,6 +180,35 @@ class App(tk.Tk):
         }
         self.corpora.set(corpora)
 
+    def create_filtered_corpus(
+        self,
+        name: str,
+        parent_name: str,
+        subreddits: Optional[List[str]],
+        start_time: Optional[datetime.datetime],
+        end_time: Optional[datetime.datetime],
+    ) -> None:
+        """Create a filtered view of an existing Reddit corpus"""
+        corpora = self.corpora.get()
+        if name in corpora:
+            raise ValueError("A corpus already exists with that name.")
+        parent = corpora[parent_name]
+        if not isinstance(parent, RedditCorpus):
+            raise ValueError("Filtered views can only be made of Reddit corpora.")
+        corpus = FilteredRedditCorpus(
+            name,
+            parent_name=parent_name,
+            subreddits=subreddits,
+            start_time=start_time,
+            end_time=end_time,
+        )
+        try:
+            corpus.compile({})
+        except ValueError:
+            corpus.delete()
+            raise
+        self.add_corpus(corpus)
+
     def on_corpus_complete(self) -> None:
         """Switch back to corpus list after download finishes"""
         if self.current_frame.get() == "CreateCorpusView":
@@ -190,6 +221,15 @@ class App(tk.Tk):
         if corpus_to_delete not in corpora:
             raise ValueError(f'Corpus "{corpus_to_delete}" doesn\'t exist!')
 
+        for name, corpus in corpora.items():
+            if (
+                isinstance(corpus, FilteredRedditCorpus)
+                and corpus.parent_name == corpus_to_delete
+            ):
+                raise ValueError(
+                    f'Corpus "{corpus_to_delete}" is used by the filtered view "{name}".'
+                )
+
         self.corpora.set(
             {
                 name: corpus
@@ -245,6 +285,9 @@ class App(tk.Tk):
 
 def main() -> None:
     """Entry point"""
+    # Reports can run in worker processes, which the frozen executable has
+    # to be able to start
+    multiprocessing.freeze_support()
     app = App()
     app.mainloop()
 
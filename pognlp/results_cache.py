@@ -0,0 +1,85 @@
+"""In-memory cache of loaded report results, so that re-opening a report's
+dashboard doesn't read its results from disk again
+
+Entries are dataframes keyed by the report's directory, what was loaded
+(e.g. which columns) and a token identifying the files they came from: the
+report's run ID and the files' modification times. A new run changes the
+token, so stale entries are never returned (they age out instead). The
+least recently used entries are dropped once the dataframes' total size
+goes over a memory budget.
+
+Cached dataframes are shared, so callers get a shallow copy: assigning
+columns to it is fine, but modifying its values in place isn't.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable, NamedTuple, Tuple
+
+import pandas as pd
+
+# Bytes of dataframes kept in memory
+MEMORY_BUDGET = 512 * 1024 * 1024
+
+
+class Entry(NamedTuple):
+    token: Hashable
+    dataframe: pd.DataFrame
+    size: int
+
+
+class ResultsCache:
+    """Dataframes by key, evicted least recently used first beyond a total
+    size of `memory_budget` bytes. Safe to use from several threads."""
+
+    def __init__(self, memory_budget: int = MEMORY_BUDGET):
+        self.memory_budget = memory_budget
+        self.entries: OrderedDict[Tuple[str, Hashable], Entry] = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(
+        self,
+        directory: str,
+        key: Hashable,
+        token: Hashable,
+        load: Callable[[], pd.DataFrame],
+    ) -> pd.DataFrame:
+        """Get the dataframe cached for `key` in a report's `directory`,
+        calling `load` to make it unless it was cached with the same
+        `token`"""
+        full_key = (directory, key)
+        with self.lock:
+            entry = self.entries.get(full_key)
+            if entry is not None and entry.token == token:
+                self.entries.move_to_end(full_key)
+                return entry.dataframe.copy(deep=False)
+
+        dataframe = load()
+        size = int(dataframe.memory_usage(deep=True).sum())
+        with self.lock:
+            self.remove(full_key)
+            # Something bigger than the whole budget would just evict
+            # everything else and then itself
+            if size <= self.memory_budget:
+                self.entries[full_key] = Entry(token, dataframe, size)
+                self.size += size
+                while self.size > self.memory_budget:
+                    _, evicted = self.entries.popitem(last=False)
+                    self.size -= evicted.size
+        return dataframe.copy(deep=False)
+
+    def remove(self, full_key: Tuple[str, Hashable]) -> None:
+        """Drop an entry, if it's cached. Call with the lock held."""
+        entry = self.entries.pop(full_key, None)
+        if entry is not None:
+            self.size -= entry.size
+
+    def discard(self, directory: str) -> None:
+        """Drop all entries of a report, e.g. when it's deleted"""
+        with self.lock:
+            for full_key in [key for key in self.entries if key[0] == directory]:
+                self.remove(full_key)
+
+
+results_cache = ResultsCache()
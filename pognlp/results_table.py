@@ -0,0 +1,412 @@
+"""Columnar storage for report results
+
+A report's results are a directory holding one .npy file per column (two or
+three for string columns), in the same encodings as pognlp.store, so that a
+dashboard can load just the columns it shows, already typed, without parsing
+any text. Column kinds are:
+
+- "timestamp": int64 seconds since the epoch (UTC)
+- "int64": e.g. comment scores
+- "float32": sentiment scores
+- "category": int32 codes into a list of categories, e.g. subreddits
+- "str": UTF-8 bytes and offsets into them, e.g. comment IDs and bodies
+
+Columns are stored by position; their names and kinds are in columns.toml.
+The table is written to a temporary directory that replaces the old one
+when complete, so readers never see a partial table.
+"""
+
+from __future__ import annotations
+
+import csv
+import os
+import shutil
+from types import TracebackType
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Dict,
+    Generator,
+    List,
+    Optional,
+    Sequence,
+    Type,
+)
+
+import numpy as np
+import pandas as pd
+import rtoml as toml
+
+from pognlp.store import CategoryColumn, StringColumn
+
+COLUMNS_NAME = "columns.toml"
+
+KINDS = ("timestamp", "int64", "float32", "category", "str")
+
+# Number of rows converted to columns at once
+WRITE_BLOCK_SIZE = 4096
+
+# VADER score -> output column suffix, e.g. "joy positive" for the "pos"
+# score with the "joy" lexicon
+SCORE_COLUMNS = {
+    "pos": "positive",
+    "neu": "neutral",
+    "neg": "negative",
+    "compound": "compound",
+}
+
+# Document metadata field -> column kind, for fields that aren't strings
+FIELD_KINDS = {
+    "timestamp": "timestamp",
+    "score": "int64",
+    "subreddit": "category",
+}
+
+
+def _column_prefix(directory: str, index: int) -> str:
+    return os.path.join(directory, str(index))
+
+
+def _finish_array(raw_path: str, path: str, dtype: np.dtype[Any], length: int) -> None:
+    """Turn a file of raw values into a .npy file"""
+    with open(path, "wb") as array_file:
+        np.lib.format.write_array_header_1_0(
+            array_file,
+            {
+                "descr": np.lib.format.dtype_to_descr(dtype),
+                "fortran_order": False,
+                "shape": (length,),
+            },
+        )
+        with open(raw_path, "rb") as raw_file:
+            shutil.copyfileobj(raw_file, array_file)
+    os.remove(raw_path)
+
+
+def _save_strings(path_prefix: str, strings: Sequence[str]) -> None:
+    """Write a whole string column at once"""
+    encoded = [string.encode("utf-8") for string in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    np.save(f"{path_prefix}.offsets.npy", offsets)
+    np.save(f"{path_prefix}.data.npy", np.frombuffer(b"".join(encoded), dtype=np.uint8))
+
+
+class ColumnWriter:
+    """Appends a column's values to raw files until the table is closed"""
+
+    def __init__(self, path_prefix: str, kind: str):
+        if kind not in KINDS:
+            raise ValueError(f'Unknown column kind "{kind}"')
+        self.path_prefix = path_prefix
+        self.kind = kind
+        self.length = 0
+        self.files: Dict[str, BinaryIO] = {}
+        # Category -> code
+        self.categories: Dict[str, int] = {}
+        # Bytes written to a string column so far
+        self.offset = 0
+        if kind == "str":
+            self.append_raw("offsets", np.zeros(1, dtype=np.int64))
+
+    def append_raw(self, part: str, values: np.ndarray) -> None:
+        """Append values to one of the column's files"""
+        if part not in self.files:
+            self.files[part] = open(f"{self.path_prefix}.{part}.raw", "wb")
+        self.files[part].write(values.tobytes())
+
+    def append(self, values: Sequence[Any]) -> None:
+        """Append values to the column"""
+        self.length += len(values)
+        if self.kind == "timestamp":
+            # Accepts datetimes and ISO 8601 strings
+            seconds = np.array(values, dtype="datetime64[s]").astype(np.int64)
+            self.append_raw("values", seconds)
+        elif self.kind == "int64":
+            self.append_raw("values", np.array(values, dtype=np.int64))
+        elif self.kind == "float32":
+            self.append_raw("values", np.array(values, dtype=np.float32))
+        elif self.kind == "category":
+            codes = [
+                self.categories.setdefault(str(value), len(self.categories))
+                for value in values
+            ]
+            self.append_raw("codes", np.array(codes, dtype=np.int32))
+        else:
+            encoded = [str(value).encode("utf-8") for value in values]
+            offsets = np.cumsum([len(value) for value in encoded], dtype=np.int64)
+            self.append_raw("offsets", offsets + self.offset)
+            self.append_raw("data", np.frombuffer(b"".join(encoded), dtype=np.uint8))
+            if len(offsets):
+                self.offset += int(offsets[-1])
+
+    def close(self) -> None:
+        """Turn the raw files into .npy files"""
+        for raw_file in self.files.values():
+            raw_file.close()
+        prefix = self.path_prefix
+        if self.kind in ("timestamp", "int64"):
+            self.finish("values", f"{prefix}.npy", np.int64, self.length)
+        elif self.kind == "float32":
+            self.finish("values", f"{prefix}.npy", np.float32, self.length)
+        elif self.kind == "category":
+            self.finish("codes", f"{prefix}.codes.npy", np.int32, self.length)
+            _save_strings(f"{prefix}.categories", list(self.categories))
+        else:
+            self.finish("offsets", f"{prefix}.offsets.npy", np.int64, self.length + 1)
+            self.finish("data", f"{prefix}.data.npy", np.uint8, self.offset)
+
+    def finish(self, part: str, path: str, dtype: Any, length: int) -> None:
+        """Turn one raw file into a .npy file"""
+        raw_path = f"{self.path_prefix}.{part}.raw"
+        if part not in self.files:
+            # Nothing was appended
+            open(raw_path, "wb").close()
+        _finish_array(raw_path, path, np.dtype(dtype), length)
+
+
+class ResultsWriter:
+    """Writes a results table row by row. Use as a context manager: the
+    table replaces any old one at `directory` when the block exits, unless
+    it exits with an exception."""
+
+    def __init__(
+        self,
+        directory: str,
+        columns: Dict[str, str],
+        on_flush: Sequence[Callable[[Dict[str, Any]], None]] = (),
+    ):
+        """`columns` maps each column name to its kind, in order. Each of
+        `on_flush` is called with each block of rows as they're written, as
+        a dict of column name -> values, e.g. to aggregate them. Scores are
+        passed as float32 arrays, the values as they're stored."""
+        self.directory = directory
+        self.temp_directory = f"{directory}.tmp"
+        shutil.rmtree(self.temp_directory, ignore_errors=True)
+        os.makedirs(self.temp_directory)
+        self.columns = columns
+        self.writers = [
+            ColumnWriter(_column_prefix(self.temp_directory, index), kind)
+            for index, kind in enumerate(columns.values())
+        ]
+        self.rows: List[Dict[str, Any]] = []
+        self.on_flush = on_flush
+
+    def __enter__(self) -> ResultsWriter:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            for writer in self.writers:
+                for raw_file in writer.files.values():
+                    raw_file.close()
+            shutil.rmtree(self.temp_directory, ignore_errors=True)
+
+    def append(self, row: Dict[str, Any]) -> None:
+        """Append a row, given as a dict with a value for each column"""
+        self.rows.append(row)
+        if len(self.rows) >= WRITE_BLOCK_SIZE:
+            self.flush()
+
+    def flush(self) -> None:
+        """Convert the rows appended so far to columns"""
+        if not self.rows:
+            return
+        columns: Dict[str, Any] = {}
+        for (name, kind), writer in zip(self.columns.items(), self.writers):
+            values: Any = [row[name] for row in self.rows]
+            if kind == "float32":
+                # Rows scored in this run and rows read back from an earlier
+                # table then aggregate to exactly the same thing
+                values = np.array(values, dtype=np.float32)
+            writer.append(values)
+            columns[name] = values
+        for callback in self.on_flush:
+            callback(columns)
+        self.rows = []
+
+    def close(self) -> None:
+        """Finish the table and move it into place"""
+        self.flush()
+        for writer in self.writers:
+            writer.close()
+        with open(
+            os.path.join(self.temp_directory, COLUMNS_NAME), "w", encoding="utf-8"
+        ) as columns_file:
+            toml.dump(
+                {
+                    "names": list(self.columns),
+                    "kinds": list(self.columns.values()),
+                    "rows": self.writers[0].length if self.writers else 0,
+                },
+                columns_file,
+            )
+        old_directory = f"{self.directory}.old"
+        if os.path.exists(self.directory):
+            os.replace(self.directory, old_directory)
+        os.replace(self.temp_directory, self.directory)
+        shutil.rmtree(old_directory, ignore_errors=True)
+
+
+class ResultsTable:
+    """Read-only view of a results table. Columns are memory-mapped when
+    first accessed."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(
+            os.path.join(directory, COLUMNS_NAME), encoding="utf-8"
+        ) as columns_file:
+            columns_dict = toml.load(columns_file)
+        self.columns: Dict[str, str] = dict(
+            zip(columns_dict["names"], columns_dict["kinds"])
+        )
+        self.row_count: int = columns_dict["rows"]
+        self.indices = {name: index for index, name in enumerate(self.columns)}
+        self._columns: Dict[str, Any] = {}
+
+    def __len__(self) -> int:
+        return self.row_count
+
+    @property
+    def lexicon_names(self) -> List[str]:
+        """Names of the lexica the results have scores for"""
+        suffix = f" {SCORE_COLUMNS['compound']}"
+        return [name[: -len(suffix)] for name in self.columns if name.endswith(suffix)]
+
+    def blocks(self, names: Sequence[str]) -> Generator[Dict[str, Any], None, None]:
+        """Yield the given columns a block of rows at a time, like a
+        ResultsWriter's on_flush callbacks get them (but with NumPy arrays for
+        numeric columns and epoch seconds for timestamps)"""
+        for start in range(0, len(self), WRITE_BLOCK_SIZE):
+            stop = min(start + WRITE_BLOCK_SIZE, len(self))
+            block: Dict[str, Any] = {}
+            for name in names:
+                column = self.column(name)
+                block[name] = (
+                    column[start:stop]
+                    if isinstance(column, np.ndarray)
+                    else column.slice(start, stop)
+                )
+            yield block
+
+    def close(self) -> None:
+        """Let go of the column files, e.g. before the table is replaced"""
+        self._columns = {}
+
+    def column(self, name: str) -> Any:
+        """Get a column by name: a NumPy array for numeric and timestamp
+        columns, otherwise a StringColumn or CategoryColumn"""
+        if name not in self._columns:
+            kind = self.columns[name]
+            path_prefix = _column_prefix(self.directory, self.indices[name])
+            if kind == "category":
+                self._columns[name] = CategoryColumn(path_prefix)
+            elif kind == "str":
+                self._columns[name] = StringColumn(path_prefix)
+            else:
+                self._columns[name] = np.load(f"{path_prefix}.npy", mmap_mode="r")
+        return self._columns[name]
+
+    def strings(self, name: str, start: int, stop: int) -> List[str]:
+        """Values of a column in rows [start, stop) as they're written to TSV"""
+        column = self.column(name)
+        if isinstance(column, (StringColumn, CategoryColumn)):
+            return column.slice(start, stop)
+        if self.columns[name] == "timestamp":
+            return [
+                str(value)
+                for value in column[start:stop].astype("datetime64[s]").tolist()
+            ]
+        # Shortest representation that reads back as the same value
+        values = column[start:stop]
+        strings: List[str] = values.astype(str).tolist()
+        if self.columns[name] == "float32":
+            # NumPy switches to scientific notation for small values (e.g.
+            # a compound score of 0.0001 is "1e-04"), where Python's csv
+            # writer, which wrote output.tsv, doesn't
+            for index, string in enumerate(strings):
+                if "e" in string:
+                    strings[index] = np.format_float_positional(
+                        values[index], unique=True, trim="0"
+                    )
+        return strings
+
+    def take(
+        self, positions: Sequence[int], columns: Optional[Sequence[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """The rows at `positions`, as dicts of Python values, with just the
+        given columns (default all)"""
+        names = list(self.columns) if columns is None else columns
+        indices = np.asarray(positions, dtype=np.int64)
+        values_by_name: Dict[str, List[Any]] = {}
+        for name in names:
+            column = self.column(name)
+            if isinstance(column, CategoryColumn):
+                categories = column.categories
+                values_by_name[name] = [
+                    categories[code] for code in column.codes[indices].tolist()
+                ]
+            elif isinstance(column, StringColumn):
+                values_by_name[name] = [column[index] for index in indices.tolist()]
+            elif self.columns[name] == "timestamp":
+                values_by_name[name] = column[indices].astype("datetime64[s]").tolist()
+            else:
+                values_by_name[name] = column[indices].tolist()
+        rows: List[Dict[str, Any]] = [{} for _ in positions]
+        for name in names:
+            for row, value in zip(rows, values_by_name[name]):
+                row[name] = value
+        return rows
+
+    def to_dataframe(self, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """Load the given columns (default all) into a dataframe. Timestamps
+        become datetimes and categories become categoricals."""
+        names = list(self.columns) if columns is None else columns
+        data: Dict[str, Any] = {}
+        for name in names:
+            kind = self.columns[name]
+            column = self.column(name)
+            if kind == "timestamp":
+                data[name] = pd.to_datetime(np.asarray(column), unit="s")
+            elif kind == "category":
+                data[name] = pd.Categorical.from_codes(
+                    np.asarray(column.codes), categories=column.categories
+                )
+            elif kind == "str":
+                data[name] = column.slice(0, len(column))
+            else:
+                data[name] = np.asarray(column)
+        return pd.DataFrame(data, columns=names)
+
+
+def column_kinds(
+    fieldnames: Sequence[str], score_columns: Sequence[str]
+) -> Dict[str, str]:
+    """Kind of each of a report's output columns, given which ones are
+    sentiment scores"""
+    scores = set(score_columns)
+    return {
+        name: "float32" if name in scores else FIELD_KINDS.get(name, "str")
+        for name in fieldnames
+    }
+
+
+def write_tsv(table: ResultsTable, path: str, delimiter: str = "\t") -> None:
+    """Write a results table as TSV, with a header row"""
+    with open(path, "w", encoding="utf-8") as tsv_file:
+        writer = csv.writer(tsv_file, delimiter=delimiter)
+        writer.writerow(table.columns)
+        for start in range(0, len(table), WRITE_BLOCK_SIZE):
+            stop = min(start + WRITE_BLOCK_SIZE, len(table))
+            writer.writerows(
+                zip(*(table.strings(name, start, stop) for name in table.columns))
+            )
@@ -0,0 +1,231 @@
+"""Sentiment aggregates of a report's results, computed while it runs
+
+For each bucket of documents (each hour, each day and each subreddit) and
+each lexicon, rollups hold the number of documents and the sum and sum of
+squares of each VADER score. Means and standard deviations follow from
+those, and buckets can be merged by adding them up, so trend charts and
+exports are computed from a few thousand numbers instead of every row of
+the results.
+
+Rollups are stored in one small .npz file in the report's directory.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Any, Dict, Mapping, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from pognlp.batch_vader import SCORE_FIELDS
+from pognlp.results_table import SCORE_COLUMNS, ResultsTable
+
+ROLLUPS_NAME = "rollups.npz"
+
+# Start of an hour or day in epoch seconds, or a subreddit
+Bucket = Union[int, str]
+
+# Grouping -> seconds per bucket, or None to group by subreddit
+GROUPINGS: Dict[str, Optional[int]] = {
+    "hour": 60 * 60,
+    "day": 24 * 60 * 60,
+    "subreddit": None,
+}
+
+
+class Aggregates:
+    """Document counts and score sums and sums of squares by bucket. Sums
+    have shape (lexica, scores), with scores in SCORE_FIELDS order."""
+
+    def __init__(self, lexicon_count: int):
+        self.lexicon_count = lexicon_count
+        self.counts: Dict[Bucket, int] = {}
+        self.sums: Dict[Bucket, np.ndarray] = {}
+        self.squares: Dict[Bucket, np.ndarray] = {}
+
+    def add(self, buckets: np.ndarray, scores: np.ndarray) -> None:
+        """Add documents, given their buckets and their scores, with shape
+        (documents, lexica, scores)"""
+        keys, inverse = np.unique(buckets, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        counts = np.bincount(inverse, minlength=len(keys))
+        flat = scores.reshape(len(scores), -1)
+        shape = (len(keys), self.lexicon_count, len(SCORE_FIELDS))
+        sums = np.empty((len(keys), flat.shape[1]))
+        squares = np.empty((len(keys), flat.shape[1]))
+        for column in range(flat.shape[1]):
+            values = flat[:, column]
+            sums[:, column] = np.bincount(inverse, values, len(keys))
+            squares[:, column] = np.bincount(inverse, values * values, len(keys))
+        for key, count, key_sums, key_squares in zip(
+            keys.tolist(), counts.tolist(), sums.reshape(shape), squares.reshape(shape)
+        ):
+            if key in self.counts:
+                self.counts[key] += count
+                self.sums[key] += key_sums
+                self.squares[key] += key_squares
+            else:
+                self.counts[key] = count
+                self.sums[key] = key_sums
+                self.squares[key] = key_squares
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """Keys, counts, sums and sums of squares as arrays, sorted by key"""
+        keys = sorted(self.counts)
+        shape = (len(keys), self.lexicon_count, len(SCORE_FIELDS))
+        return {
+            "keys": np.array(keys),
+            "counts": np.array([self.counts[key] for key in keys], dtype=np.int64),
+            "sums": np.array([self.sums[key] for key in keys]).reshape(shape),
+            "squares": np.array([self.squares[key] for key in keys]).reshape(shape),
+        }
+
+    @staticmethod
+    def from_arrays(lexicon_count: int, arrays: Mapping[str, np.ndarray]) -> Aggregates:
+        """Inverse of to_arrays"""
+        aggregates = Aggregates(lexicon_count)
+        for key, count, sums, squares in zip(
+            arrays["keys"].tolist(),
+            arrays["counts"].tolist(),
+            arrays["sums"],
+            arrays["squares"],
+        ):
+            aggregates.counts[key] = count
+            aggregates.sums[key] = np.array(sums)
+            aggregates.squares[key] = np.array(squares)
+        return aggregates
+
+
+class Rollups:
+    """Aggregates of a report's results by hour, by day and by subreddit"""
+
+    def __init__(
+        self,
+        lexicon_names: Sequence[str],
+        groupings: Optional[Dict[str, Aggregates]] = None,
+    ):
+        self.lexicon_names = list(lexicon_names)
+        self.groupings = groupings or {
+            grouping: Aggregates(len(self.lexicon_names)) for grouping in GROUPINGS
+        }
+        # Output column of each score of each lexicon
+        self.score_columns = [
+            [f"{name} {SCORE_COLUMNS[field]}" for field in SCORE_FIELDS]
+            for name in self.lexicon_names
+        ]
+
+    def add_block(self, columns: Mapping[str, Any]) -> None:
+        """Add a block of output rows, given as columns of values. Meant to
+        be one of a pognlp.results_table.ResultsWriter's on_flush callbacks."""
+        if not columns or not len(next(iter(columns.values()))):
+            return
+        scores = np.stack(
+            [
+                np.stack(
+                    [np.asarray(columns[column], dtype=np.float64) for column in names],
+                    axis=-1,
+                )
+                for names in self.score_columns
+            ],
+            axis=1,
+        )
+        seconds = np.array(columns["timestamp"], dtype="datetime64[s]").astype(np.int64)
+        for grouping, bucket_seconds in GROUPINGS.items():
+            if bucket_seconds is None:
+                buckets = np.array(columns["subreddit"], dtype=str)
+            else:
+                buckets = seconds - seconds % bucket_seconds
+            self.groupings[grouping].add(buckets, scores)
+
+    @staticmethod
+    def from_table(table: ResultsTable) -> Rollups:
+        """Compute the rollups of a results table, e.g. of a report run
+        before rollups were computed during runs"""
+        rollups = Rollups(table.lexicon_names)
+        names = [
+            "timestamp",
+            "subreddit",
+            *(name for names in rollups.score_columns for name in names),
+        ]
+        for block in table.blocks(names):
+            rollups.add_block(block)
+        return rollups
+
+    def write(self, directory: str) -> None:
+        """Write the rollups to `directory`"""
+        arrays: Dict[str, np.ndarray] = {
+            "lexicon_names": np.array(self.lexicon_names, dtype=str)
+        }
+        for grouping, aggregates in self.groupings.items():
+            for name, array in aggregates.to_arrays().items():
+                arrays[f"{grouping}.{name}"] = array
+        path = os.path.join(directory, ROLLUPS_NAME)
+        with open(f"{path}.tmp", "wb") as rollups_file:
+            np.savez(rollups_file, **arrays)  # type: ignore[arg-type]
+        os.replace(f"{path}.tmp", path)
+
+    @staticmethod
+    def load(directory: str) -> Optional[Rollups]:
+        """Load the rollups stored in `directory`, if there are any"""
+        try:
+            with np.load(os.path.join(directory, ROLLUPS_NAME)) as arrays:
+                lexicon_names = arrays["lexicon_names"].tolist()
+                groupings = {
+                    grouping: Aggregates.from_arrays(
+                        len(lexicon_names),
+                        {
+                            name: arrays[f"{grouping}.{name}"]
+                            for name in ("keys", "counts", "sums", "squares")
+                        },
+                    )
+                    for grouping in GROUPINGS
+                }
+        except FileNotFoundError:
+            return None
+        return Rollups(lexicon_names, groupings)
+
+    def totals(self, grouping: str) -> pd.DataFrame:
+        """Counts, sums and sums of squares by bucket of a grouping, as a
+        dataframe indexed by bucket: datetimes for "hour" and "day",
+        subreddits for "subreddit". Columns are "documents", then
+        "<lexicon> <score> sum" and "<lexicon> <score> sum of squares" for
+        each lexicon and score, e.g. "joy compound sum". Rows can be added
+        up, e.g. to resample, before getting means with summarize."""
+        arrays = self.groupings[grouping].to_arrays()
+        keys = arrays["keys"]
+        index = (
+            pd.Index(keys, name=grouping)
+            if GROUPINGS[grouping] is None
+            else pd.DatetimeIndex(pd.to_datetime(keys, unit="s"), name=grouping)
+        )
+        data: Dict[str, np.ndarray] = {"documents": arrays["counts"]}
+        for statistic, name in (("sums", "sum"), ("squares", "sum of squares")):
+            for lexicon_index, lexicon_name in enumerate(self.lexicon_names):
+                for field_index, field in enumerate(SCORE_FIELDS):
+                    column = f"{lexicon_name} {SCORE_COLUMNS[field]} {name}"
+                    data[column] = arrays[statistic][:, lexicon_index, field_index]
+        return pd.DataFrame(data, index=index)
+
+    def summary(self, grouping: str) -> pd.DataFrame:
+        """Document counts and score means and standard deviations by bucket
+        of a grouping; see summarize"""
+        return summarize(self.totals(grouping))
+
+
+def summarize(totals: pd.DataFrame) -> pd.DataFrame:
+    """Turn a dataframe like Rollups.totals' into one with the same index and
+    columns "documents", "<lexicon> <score> mean" and "<lexicon> <score> std"
+    (population standard deviation). Buckets without documents have NaN
+    means."""
+    counts = totals["documents"].astype(np.float64).replace(0, np.nan)
+    data: Dict[str, Any] = {"documents": totals["documents"]}
+    for column in totals.columns:
+        if not column.endswith(" sum"):
+            continue
+        prefix = column[: -len(" sum")]
+        mean = totals[column] / counts
+        variance = totals[f"{prefix} sum of squares"] / counts - mean * mean
+        data[f"{prefix} mean"] = mean
+        data[f"{prefix} std"] = np.sqrt(variance.clip(lower=0))
+    return pd.DataFrame(data, index=totals.index)
@@ -0,0 +1,89 @@
+"""What a completed report run covered, stored with the report so that a
+later run can bring its output up to date incrementally"""
+
+from __future__ import annotations
+
+import os
+from typing import Any, Dict, Optional
+
+import numpy as np
+import rtoml as toml
+
+STATE_NAME = "state.toml"
+
+DOCUMENTS_NAME = "documents.npy"
+
+# One entry per output row, in order: the document's key in the document
+# cache (see pognlp.document_cache.document_key) and its number of tokens
+DOCUMENT_DTYPE = np.dtype([("key", "S16"), ("token_count", "<i8")])
+
+
+class RunState:
+    """The settings, lexica, documents and raw frequency counts of a run"""
+
+    def __init__(
+        self,
+        settings: Dict[str, Any],
+        lexicon_hashes: Dict[str, str],
+        counts: Dict[str, Dict[str, int]],
+        documents: np.ndarray,
+    ):
+        # Run settings that change the output, e.g. include_body; a run with
+        # different settings can't reuse this one's output
+        self.settings = settings
+        # Lexicon name -> content hash (see pognlp.analyze.lexicon_content_hash)
+        self.lexicon_hashes = lexicon_hashes
+        # Lexicon name -> lemmatized entry -> number of occurrences
+        self.counts = counts
+        self.documents = documents
+
+    @property
+    def token_count(self) -> int:
+        """Total number of tokens in the documents"""
+        return int(self.documents["token_count"].sum())
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize everything but the documents to a dict that can be
+        written as TOML"""
+        return {
+            "settings": self.settings,
+            "lexicon_hashes": self.lexicon_hashes,
+            "counts": self.counts,
+        }
+
+    def write(self, directory: str) -> None:
+        """Write the state to `directory`"""
+        documents_path = os.path.join(directory, DOCUMENTS_NAME)
+        with open(f"{documents_path}.tmp", "wb") as documents_file:
+            np.save(documents_file, self.documents)
+        os.replace(f"{documents_path}.tmp", documents_path)
+        path = os.path.join(directory, STATE_NAME)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as state_file:
+            toml.dump(self.to_dict(), state_file)
+        os.replace(f"{path}.tmp", path)
+
+    @staticmethod
+    def load(directory: str) -> Optional[RunState]:
+        """Load the state stored in `directory`, if there is any"""
+        try:
+            with open(
+                os.path.join(directory, STATE_NAME), encoding="utf-8"
+            ) as state_file:
+                state_dict = toml.load(state_file)
+            documents = np.load(os.path.join(directory, DOCUMENTS_NAME))
+        except FileNotFoundError:
+            return None
+        return RunState(
+            state_dict["settings"],
+            state_dict["lexicon_hashes"],
+            state_dict["counts"],
+            documents,
+        )
+
+
+def make_documents(keys: bytes, token_counts: Any) -> np.ndarray:
+    """Documents array from concatenated 16-byte keys and token counts"""
+    documents = np.zeros(len(token_counts), dtype=DOCUMENT_DTYPE)
+    documents["key"] = np.frombuffer(keys, dtype="S16")
+    documents["token_count"] = token_counts
+    return documents
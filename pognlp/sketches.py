@@ -0,0 +1,309 @@
+"""Summary statistics of a report's scores, computed while it runs
+
+For each lexicon, sketches hold, in memory that doesn't grow with the
+corpus:
+
+- the number of documents, and how many of them the lexicon had a hit in
+  (a word with sentiment, so that VADER's pos or neg score isn't 0) and how
+  many were positive or negative by VADER's usual compound thresholds
+- the sum, sum of squares, minimum and maximum of each VADER score
+- a histogram of each score with bins BIN_WIDTH wide
+
+VADER scores are bounded and rounded to three or four decimals, so the
+histograms double as quantile sketches: quantiles are read off them to
+within a bin, with no need for a t-digest. Coarser histograms are made by
+merging bins. Sketches of different documents merge by adding them up.
+
+Sketches are stored in one small .npz file in the report's directory.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Any, Dict, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from pognlp.batch_vader import SCORE_FIELDS
+from pognlp.results_table import SCORE_COLUMNS, ResultsTable
+
+SKETCHES_NAME = "sketches.npz"
+
+BIN_WIDTH = 0.001
+
+# VADER rounds pos, neu and neg to 3 decimals and compound to 4
+SCORE_DECIMALS = 4
+
+# Score -> range of its values
+SCORE_RANGES: Dict[str, Tuple[float, float]] = {
+    "pos": (0.0, 1.0),
+    "neu": (0.0, 1.0),
+    "neg": (0.0, 1.0),
+    "compound": (-1.0, 1.0),
+}
+
+# VADER's recommended thresholds for calling a document positive or negative
+POSITIVE_THRESHOLD = 0.05
+NEGATIVE_THRESHOLD = -0.05
+
+DEFAULT_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+# Names of the arrays of a Sketches, besides the histograms
+ARRAY_NAMES = (
+    "documents",
+    "hits",
+    "positive",
+    "negative",
+    "sums",
+    "squares",
+    "minimums",
+    "maximums",
+)
+
+
+def bin_count(score: str) -> int:
+    """Number of histogram bins of a score"""
+    low, high = SCORE_RANGES[score]
+    return int(round((high - low) / BIN_WIDTH))
+
+
+class Sketches:
+    """Streaming summary statistics of each lexicon's scores. Counts have
+    shape (lexica,), score statistics (lexica, scores) with scores in
+    SCORE_FIELDS order, and each score's histogram (lexica, bins)."""
+
+    def __init__(self, lexicon_names: Sequence[str]):
+        self.lexicon_names = list(lexicon_names)
+        shape = (len(self.lexicon_names), len(SCORE_FIELDS))
+        self.documents = np.zeros(len(self.lexicon_names), dtype=np.int64)
+        self.hits = np.zeros(len(self.lexicon_names), dtype=np.int64)
+        self.positive = np.zeros(len(self.lexicon_names), dtype=np.int64)
+        self.negative = np.zeros(len(self.lexicon_names), dtype=np.int64)
+        self.sums = np.zeros(shape)
+        self.squares = np.zeros(shape)
+        self.minimums = np.full(shape, np.inf)
+        self.maximums = np.full(shape, -np.inf)
+        self.histograms = {
+            score: np.zeros((len(self.lexicon_names), bin_count(score)), dtype=np.int64)
+            for score in SCORE_FIELDS
+        }
+
+    def add_scores(self, scores: np.ndarray) -> None:
+        """Add documents, given their scores, with shape (documents, lexica,
+        scores)"""
+        if not len(scores):
+            return
+        # Scores stored as float32 are a little off VADER's values, which
+        # would put scores on a bin edge into the bin below
+        scores = np.round(scores, SCORE_DECIMALS)
+        fields = {field: index for index, field in enumerate(SCORE_FIELDS)}
+        compound = scores[:, :, fields["compound"]]
+        self.documents += len(scores)
+        self.hits += np.count_nonzero(
+            (scores[:, :, fields["pos"]] > 0) | (scores[:, :, fields["neg"]] > 0),
+            axis=0,
+        )
+        self.positive += np.count_nonzero(compound >= POSITIVE_THRESHOLD, axis=0)
+        self.negative += np.count_nonzero(compound <= NEGATIVE_THRESHOLD, axis=0)
+        self.sums += scores.sum(axis=0)
+        self.squares += (scores * scores).sum(axis=0)
+        np.minimum(self.minimums, scores.min(axis=0), out=self.minimums)
+        np.maximum(self.maximums, scores.max(axis=0), out=self.maximums)
+        for score, histograms in self.histograms.items():
+            low, _ = SCORE_RANGES[score]
+            bins = histograms.shape[1]
+            # Scores on a bin's lower edge belong to it despite division error
+            indices = np.floor((scores[:, :, fields[score]] - low) / BIN_WIDTH + 1e-6)
+            indices = np.clip(indices, 0, bins - 1).astype(np.int64)
+            for lexicon_index in range(len(self.lexicon_names)):
+                histograms[lexicon_index] += np.bincount(
+                    indices[:, lexicon_index], minlength=bins
+                )
+
+    def add_block(self, columns: Mapping[str, Any]) -> None:
+        """Add a block of output rows, given as columns of values. Meant to
+        be one of a pognlp.results_table.ResultsWriter's on_flush callbacks."""
+        if not columns or not len(next(iter(columns.values()))):
+            return
+        self.add_scores(
+            np.stack(
+                [
+                    np.stack(
+                        [
+                            np.asarray(
+                                columns[f"{name} {SCORE_COLUMNS[field]}"],
+                                dtype=np.float64,
+                            )
+                            for field in SCORE_FIELDS
+                        ],
+                        axis=-1,
+                    )
+                    for name in self.lexicon_names
+                ],
+                axis=1,
+            )
+        )
+
+    def merge(self, other: Sketches) -> None:
+        """Add another Sketches' documents, e.g. of another part of the
+        corpus. Lexica are matched by name; ones this doesn't have are
+        ignored."""
+        indices = {name: index for index, name in enumerate(other.lexicon_names)}
+        for index, name in enumerate(self.lexicon_names):
+            other_index = indices.get(name)
+            if other_index is None:
+                continue
+            for array_name in ("documents", "hits", "positive", "negative"):
+                getattr(self, array_name)[index] += getattr(other, array_name)[
+                    other_index
+                ]
+            self.sums[index] += other.sums[other_index]
+            self.squares[index] += other.squares[other_index]
+            np.minimum(
+                self.minimums[index],
+                other.minimums[other_index],
+                out=self.minimums[index],
+            )
+            np.maximum(
+                self.maximums[index],
+                other.maximums[other_index],
+                out=self.maximums[index],
+            )
+            for score, histograms in self.histograms.items():
+                histograms[index] += other.histograms[score][other_index]
+
+    @staticmethod
+    def from_table(table: ResultsTable) -> Sketches:
+        """Compute the sketches of a results table, e.g. of a report run
+        before sketches were computed during runs"""
+        sketches = Sketches(table.lexicon_names)
+        names = [
+            f"{name} {SCORE_COLUMNS[field]}"
+            for name in sketches.lexicon_names
+            for field in SCORE_FIELDS
+        ]
+        for block in table.blocks(names):
+            sketches.add_block(block)
+        return sketches
+
+    def write(self, directory: str) -> None:
+        """Write the sketches to `directory`"""
+        arrays: Dict[str, np.ndarray] = {
+            "lexicon_names": np.array(self.lexicon_names, dtype=str),
+            **{name: getattr(self, name) for name in ARRAY_NAMES},
+            **{
+                f"histogram.{score}": histograms
+                for score, histograms in self.histograms.items()
+            },
+        }
+        path = os.path.join(directory, SKETCHES_NAME)
+        with open(f"{path}.tmp", "wb") as sketches_file:
+            np.savez(sketches_file, **arrays)  # type: ignore[arg-type]
+        os.replace(f"{path}.tmp", path)
+
+    @staticmethod
+    def load(directory: str) -> Optional[Sketches]:
+        """Load the sketches stored in `directory`, if there are any"""
+        try:
+            with np.load(os.path.join(directory, SKETCHES_NAME)) as arrays:
+                sketches = Sketches(arrays["lexicon_names"].tolist())
+                for name in ARRAY_NAMES:
+                    setattr(sketches, name, arrays[name])
+                for score in SCORE_FIELDS:
+                    sketches.histograms[score] = arrays[f"histogram.{score}"]
+        except FileNotFoundError:
+            return None
+        return sketches
+
+    def quantile(self, lexicon_name: str, score: str, q: float) -> float:
+        """Estimate the `q` quantile of a lexicon's score, to within a bin,
+        interpolating linearly within the bin it's in. NaN if there are no
+        documents."""
+        index = self.lexicon_names.index(lexicon_name)
+        counts = self.histograms[score][index]
+        total = int(counts.sum())
+        if not total:
+            return float("nan")
+        cumulative = np.cumsum(counts)
+        target = q * total
+        bin_index = min(int(np.searchsorted(cumulative, target)), len(counts) - 1)
+        before = cumulative[bin_index - 1] if bin_index else 0
+        fraction = (target - before) / counts[bin_index] if counts[bin_index] else 0
+        low, _ = SCORE_RANGES[score]
+        value = low + (bin_index + fraction) * BIN_WIDTH
+        field_index = SCORE_FIELDS.index(score)
+        return float(
+            np.clip(
+                value,
+                self.minimums[index, field_index],
+                self.maximums[index, field_index],
+            )
+        )
+
+    def share_above(
+        self, lexicon_name: str, threshold: float, score: str = "compound"
+    ) -> float:
+        """Share of documents whose score with a lexicon is at least
+        `threshold`, to within a bin"""
+        index = self.lexicon_names.index(lexicon_name)
+        counts = self.histograms[score][index]
+        total = int(counts.sum())
+        if not total:
+            return float("nan")
+        low, _ = SCORE_RANGES[score]
+        first_bin = int(np.ceil((threshold - low) / BIN_WIDTH - 1e-6))
+        return float(counts[max(first_bin, 0) :].sum() / total)
+
+    def histogram(
+        self, lexicon_name: str, score: str, bins: int = 20
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Histogram of a lexicon's score with `bins` equal bins (which must
+        divide the number of fine bins), as (counts, bin edges) like
+        numpy.histogram"""
+        counts = self.histograms[score][self.lexicon_names.index(lexicon_name)]
+        if len(counts) % bins:
+            raise ValueError(f"{bins} bins don't divide {len(counts)} bins evenly.")
+        low, high = SCORE_RANGES[score]
+        return (
+            counts.reshape(bins, -1).sum(axis=1),
+            np.linspace(low, high, bins + 1),
+        )
+
+    def summary(self, quantiles: Sequence[float] = DEFAULT_QUANTILES) -> pd.DataFrame:
+        """Summary statistics of each lexicon's scores, indexed by lexicon:
+        the number of documents, the shares of documents the lexicon had a
+        hit in and that were positive, neutral and negative, and the mean,
+        (population) standard deviation, minimum, `quantiles` and maximum
+        of each score"""
+        documents = self.documents.astype(np.float64)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            data: Dict[str, Any] = {
+                "documents": self.documents,
+                "hit rate": self.hits / documents,
+                "positive share": self.positive / documents,
+                "neutral share": (self.documents - self.positive - self.negative)
+                / documents,
+                "negative share": self.negative / documents,
+            }
+            means = self.sums / documents[:, np.newaxis]
+            deviations = np.sqrt(
+                np.clip(
+                    self.squares / documents[:, np.newaxis] - means * means, 0, None
+                )
+            )
+        for field_index, score in enumerate(SCORE_FIELDS):
+            column = SCORE_COLUMNS[score]
+            data[f"{column} mean"] = means[:, field_index]
+            data[f"{column} std"] = deviations[:, field_index]
+            data[f"{column} min"] = np.where(
+                self.documents > 0, self.minimums[:, field_index], np.nan
+            )
+            for q in quantiles:
+                data[f"{column} {q:.0%}"] = [
+                    self.quantile(name, score, q) for name in self.lexicon_names
+                ]
+            data[f"{column} max"] = np.where(
+                self.documents > 0, self.maximums[:, field_index], np.nan
+            )
+        return pd.DataFrame(data, index=pd.Index(self.lexicon_names, name="lexicon"))
@@ -0,0 +1,192 @@
+"""Summary statistics of a corpus' contents, computed while it's compiled
+and stored next to corpus.toml so the app can describe a corpus without
+scanning it"""
+
+from __future__ import annotations
+
+import bisect
+import datetime
+import os
+from collections import Counter, defaultdict
+from typing import Any, DefaultDict, Dict, List, Optional
+
+import rtoml as toml
+
+from pognlp.store import CommentRecord
+
+STATS_NAME = "stats.toml"
+
+# Inclusive upper bounds of the score histogram's bins. The last bin is
+# open-ended.
+SCORE_BIN_EDGES = [-100, -10, -1, 0, 1, 2, 5, 10, 100, 1000]
+
+DELETED_BODIES = {"[deleted]": "deleted", "[removed]": "removed"}
+
+# Rough lemmatization throughput of a report run, used to estimate how long
+# running a report will take
+TOKENS_PER_SECOND = 10000
+
+
+class CorpusStats:
+    """Mergeable summary statistics of a set of comments"""
+
+    def __init__(self) -> None:
+        self.document_count = 0
+        # Whitespace-separated tokens; an estimate of what spaCy will count
+        self.token_count = 0
+        # subreddit -> ISO date (UTC) -> number of comments
+        self.daily_counts: DefaultDict[str, Counter[str]] = defaultdict(Counter)
+        self.score_histogram = [0] * (len(SCORE_BIN_EDGES) + 1)
+        self.score_sum = 0
+        self.score_min: Optional[int] = None
+        self.score_max: Optional[int] = None
+        self.deleted_counts = Counter[str]()
+
+    def add(self, record: CommentRecord) -> None:
+        """Add a single comment"""
+        self.document_count += 1
+        self.token_count += len(record.body.split())
+        day = datetime.datetime.utcfromtimestamp(record.created_utc).date()
+        self.daily_counts[record.subreddit][day.isoformat()] += 1
+        self.score_histogram[bisect.bisect_left(SCORE_BIN_EDGES, record.score)] += 1
+        self.score_sum += record.score
+        if self.score_min is None or record.score < self.score_min:
+            self.score_min = record.score
+        if self.score_max is None or record.score > self.score_max:
+            self.score_max = record.score
+        if record.body in DELETED_BODIES:
+            self.deleted_counts[DELETED_BODIES[record.body]] += 1
+
+    def merge(self, other: CorpusStats) -> None:
+        """Add the comments summarized by another CorpusStats"""
+        self.document_count += other.document_count
+        self.token_count += other.token_count
+        for subreddit, counts in other.daily_counts.items():
+            self.daily_counts[subreddit].update(counts)
+        self.score_histogram = [
+            a + b for a, b in zip(self.score_histogram, other.score_histogram)
+        ]
+        self.score_sum += other.score_sum
+        for value in (other.score_min, other.score_max):
+            if value is None:
+                continue
+            if self.score_min is None or value < self.score_min:
+                self.score_min = value
+            if self.score_max is None or value > self.score_max:
+                self.score_max = value
+        self.deleted_counts.update(other.deleted_counts)
+
+    @property
+    def mean_token_count(self) -> float:
+        """Mean number of tokens per document"""
+        return self.token_count / (self.document_count or 1)
+
+    @property
+    def mean_score(self) -> float:
+        """Mean score per document"""
+        return self.score_sum / (self.document_count or 1)
+
+    @property
+    def deleted_share(self) -> float:
+        """Share of documents that are [deleted] or [removed]"""
+        return sum(self.deleted_counts.values()) / (self.document_count or 1)
+
+    def subreddit_counts(self) -> Dict[str, int]:
+        """Number of documents per subreddit"""
+        return {
+            subreddit: sum(counts.values())
+            for subreddit, counts in self.daily_counts.items()
+        }
+
+    def estimated_report_seconds(self) -> float:
+        """Rough estimate of how long running a report on the corpus takes"""
+        return self.token_count / TOKENS_PER_SECOND
+
+    def describe(self) -> List[str]:
+        """Human-readable summary lines"""
+        lines = [
+            f"{self.document_count:,} documents, {self.token_count:,} tokens "
+            f"({self.mean_token_count:.1f} per document)",
+        ]
+        if self.document_count:
+            days = {day for counts in self.daily_counts.values() for day in counts}
+            lines.append(f"From {min(days)} to {max(days)} (UTC)")
+            lines.append(
+                "Per subreddit: "
+                + ", ".join(
+                    f"{subreddit}: {count:,}"
+                    for subreddit, count in sorted(self.subreddit_counts().items())
+                )
+            )
+            lines.append(
+                f"Score: mean {self.mean_score:.1f}, "
+                f"min {self.score_min}, max {self.score_max}"
+            )
+            lines.append(f"Deleted or removed: {100 * self.deleted_share:.1f}%")
+        minutes = max(1, round(self.estimated_report_seconds() / 60))
+        lines.append(f"Estimated report run time: about {minutes} minute(s)")
+        return lines
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize to a dict that can be written as TOML"""
+        stats_dict: Dict[str, Any] = {
+            "document_count": self.document_count,
+            "token_count": self.token_count,
+            "mean_token_count": self.mean_token_count,
+            "score": {
+                "bin_edges": SCORE_BIN_EDGES,
+                "histogram": self.score_histogram,
+                "sum": self.score_sum,
+                "mean": self.mean_score,
+            },
+            "deleted": {
+                "deleted": self.deleted_counts["deleted"],
+                "removed": self.deleted_counts["removed"],
+                "share": self.deleted_share,
+            },
+            "daily_counts": {
+                subreddit: dict(sorted(counts.items()))
+                for subreddit, counts in self.daily_counts.items()
+            },
+        }
+        # TOML has no null
+        if self.score_min is not None:
+            stats_dict["score"]["min"] = self.score_min
+            stats_dict["score"]["max"] = self.score_max
+        return stats_dict
+
+    @staticmethod
+    def from_dict(stats_dict: Dict[str, Any]) -> CorpusStats:
+        """Load from a dict written by to_dict"""
+        stats = CorpusStats()
+        stats.document_count = stats_dict["document_count"]
+        stats.token_count = stats_dict["token_count"]
+        stats.score_histogram = stats_dict["score"]["histogram"]
+        stats.score_sum = stats_dict["score"]["sum"]
+        stats.score_min = stats_dict["score"].get("min")
+        stats.score_max = stats_dict["score"].get("max")
+        stats.deleted_counts = Counter[str](
+            {kind: stats_dict["deleted"][kind] for kind in DELETED_BODIES.values()}
+        )
+        for subreddit, counts in stats_dict["daily_counts"].items():
+            stats.daily_counts[subreddit] = Counter[str](counts)
+        return stats
+
+    def write(self, directory: str) -> None:
+        """Write the stats to `directory`"""
+        path = os.path.join(directory, STATS_NAME)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as stats_file:
+            toml.dump(self.to_dict(), stats_file)
+        os.replace(temp_path, path)
+
+    @staticmethod
+    def load(directory: str) -> Optional[CorpusStats]:
+        """Load the stats stored in `directory`, if there are any"""
+        try:
+            with open(
+                os.path.join(directory, STATS_NAME), encoding="utf-8"
+            ) as stats_file:
+                return CorpusStats.from_dict(toml.load(stats_file))
+        except FileNotFoundError:
+            return None
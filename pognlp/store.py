@@ -0,0 +1,477 @@
+"""Columnar on-disk storage for corpus documents
+
+A store is a directory of append-only shards, each holding at most a fixed
+number of rows. Within a shard, each column is stored in its own NumPy .npy
+file so that it can be read independently of the other columns.
+Variable-length string columns are stored as one flat buffer of UTF-8 bytes
+plus an array of offsets into that buffer. Categorical columns (e.g.
+subreddit) are stored as integer codes plus a (small) string column of
+categories.
+
+Column files can be compressed with one of several codecs, chosen per shard.
+Uncompressed shards are memory-mapped; compressed shards are decompressed
+column by column as they're read.
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+import gzip
+import io
+import os
+from typing import (
+    Any,
+    Callable,
+    Collection,
+    Dict,
+    Generator,
+    Hashable,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+import lz4.frame
+import numpy as np
+import zstandard
+
+
+class CommentRecord(NamedTuple):
+    """The fields of a Reddit comment that get stored in a corpus. Plain
+    values only, so reading a corpus never needs praw."""
+
+    body: str
+    created_utc: int
+    score: int
+    id: str
+    # ID of the comment's submission, without the "t3_" prefix
+    link_id: str
+    subreddit: str
+    # Empty string if the author's account was deleted
+    author: str = ""
+    # Fullname of the parent comment ("t1_...") or submission ("t3_...")
+    parent_id: str = ""
+
+
+# Column name -> column kind. Kinds are "int64", "str", and "category".
+# Columns are in the same order as the fields of CommentRecord.
+COLUMNS: Dict[str, str] = {
+    "body": "str",
+    "created_utc": "int64",
+    "score": "int64",
+    "id": "str",
+    "link_id": "str",
+    "subreddit": "category",
+    "author": "str",
+    "parent_id": "str",
+}
+
+# Number of rows to decode at once when iterating over a shard
+READ_BLOCK_SIZE = 4096
+
+# Name of the file in each shard holding its (subreddit, created_utc) index
+INDEX_NAME = "index.npy"
+
+# Default maximum number of rows per shard
+DEFAULT_SHARD_SIZE = 50000
+
+# Number of shards to open and decompress ahead of the one being read
+DEFAULT_READ_AHEAD = 2
+
+
+class Codec(NamedTuple):
+    """A compression codec for column files"""
+
+    extension: str
+    compress: Callable[[bytes], bytes]
+    decompress: Callable[[bytes], bytes]
+
+
+def _zstd_compress(data: bytes) -> bytes:
+    # zstandard's (de)compressors aren't thread-safe, so make one per call
+    compressed: bytes = zstandard.ZstdCompressor(level=3).compress(data)
+    return compressed
+
+
+def _zstd_decompress(data: bytes) -> bytes:
+    decompressed: bytes = zstandard.ZstdDecompressor().decompress(data)
+    return decompressed
+
+
+CODECS: Dict[str, Optional[Codec]] = {
+    # Uncompressed column files can be memory-mapped
+    "none": None,
+    "gzip": Codec(".gz", gzip.compress, gzip.decompress),
+    "zstd": Codec(".zst", _zstd_compress, _zstd_decompress),
+    "lz4": Codec(".lz4", lz4.frame.compress, lz4.frame.decompress),
+}
+
+DEFAULT_CODEC = "none"
+
+
+def _write_array(path: str, array: np.ndarray, codec: str) -> None:
+    """Write an array to path atomically, compressed with the given codec"""
+    buffer = io.BytesIO()
+    np.save(buffer, array, allow_pickle=False)
+    data = buffer.getvalue()
+    codec_functions = CODECS[codec]
+    if codec_functions is not None:
+        path += codec_functions.extension
+        data = codec_functions.compress(data)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as array_file:
+        array_file.write(data)
+    os.replace(temp_path, path)
+
+
+def _load_array(path: str, codec: str) -> np.ndarray:
+    """Load an array written with _write_array. Memory-mapped if the array
+    isn't compressed."""
+    codec_functions = CODECS[codec]
+    array: np.ndarray
+    if codec_functions is None:
+        array = np.load(path, mmap_mode="r", allow_pickle=False)
+    else:
+        with open(path + codec_functions.extension, "rb") as array_file:
+            data = codec_functions.decompress(array_file.read())
+        array = np.load(io.BytesIO(data), allow_pickle=False)
+    return array
+
+
+def _encode_strings(strings: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Encode strings as (offsets, data) arrays. The i-th string is
+    data[offsets[i]:offsets[i + 1]]."""
+    encoded = [string.encode("utf-8") for string in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    return offsets, data
+
+
+def _write_strings(path_prefix: str, strings: Sequence[str], codec: str) -> None:
+    offsets, data = _encode_strings(strings)
+    _write_array(f"{path_prefix}.offsets.npy", offsets, codec)
+    _write_array(f"{path_prefix}.data.npy", data, codec)
+
+
+class StringColumn:
+    """A column of variable-length strings"""
+
+    def __init__(self, path_prefix: str, codec: str = DEFAULT_CODEC):
+        self.offsets = _load_array(f"{path_prefix}.offsets.npy", codec)
+        self.data = _load_array(f"{path_prefix}.data.npy", codec)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return bytes(self.data[start:end]).decode("utf-8")
+
+    def slice(self, start: int, stop: int) -> List[str]:
+        """Decode the strings in rows [start, stop)"""
+        offsets = self.offsets[start : stop + 1]
+        base = int(offsets[0])
+        buffer = bytes(self.data[base : int(offsets[-1])])
+        bounds = (offsets - base).tolist()
+        return [
+            buffer[bounds[i] : bounds[i + 1]].decode("utf-8")
+            for i in range(len(bounds) - 1)
+        ]
+
+
+class CategoryColumn:
+    """A column of strings drawn from a small set of categories"""
+
+    def __init__(self, path_prefix: str, codec: str = DEFAULT_CODEC):
+        self.codes = _load_array(f"{path_prefix}.codes.npy", codec)
+        categories = StringColumn(f"{path_prefix}.categories", codec)
+        self.categories: List[str] = categories.slice(0, len(categories))
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, index: int) -> str:
+        return self.categories[int(self.codes[index])]
+
+    def slice(self, start: int, stop: int) -> List[str]:
+        """Decode the strings in rows [start, stop)"""
+        categories = self.categories
+        return [categories[code] for code in self.codes[start:stop].tolist()]
+
+
+def write_shard(
+    directory: str, columns: Dict[str, Sequence[Any]], codec: str = DEFAULT_CODEC
+) -> Dict[str, Any]:
+    """Write a shard to `directory`, compressing its files with `codec`.
+    `columns` maps each column name in COLUMNS to a sequence of values, one
+    per row.
+
+    Also writes the shard's index: the order of its rows sorted by
+    (subreddit, created_utc). Returns a summary of the shard for the store's
+    manifest, which lets readers skip shards that can't match a filter."""
+    os.makedirs(directory, exist_ok=True)
+    lengths = {len(values) for values in columns.values()}
+    if len(lengths) > 1:
+        raise ValueError("All columns must have the same length.")
+
+    for name, kind in COLUMNS.items():
+        values = columns[name]
+        path_prefix = os.path.join(directory, name)
+        if kind == "int64":
+            _write_array(
+                f"{path_prefix}.npy", np.asarray(values, dtype=np.int64), codec
+            )
+        elif kind == "str":
+            _write_strings(path_prefix, values, codec)
+        elif kind == "category":
+            categories, codes = np.unique(
+                np.asarray(values, dtype=object), return_inverse=True
+            )
+            _write_array(f"{path_prefix}.codes.npy", codes.astype(np.int32), codec)
+            _write_strings(f"{path_prefix}.categories", list(categories), codec)
+        else:
+            raise ValueError(f'Unknown column kind "{kind}"')
+
+    created_utc = np.asarray(columns["created_utc"], dtype=np.int64)
+    subreddits = sorted(set(columns["subreddit"]))
+    codes = np.searchsorted(np.asarray(subreddits, dtype=object), columns["subreddit"])
+    # The last key passed to lexsort is the primary sort key
+    order = np.lexsort((created_utc, codes))
+    _write_array(os.path.join(directory, INDEX_NAME), order.astype(np.int64), codec)
+
+    return {
+        "rows": len(created_utc),
+        "codec": codec,
+        "subreddits": subreddits,
+        "min_created_utc": int(created_utc.min()) if len(created_utc) else 0,
+        "max_created_utc": int(created_utc.max()) if len(created_utc) else 0,
+    }
+
+
+class Filter(NamedTuple):
+    """Selects the rows from the given subreddits (case-insensitive; None
+    for all) created in [start, end) (epoch seconds; None for unbounded)"""
+
+    subreddits: Optional[Collection[str]] = None
+    start: Optional[int] = None
+    end: Optional[int] = None
+
+    def matches_summary(self, summary: Dict[str, Any]) -> bool:
+        """Whether a shard with the given manifest summary may contain
+        matching rows"""
+        if self.start is not None and summary["max_created_utc"] < self.start:
+            return False
+        if self.end is not None and summary["min_created_utc"] >= self.end:
+            return False
+        if self.subreddits is not None:
+            wanted = {subreddit.lower() for subreddit in self.subreddits}
+            return any(
+                subreddit.lower() in wanted for subreddit in summary["subreddits"]
+            )
+        return True
+
+
+class Shard:
+    """Read-only view of a shard written by write_shard. Columns are only
+    opened (and decompressed) when first accessed. Shards are independent of
+    each other, so any number of them can be read at once."""
+
+    def __init__(self, directory: str, codec: str = DEFAULT_CODEC):
+        self.directory = directory
+        self.codec = codec
+        self._columns: Dict[str, Any] = {}
+
+    def column(self, name: str) -> Any:
+        """Get a column by name: a NumPy array for integer columns, otherwise
+        a StringColumn or CategoryColumn"""
+        if name not in self._columns:
+            kind = COLUMNS[name]
+            path_prefix = os.path.join(self.directory, name)
+            if kind == "int64":
+                self._columns[name] = _load_array(f"{path_prefix}.npy", self.codec)
+            elif kind == "str":
+                self._columns[name] = StringColumn(path_prefix, self.codec)
+            else:
+                self._columns[name] = CategoryColumn(path_prefix, self.codec)
+        return self._columns[name]
+
+    def load(self, columns: Sequence[str]) -> Shard:
+        """Open the given columns now rather than on first access"""
+        for name in columns:
+            self.column(name)
+        return self
+
+    def __len__(self) -> int:
+        return len(self.column("created_utc"))
+
+    def select(self, row_filter: Filter) -> np.ndarray:
+        """Use the shard's index to find the (ascending) numbers of the rows
+        matching a filter"""
+        subreddit = self.column("subreddit")
+        order = _load_array(os.path.join(self.directory, INDEX_NAME), self.codec)
+        sorted_codes = subreddit.codes[order]
+        sorted_created_utc = self.column("created_utc")[order]
+
+        codes: Sequence[int]
+        if row_filter.subreddits is None:
+            codes = range(len(subreddit.categories))
+        else:
+            wanted = {name.lower() for name in row_filter.subreddits}
+            codes = [
+                code
+                for code, name in enumerate(subreddit.categories)
+                if name.lower() in wanted
+            ]
+
+        selected = []
+        for code in codes:
+            # Rows are sorted by subreddit, then by creation time, so the
+            # matching rows of each subreddit are one contiguous range
+            low = np.searchsorted(sorted_codes, code, side="left")
+            high = np.searchsorted(sorted_codes, code, side="right")
+            times = sorted_created_utc[low:high]
+            start = low
+            stop = high
+            if row_filter.start is not None:
+                start = low + np.searchsorted(times, row_filter.start, side="left")
+            if row_filter.end is not None:
+                stop = low + np.searchsorted(times, row_filter.end, side="left")
+            selected.append(order[start:stop])
+
+        if not selected:
+            return np.zeros(0, dtype=np.int64)
+        return np.sort(np.concatenate(selected))
+
+    def iterate_rows(
+        self,
+        columns: Sequence[str] = tuple(COLUMNS),
+        rows: Optional[np.ndarray] = None,
+    ) -> Generator[Dict[str, Any], None, None]:
+        """Iterate over rows as dicts, only reading the requested columns.
+        If `rows` (ascending row numbers) is given, only read those rows."""
+        if rows is None:
+            ranges = [(0, len(self))]
+        else:
+            # Split the rows into contiguous runs so each can be read as a slice
+            breaks = np.flatnonzero(np.diff(rows) != 1) + 1
+            ranges = [
+                (int(run[0]), int(run[-1]) + 1)
+                for run in np.split(rows, breaks)
+                if len(run)
+            ]
+
+        for range_start, range_stop in ranges:
+            for start in range(range_start, range_stop, READ_BLOCK_SIZE):
+                stop = min(start + READ_BLOCK_SIZE, range_stop)
+                block = {}
+                for name in columns:
+                    column = self.column(name)
+                    if COLUMNS[name] == "int64":
+                        block[name] = column[start:stop].tolist()
+                    else:
+                        block[name] = column.slice(start, stop)
+                for index in range(stop - start):
+                    yield {name: values[index] for name, values in block.items()}
+
+
+def shard_name(index: int) -> str:
+    """Name of the directory holding the shard with the given index"""
+    return f"shard-{index:05d}"
+
+
+class StoreWriter:
+    """Buffers records and flushes them to a new shard in `directory` whenever
+    `shard_size` records have accumulated, so memory use stays bounded no
+    matter how many records are written.
+
+    Records can be appended to separate partitions (e.g. one per concurrent
+    download), each with its own buffer, so that every shard holds records
+    from a single partition. `on_flush` is called with the manifest entry
+    (name and summary) and partition of each shard after it has been written
+    to disk."""
+
+    def __init__(
+        self,
+        directory: str,
+        on_flush: Callable[[Dict[str, Any], Hashable], None],
+        first_shard_index: int = 0,
+        shard_size: int = DEFAULT_SHARD_SIZE,
+        codec: str = DEFAULT_CODEC,
+    ):
+        if codec not in CODECS:
+            raise ValueError(
+                f'Unknown codec "{codec}". Choose one of {", ".join(CODECS)}.'
+            )
+        self.directory = directory
+        self.on_flush = on_flush
+        self.next_shard_index = first_shard_index
+        self.shard_size = shard_size
+        self.codec = codec
+        self.buffers: Dict[Hashable, List[CommentRecord]] = {}
+
+    def append(self, record: CommentRecord, partition: Hashable = None) -> None:
+        """Add a record, flushing a shard if the partition's buffer is full"""
+        buffer = self.buffers.setdefault(partition, [])
+        buffer.append(record)
+        if len(buffer) >= self.shard_size:
+            self.flush(partition)
+
+    def flush(self, partition: Hashable = None) -> None:
+        """Write any records buffered in a partition to a new shard"""
+        buffer = self.buffers.pop(partition, None)
+        if not buffer:
+            return
+        name = shard_name(self.next_shard_index)
+        summary = write_shard(
+            os.path.join(self.directory, name),
+            dict(zip(CommentRecord._fields, zip(*buffer))),
+            self.codec,
+        )
+        self.next_shard_index += 1
+        self.on_flush({"name": name, **summary}, partition)
+
+
+def open_shard(directory: str, summary: Dict[str, Any]) -> Shard:
+    """Open the shard with the given manifest entry in store `directory`"""
+    return Shard(
+        os.path.join(directory, summary["name"]), summary.get("codec", DEFAULT_CODEC)
+    )
+
+
+def iterate_rows(
+    directory: str,
+    shards: Sequence[Dict[str, Any]],
+    columns: Sequence[str] = tuple(COLUMNS),
+    row_filter: Optional[Filter] = None,
+    read_ahead: int = DEFAULT_READ_AHEAD,
+) -> Generator[Dict[str, Any], None, None]:
+    """Iterate over the rows of the given shards (manifest entries) in order,
+    optionally only the rows matching a filter. Shards whose summaries rule
+    out a match are skipped without being opened.
+
+    The next `read_ahead` shards are opened and decompressed on background
+    threads (the codecs release the GIL) while the current one is read."""
+    if row_filter is not None:
+        shards = [summary for summary in shards if row_filter.matches_summary(summary)]
+
+    def load(summary: Dict[str, Any]) -> Tuple[Shard, Optional[np.ndarray]]:
+        shard = open_shard(directory, summary).load(columns)
+        rows = shard.select(row_filter) if row_filter is not None else None
+        return shard, rows
+
+    if read_ahead <= 0:
+        for summary in shards:
+            shard, rows = load(summary)
+            yield from shard.iterate_rows(columns, rows)
+        return
+
+    with ThreadPoolExecutor(max_workers=read_ahead) as executor:
+        pending = [executor.submit(load, summary) for summary in shards[:read_ahead]]
+        for index in range(len(shards)):
+            shard, rows = pending.pop(0).result()
+            if index + read_ahead < len(shards):
+                pending.append(executor.submit(load, shards[index + read_ahead]))
+            yield from shard.iterate_rows(columns, rows)
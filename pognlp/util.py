@@ -1,7 +1,9 @@
 """Misc. utility functions"""
 
+import datetime
 import threading
-from typing import Any, Callable, cast, Generic, Optional, Set, TypeVar
+import time
+from typing import Any, Callable, cast, Generic, NamedTuple, Optional, Set, TypeVar
 
 T = TypeVar("T")
 Callback = Callable[[T], None]
@@ -104,3 +106,120 @@ def in_main_thread(func: F) -> F:
 def run_thread(func: Callable[[], None]) -> None:
     """Run a function in another thread"""
     threading.Thread(target=func).start()
+
+
+class RateLimiter:
+    """Thread-safe rate limiter shared by several workers. Each call to
+    wait() blocks until at least `interval` seconds have passed since the
+    previous caller was let through."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.next_time = 0.0
+
+    def wait(self) -> None:
+        """Block until the next request may be made"""
+        with self.lock:
+            now = time.monotonic()
+            allowed_at = max(now, self.next_time)
+            self.next_time = allowed_at + self.interval
+        time.sleep(allowed_at - now)
+
+
+# Seconds between progress reports when the percentage doesn't change
+DEFAULT_PROGRESS_INTERVAL = 0.5
+
+
+class Progress(NamedTuple):
+    """How far along a long-running task is"""
+
+    done: int
+    # None if it isn't known in advance
+    total: Optional[int]
+    # Seconds since the task started
+    elapsed: float
+    # Units done per second since the task started
+    rate: float
+    unit: str = "docs"
+
+    @property
+    def percent(self) -> Optional[int]:
+        """Whole-number percentage done, if the total is known"""
+        if self.total is None:
+            return None
+        return min(100, 100 * self.done // (self.total or 1))
+
+    @property
+    def eta(self) -> Optional[float]:
+        """Estimated seconds left, if the total is known"""
+        if self.total is None or not self.rate:
+            return None
+        return max(0.0, (self.total - self.done) / self.rate)
+
+    def describe(self) -> str:
+        """One-line summary, e.g. for a status label"""
+        parts = [f"{self.done:,} {self.unit}"]
+        if self.percent is not None:
+            parts[0] += f" ({self.percent}%)"
+        parts.append(f"{self.rate:,.0f} {self.unit}/s")
+        parts.append(f"{datetime.timedelta(seconds=int(self.elapsed))} elapsed")
+        if self.eta is not None:
+            parts.append(f"{datetime.timedelta(seconds=int(self.eta))} left")
+        return ", ".join(parts)
+
+
+class ProgressReporter:
+    """Calls `callback` with the progress of a task, but only when the
+    whole-number percentage changes or `interval` seconds have passed since
+    the last call, so that updating it after every document is cheap and
+    observers (e.g. progress bars on the Tk thread) aren't flooded.
+
+    `initial` is work already done before the task started, e.g. by an
+    interrupted download being resumed; it doesn't count towards the rate.
+    `clock` gives the time in seconds, e.g. a fake one in tests."""
+
+    def __init__(
+        self,
+        callback: Callable[[Progress], None],
+        total: Optional[int] = None,
+        unit: str = "docs",
+        interval: float = DEFAULT_PROGRESS_INTERVAL,
+        initial: int = 0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.callback = callback
+        self.total = total
+        self.unit = unit
+        self.interval = interval
+        self.initial = initial
+        self.done = initial
+        self.clock = clock
+        self.start_time = clock()
+        self.last_time = self.start_time
+        self.last_percent: Optional[int] = None
+
+    def progress(self) -> Progress:
+        """The progress so far"""
+        elapsed = self.clock() - self.start_time
+        rate = (self.done - self.initial) / elapsed if elapsed > 0 else 0.0
+        return Progress(self.done, self.total, elapsed, rate, self.unit)
+
+    def update(self, done: int) -> None:
+        """Record that `done` units are done, reporting it if it's time to"""
+        self.done = done
+        now = self.clock()
+        percent = None if self.total is None else 100 * done // (self.total or 1)
+        if percent != self.last_percent or now - self.last_time >= self.interval:
+            self.last_percent = percent
+            self.last_time = now
+            self.callback(self.progress())
+
+    def advance(self, count: int = 1) -> None:
+        """Record that `count` more units are done"""
+        self.update(self.done + count)
+
+    def finish(self) -> None:
+        """Report the final progress"""
+        self.last_time = self.clock()
+        self.callback(self.progress())
@@ -3,6 +3,9 @@
 VADER doesn't seem to import its default lexicon in a way that PyInstaller
 # can package. This is a cheap hack so we can pass it to our custom lexicon
 # loader.
+
+Reports don't import this; they use the prebuilt copy in pognlp/data (see
+pognlp.compact_lexicon), which must be rebuilt when this changes.
 """
 
 VADER_LEXICON = """$:	-1.5	0.80623	[-1, -1, -1, -1, -3, -1, -3, -1, -2, -1]
@@ -1,7 +1,9 @@
 """View for the list of stored corpora"""
 
+from tkinter import simpledialog
 from typing import Dict, List, Optional, TYPE_CHECKING
 
+import dateparser
 from tkthread import tk
 
 from pognlp.model.corpus import Corpus
@@ -28,6 +30,10 @@ class CorpusListView(tk.Frame):
         self.grid_columnconfigure(0, weight=1)
         self.grid_rowconfigure(1, weight=1)
 
+        # Summary statistics of the selected corpus
+        self.stats_label = common.Label(self, text="", justify=tk.LEFT)
+        self.stats_label.grid(column=0, row=2, sticky="w")
+
         self.listbox = common.Listbox(
             self,
             exportselection=0,
@@ -41,6 +47,7 @@ class CorpusListView(tk.Frame):
         top_frame.grid(column=0, row=0, sticky="ew")
         top_frame.grid_columnconfigure(0, minsize=100, weight=1)
         top_frame.grid_columnconfigure(1, minsize=100, weight=1)
+        top_frame.grid_columnconfigure(2, minsize=100, weight=1)
         top_frame.grid_rowconfigure(0, minsize=100, weight=1)
 
         create_corpus_button = common.Button(
@@ -53,7 +60,14 @@ class CorpusListView(tk.Frame):
             command=self.delete_corpus,
             text="Delete Selected",
         )
-        self.delete_button.grid(column=1, row=0)
+        self.delete_button.grid(column=2, row=0)
+
+        self.filter_button = common.Button(
+            master=top_frame,
+            command=self.create_filtered_corpus,
+            text="New Filtered View of Selected",
+        )
+        self.filter_button.grid(column=1, row=0)
 
         scrollbar = tk.Scrollbar(self)
         scrollbar.grid(column=1, row=1, sticky="ns")
@@ -90,6 +104,11 @@ class CorpusListView(tk.Frame):
         """Disable buttons if selected_corpus is None, else enable"""
         state = tk.DISABLED if selected_corpus is None else tk.NORMAL
         self.delete_button["state"] = state
+        self.filter_button["state"] = state
+
+        corpus = self.controller.corpora.get().get(selected_corpus or "")
+        stats = corpus.load_stats() if corpus is not None else None
+        self.stats_label["text"] = "\n".join(stats.describe()) if stats else ""
 
     def on_select(self, event: tk.Event) -> None:
         """Set selected_corpus when the listbox selection changes"""
@@ -104,3 +123,51 @@ class CorpusListView(tk.Frame):
         if corpus is None:
             return
         self.controller.delete_corpus(corpus)
+
+    def create_filtered_corpus(self) -> None:
+        """Prompt for a filter and create a view of the selected corpus"""
+        parent_name = self.selected_corpus.get()
+        if parent_name is None:
+            return
+
+        title = "New Filtered View"
+        name = simpledialog.askstring(title, "Name of the view:", parent=self)
+        if not name:
+            return
+        subreddits_text = simpledialog.askstring(
+            title,
+            "Subreddits, separated by commas (leave blank for all):",
+            parent=self,
+        )
+        if subreddits_text is None:
+            return
+        start_text = simpledialog.askstring(
+            title, "Start date and (optional) time (leave blank for none):", parent=self
+        )
+        if start_text is None:
+            return
+        end_text = simpledialog.askstring(
+            title, "End date and (optional) time (leave blank for none):", parent=self
+        )
+        if end_text is None:
+            return
+
+        subreddits = [
+            subreddit.strip().split("/")[-1]
+            for subreddit in subreddits_text.split(",")
+            if subreddit.strip()
+        ]
+        start = dateparser.parse(start_text) if start_text.strip() else None
+        end = dateparser.parse(end_text) if end_text.strip() else None
+        if (start_text.strip() and start is None) or (end_text.strip() and end is None):
+            tk.messagebox.showerror(
+                "Error", "Please check that date/time format is recognizably valid."
+            )
+            return
+
+        try:
+            self.controller.create_filtered_corpus(
+                name, parent_name, subreddits or None, start, end
+            )
+        except ValueError as error:
+            tk.messagebox.showerror("Error", str(error))
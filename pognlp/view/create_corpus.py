@@ -87,6 +87,7 @@ class CreateCorpusView(tk.Frame):
         self.progress_bar = ttk.Progressbar(
             bottom_frame, orient=tk.HORIZONTAL, length=100, mode="indeterminate"
         )
+        self.progress_label = common.Label(bottom_frame, text="")
 
         self.download_in_progress = util.Observable[bool](False)
         self.download_in_progress.subscribe(self.update_progress_bar, call=True)
@@ -116,17 +117,27 @@ class CreateCorpusView(tk.Frame):
             if self.progress_bar["mode"] == "indeterminate":
                 self.progress_bar.start()
             self.progress_bar.grid(column=1, row=4)
+            self.progress_label.configure(text="")
+            self.progress_label.grid(column=1, row=5)
         else:
             self.progress_bar.grid_forget()
+            self.progress_label.grid_forget()
             self.progress_bar["mode"] = "indeterminate"
             self.progress_bar["value"] = 0
             self.progress_bar.stop()
             self.download_button.grid(column=1, row=4, sticky="sew")
 
-    def progress_bar_cb(self, progress: int) -> None:
-        """Called when progress is made on the download"""
-        self.progress_bar["mode"] = "determinate"
-        self.progress_bar["value"] = progress
+    @util.in_main_thread
+    def progress_bar_cb(self, progress: util.Progress) -> None:
+        """Called when progress is made on the download. The number of
+        comments to download isn't known in advance, so the bar only fills
+        up if there's a percentage."""
+        if progress.percent is not None:
+            if self.progress_bar["mode"] == "indeterminate":
+                self.progress_bar.stop()
+            self.progress_bar["mode"] = "determinate"
+            self.progress_bar["value"] = progress.percent
+        self.progress_label.configure(text=progress.describe())
 
     def download(self) -> None:
         """Validate entered data and start the download"""
@@ -199,8 +210,19 @@ class CreateCorpusView(tk.Frame):
                 self.controller.tkt(self.controller.on_corpus_complete)
                 self.controller.tkt(self.reset)
             except Exception as error:
-                tk.messagebox.showerror("Error", f"Error downloading corpus: {error}")
-                corpus.delete()
+                if corpus.shards:
+                    # Keep the partial download so it can be resumed
+                    tk.messagebox.showerror(
+                        "Error",
+                        f"Error downloading corpus: {error}\n\nProgress has been "
+                        "saved. Download again with the same name and parameters "
+                        "to resume.",
+                    )
+                else:
+                    tk.messagebox.showerror(
+                        "Error", f"Error downloading corpus: {error}"
+                    )
+                    corpus.delete()
 
             finally:
                 self.download_in_progress.set(False)
@@ -34,6 +34,11 @@ class CreateReportView(tk.Frame):
 
         self.corpus_listbox = common.Listbox(self, exportselection=0)
         self.corpus_listbox.grid(column=0, row=1, sticky="nsew")
+        self.corpus_listbox.bind("<<ListboxSelect>>", self.on_select_corpus)
+
+        # Size and estimated run time of the selected corpus
+        self.corpus_stats_label = common.Label(self, text="", justify=tk.LEFT)
+        self.corpus_stats_label.grid(column=0, row=2, sticky="w")
 
         self.lexicon_listbox = common.Listbox(
             self, selectmode="multiple", exportselection=0
@@ -77,6 +82,16 @@ class CreateReportView(tk.Frame):
         for corpus_name in self.corpus_names:
             self.corpus_listbox.insert(tk.END, corpus_name)
 
+    def on_select_corpus(self, event: tk.Event) -> None:
+        """Show the selected corpus' statistics"""
+        selection = self.corpus_listbox.curselection()
+        if not selection:
+            return
+        [corpus_index] = selection
+        corpus = self.controller.corpora.get()[self.corpus_names[corpus_index]]
+        stats = corpus.load_stats()
+        self.corpus_stats_label["text"] = "\n".join(stats.describe()) if stats else ""
+
     def update_lexica(self, lexica: Dict[str, Union[DefaultLexicon, Lexicon]]) -> None:
         """Update the list of lexica when one is added or removed"""
         self.lexicon_names = list(lexica.keys())
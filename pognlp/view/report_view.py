@@ -1,6 +1,6 @@
 """View for a single report"""
 
-import shutil
+import os
 import tkinter.ttk as ttk
 from tkinter import filedialog as fd
 from collections import defaultdict
@@ -15,6 +15,7 @@ from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import pognlp.view.theme as theme
 import pognlp.view.common as common
 import pognlp.util as util
+import pognlp.rollups as rollups
 from pognlp.model.lexicon import DefaultLexicon
 from pognlp.model.report import Report
 
@@ -39,6 +40,7 @@ class ReportView(tk.Frame):
         self.report: Optional[Report] = None
 
         self.progressbar: Optional[ttk.Progressbar] = None
+        self.progress_label: Optional[tk.Label] = None
         # Updates when progress is made on a report
 
         self.progress_observer = util.Observer(self.update_progressbar)
@@ -49,29 +51,42 @@ class ReportView(tk.Frame):
         self.controller.current_report.subscribe(self.update_dashboard)
         self.controller.reports.subscribe(self.update_dashboard)
         self.include_body = tk.BooleanVar()
+        self.processes = tk.IntVar(value=1)
+        self.fast_scoring = tk.BooleanVar()
+        self.fast_lemmatization = tk.BooleanVar()
+        self.incremental = tk.BooleanVar(value=True)
 
     @staticmethod
-    def make_timeseries_figure(df: pd.DataFrame) -> matplotlib.figure.Figure:
-        """Create a figure showing the compound sentiment scores as they change over time"""
-        if df.empty:
+    def make_timeseries_figure(totals: pd.DataFrame) -> matplotlib.figure.Figure:
+        """Create a figure showing the compound sentiment scores as they change
+        over time, given the report's hourly rollup totals"""
+        if totals.empty:
             return None
 
-        df["timestamp"] = pd.to_datetime(df["timestamp"])
-
-        time_range = df.max()["timestamp"] - df.min()["timestamp"]
+        time_range = totals.index.max() - totals.index.min()
 
         # Round to 1 hour or else matplotlib will hang and eat all your memory!
         resample_window = (time_range / 15).round("1H")
 
-        # Resample the timeseries to smooth it out and interpolate missing data
-        if len(df) > 20:
-            df = (
-                df.set_index("timestamp")
-                .resample(resample_window)
-                .mean()
-                .interpolate("linear")
-                .reset_index()
+        # Resample the timeseries to smooth it out. Totals add up, so the
+        # means are over all documents in each window.
+        if len(totals) > 20:
+            totals = totals.resample(resample_window).sum()
+
+        summary = rollups.summarize(totals)
+        df = (
+            pd.DataFrame(
+                {
+                    key[: -len(" mean")]: summary[key]
+                    for key in summary.columns
+                    if key.endswith("compound mean")
+                }
             )
+            # Interpolate missing data
+            .interpolate("linear")
+            .rename_axis("timestamp")
+            .reset_index()
+        )
 
         fig = plt.figure()
         axes = fig.add_subplot(111)
@@ -196,9 +211,12 @@ class ReportView(tk.Frame):
             justify=tk.LEFT,
         ).grid(column=0, row=1, sticky="w")
 
+        details = f"Lexica: {', '.join(self.report.lexicon_names)}"
+        if self.report.complete and self.report.lemmatizer is not None:
+            details += f"\nLemmatization: {self.report.lemmatizer}"
         common.Label(
             frame,
-            text=f"Lexica: {', '.join(self.report.lexicon_names)}",
+            text=details,
             justify=tk.LEFT,
         ).grid(column=0, row=2, sticky="w")
 
@@ -213,9 +231,11 @@ class ReportView(tk.Frame):
                 frame, orient=tk.HORIZONTAL, length=100, mode="determinate"
             )
             self.progressbar.grid(column=0, row=3)
+            self.progress_label = common.Label(frame, text="Starting...")
+            self.progress_label.grid(column=0, row=4)
             return
 
-        run_report_button.grid(column=0, row=4)
+        run_report_button.grid(column=0, row=5)
         include_body_button = common.Checkbutton(
             frame,
             text="Include body of comments in report",
@@ -223,18 +243,54 @@ class ReportView(tk.Frame):
         )
         include_body_button.grid(column=0, row=3)
 
+        processes_frame = tk.Frame(frame, bg=theme.background_color)
+        processes_frame.grid(column=0, row=4)
+        common.Label(processes_frame, text="Worker processes").grid(column=0, row=0)
+        ttk.Spinbox(
+            processes_frame,
+            from_=1,
+            to=os.cpu_count() or 1,
+            width=4,
+            textvariable=self.processes,
+            state="readonly",
+        ).grid(column=1, row=0)
+        common.Checkbutton(
+            processes_frame,
+            text="Fast scoring (may differ from VADER by 0.001)",
+            variable=self.fast_scoring,
+        ).grid(column=0, row=1, columnspan=2)
+        common.Checkbutton(
+            processes_frame,
+            text="Fast lemmatization (lookup table, less accurate)",
+            variable=self.fast_lemmatization,
+        ).grid(column=0, row=2, columnspan=2)
+        common.Checkbutton(
+            processes_frame,
+            text="Only analyze what changed since the last run",
+            variable=self.incremental,
+        ).grid(column=0, row=3, columnspan=2)
+
         if self.report.complete:
             export_button = common.Button(
                 frame,
                 self.export,
                 "Export as TSV",
             )
-            export_button.grid(column=0, row=5)
+            export_button.grid(column=0, row=6)
+            common.Button(
+                frame,
+                self.export_trends,
+                "Export daily trends as TSV",
+            ).grid(column=0, row=7)
 
-            current_row = 6
+            current_row = 8
 
-            df = self.report.get_results()
-            figure = self.make_timeseries_figure(df)
+            report_rollups = self.report.get_rollups()
+            figure = (
+                self.make_timeseries_figure(report_rollups.totals("hour"))
+                if report_rollups is not None
+                else None
+            )
             if figure is not None:
                 canvas = FigureCanvasTkAgg(figure, master=frame)
                 canvas.draw()
@@ -243,12 +299,12 @@ class ReportView(tk.Frame):
                 canvas_widget.grid(column=0, row=current_row, sticky="nesw")
                 current_row += 1
 
+            frequencies = self.report.get_frequencies()
             for lexicon_name in self.report.lexicon_names:
                 if lexicon_name == DefaultLexicon.name:
                     continue
 
-                df = self.report.get_frequencies()
-                figure = self.make_frequency_figure(df, lexicon_name)
+                figure = self.make_frequency_figure(frequencies, lexicon_name)
 
                 if figure is None:
                     continue
@@ -260,11 +316,14 @@ class ReportView(tk.Frame):
                 current_row += 1
 
     @util.in_main_thread
-    def update_progressbar(self, progress: Optional[int]) -> None:
-        """Update the progress bar as the report is run"""
+    def update_progressbar(self, progress: Optional[util.Progress]) -> None:
+        """Update the progress bar and the throughput and ETA under it as the
+        report is run"""
         if progress is None or self.progressbar is None:
             return
-        self.progressbar["value"] = progress
+        self.progressbar["value"] = progress.percent or 0
+        if self.progress_label is not None:
+            self.progress_label.configure(text=progress.describe())
 
     def run_report(self) -> None:
         """Start running the report in another thread"""
@@ -280,6 +339,10 @@ class ReportView(tk.Frame):
             try:
                 report.run(
                     include_body=self.include_body.get(),
+                    processes=self.processes.get(),
+                    backend="numpy" if self.fast_scoring.get() else "vader",
+                    lemmatizer="lookup" if self.fast_lemmatization.get() else "rule",
+                    incremental=self.incremental.get(),
                 )
             except Exception as error:
                 tk.messagebox.showerror("Error", f"Error running report: {error}")
@@ -296,4 +359,15 @@ class ReportView(tk.Frame):
 
         dest = fd.asksaveasfilename()
         if dest:
-            shutil.copyfile(self.report.output_path, dest)
+            self.report.export_tsv(dest)
+
+    def export_trends(self, grouping: str = "day") -> None:
+        """Export the report's sentiment means and standard deviations by day
+        to a user-specified location"""
+
+        if self.report is None:
+            return
+
+        dest = fd.asksaveasfilename()
+        if dest:
+            self.report.export_trends(dest, grouping)
@@ -46,4 +46,12 @@ datas += data[0]
 binaries += data[1]
 hiddenimports += data[2]
 
+# ----------------------------- spacy_lookups_data --------------
+
+data = collect_all("spacy_lookups_data")
+
+datas += data[0]
+binaries += data[1]
+hiddenimports += data[2]
+
 # This hook file is a bit of a hack - really, all of the libraries should be in seperate hook files. (Eg hook-blis.py with the blis part of the hook)
@@ -0,0 +1,94 @@
+"""Shared fixtures"""
+
+import atexit
+import importlib.util
+import os
+import shutil
+import sys
+import tempfile
+from types import SimpleNamespace
+from typing import Any, Dict, Optional
+
+import pytest
+
+# Without the spaCy model, lemmatize with a stand-in. Worker processes get
+# the same path.
+if importlib.util.find_spec("en_core_web_sm") is None:
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), "stubs"))
+
+# Keep pognlp.constants, in this process and in report workers, out of the
+# user's data directory
+_data_home = tempfile.mkdtemp(prefix="pognlp-tests-")
+atexit.register(shutil.rmtree, _data_home, ignore_errors=True)
+os.environ["XDG_DATA_HOME"] = _data_home
+
+# pylint: disable=wrong-import-position
+import pognlp.analyze as analyze
+import pognlp.constants as constants
+from pognlp.lexicon_cache import LexiconCache
+import pognlp.model.corpus as corpus_module
+from pognlp.model.corpus import RedditCorpus
+from pognlp.model.lexicon import Lexicon
+
+from test_batch_vader import make_texts
+from test_corpus_resume import (
+    COMPILE_PARAMS,
+    END,
+    START,
+    SUBREDDITS,
+    FakePushshiftAPI,
+    make_comments,
+)
+
+
+@pytest.fixture
+def storage(monkeypatch: pytest.MonkeyPatch, tmp_path: Any) -> Any:
+    """Store corpora, lexica, reports and compiled lexica under tmp_path"""
+    for name in ("corpora", "lexica", "reports"):
+        monkeypatch.setattr(constants, f"{name}_path", str(tmp_path / name))
+    monkeypatch.setattr(
+        analyze, "lexicon_cache", LexiconCache(str(tmp_path / "lexicon_cache"))
+    )
+    return tmp_path
+
+
+# Lexica for reports: single words, multi-word entries and words VADER's
+# rules treat specially
+REPORT_LEXICA = {
+    "joy": [("good", 2), ("love", 3), ("happy", 2.5), ("at least", 1), ("kiss", 1)],
+    "toxic": [("kill", -3), ("hate", -3.5), ("die", -2), ("bad ass", -1), ("no", -1)],
+}
+
+
+@pytest.fixture
+def report_corpus(storage: Any, monkeypatch: pytest.MonkeyPatch) -> RedditCorpus:
+    """A compiled Reddit corpus named "comments", of random text, and the
+    lexica in REPORT_LEXICA. The fake Pushshift API it's downloaded from has
+    two more days of comments after the corpus' end, to extend it with."""
+    comments = make_comments()
+    for comment, text in zip(comments, make_texts(len(comments))):
+        comment.body = text
+    later = [
+        SimpleNamespace(
+            **{
+                **vars(comment),
+                "id": f"later{comment.id}",
+                "created_utc": comment.created_utc
+                + int(END.timestamp())
+                - int(START.timestamp()),
+            }
+        )
+        for comment in comments
+        if comment.created_utc < int(START.timestamp()) + 2 * 24 * 60 * 60
+    ]
+    budget: Dict[str, Optional[int]] = {"remaining": None}
+    monkeypatch.setattr(
+        corpus_module,
+        "make_pushshift_api",
+        lambda *_: FakePushshiftAPI([*comments, *later], budget),
+    )
+    for name, words in REPORT_LEXICA.items():
+        Lexicon(name, words)
+    corpus = RedditCorpus("comments", SUBREDDITS, START, END)
+    corpus.compile(COMPILE_PARAMS)
+    return corpus
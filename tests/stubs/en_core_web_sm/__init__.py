@@ -0,0 +1,32 @@
+"""Stand-in for the en_core_web_sm spaCy model, for running the tests where
+it isn't installed: spaCy's English tokenizer, with lemmas made by dropping
+a plural "s"
+
+Only put on the path by conftest.py when the real model is missing."""
+
+from typing import Iterable
+
+import spacy
+from spacy.language import Language
+from spacy.tokens import Doc
+
+
+@Language.component("plural_lemmatizer")
+def plural_lemmatizer(doc: Doc) -> Doc:
+    """Lemmatize each token by lowercasing it and dropping a plural "s" """
+    for token in doc:
+        word = token.lower_
+        token.lemma_ = word[:-1] if len(word) > 3 and word.endswith("s") else word
+    return doc
+
+
+def load(disable: Iterable[str] = (), exclude: Iterable[str] = ()) -> Language:
+    """Load the pipeline. Like en_core_web_sm, excluding "lemmatizer"
+    leaves just the tokenizer."""
+    del disable
+    nlp = spacy.blank("en")
+    # Keeps the stand-in's lemmas apart from the real model's in caches
+    nlp.meta["name"] = "core_web_sm_stub"
+    if "lemmatizer" not in exclude:
+        nlp.add_pipe("plural_lemmatizer")
+    return nlp
@@ -0,0 +1,81 @@
+"""Agreement of the multi-lexicon analyzer with VADER run once per lexicon"""
+
+from typing import Any, Dict, Union
+
+import pytest
+
+from pognlp.analyze import (
+    CustomSentimentIntensityAnalyzer,
+    compile_lexicon,
+    get_multi_analyzer,
+)
+from pognlp.model.lexicon import DefaultLexicon, Lexicon
+
+from test_batch_vader import CUSTOM_LEXICA, make_texts
+
+# Texts that exercise one rule each: "but", negations, "least", "kind of",
+# boosters, idioms, capitalization and punctuation emphasis
+EDGE_CASES = [
+    "",
+    " ",
+    "!!!",
+    "???",
+    "good but bad",
+    "GOOD but bad!!!",
+    "but",
+    "not bad at all",
+    "no good",
+    "no",
+    "least good",
+    "at least good",
+    "the least bad",
+    "kind of good",
+    "KIND OF bad",
+    "kind of",
+    "good kind",
+    "sort of love",
+    "very good",
+    "extremely GOOD love HATE",
+    "not very good",
+    "never so good",
+    "without doubt good",
+    "this is the shit",
+    "the bomb",
+    "bad ass movie",
+    "yeah right",
+    "kiss of death",
+    "to die for",
+    "I LOVE it?!?!",
+    "no no no",
+    "nor the win",
+    "good :) bad :(",
+    "lol sux",
+    "HAPPY happy Happy",
+    "GOOD??? bad!!!!",
+    "ALL CAPS ARE NOT GOOD",
+]
+
+
+@pytest.fixture
+def lexica(storage: Any) -> Dict[str, Union[Lexicon, DefaultLexicon]]:
+    del storage
+    return {
+        DefaultLexicon.name: DefaultLexicon(),
+        **{name: Lexicon(name, words) for name, words in CUSTOM_LEXICA.items()},
+    }
+
+
+def test_polarity_scores_multi(
+    lexica: Dict[str, Union[Lexicon, DefaultLexicon]],
+) -> None:
+    texts = EDGE_CASES + make_texts(3000, seed=1)
+    analyzer = get_multi_analyzer(lexica)
+    references = {
+        name: CustomSentimentIntensityAnalyzer(compile_lexicon(lexicon))
+        for name, lexicon in lexica.items()
+    }
+    for text in texts:
+        scores = analyzer.polarity_scores_multi(text)
+        assert list(scores) == list(lexica)
+        for name, reference in references.items():
+            assert scores[name] == reference.polarity_scores(text), (name, text)
@@ -0,0 +1,96 @@
+"""Agreement of the vectorized VADER backend with VADER itself"""
+
+import random
+from typing import Any, Dict, List, Union
+
+import numpy as np
+import pytest
+
+import pognlp.analyze as analyze
+from pognlp.analyze import CustomSentimentIntensityAnalyzer, compile_lexicon
+from pognlp.batch_vader import SCORE_FIELDS, TOLERANCE, score_batch
+import pognlp.constants as constants
+from pognlp.lexicon_cache import LexiconCache
+from pognlp.model.lexicon import DefaultLexicon, Lexicon
+
+# Words that exercise VADER's rules: negations, boosters, idioms, "least",
+# "but", "kind of", emoticons and slang from the default lexicon
+VOCABULARY = (
+    "good bad great terrible no not never so this without doubt least at very "
+    "kind of sort but or nor the shit bomb bad ass yeah right kiss death to die "
+    "for extremely slightly kinda isn't don't cannot love hate kill fight win "
+    "lose happy sad :) :( lol sux uber friggin at least nope despite bus stop"
+).split()
+
+CUSTOM_LEXICA = {
+    "rules": [
+        ("good", 2),
+        ("kill", -3),
+        ("no", -1),
+        ("least", 1.5),
+        ("very", 2),
+        ("kind", 1),
+        ("but", 0.5),
+        ("extremely", -1),
+        ("shit", -2),
+    ],
+    "plain": [
+        ("love", 3),
+        ("hate", -3.5),
+        ("win", 2),
+        ("fight", -2),
+        ("bomb", 1),
+        ("the", 0),
+        ("not", -0.5),
+    ],
+    "empty": [],
+    "boosted": [("so", 1), ("this", -1), ("at", 1), ("sad", -2.2)],
+}
+
+
+def make_texts(count: int, seed: int = 0) -> List[str]:
+    """Random comments made of VOCABULARY, with some shouting and
+    punctuation"""
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(count):
+        words = [rng.choice(VOCABULARY) for _ in range(rng.randint(0, 25))]
+        words = [word.upper() if rng.random() < 0.15 else word for word in words]
+        words = [word + rng.choice(["", "", "!", "?", ",", "."]) for word in words]
+        texts.append(" ".join(words) + rng.choice(["", "!!!", "??", "?!?!", " "]))
+    return texts
+
+
+@pytest.fixture
+def lexica(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Any
+) -> Dict[str, Union[Lexicon, DefaultLexicon]]:
+    monkeypatch.setattr(constants, "lexica_path", str(tmp_path / "lexica"))
+    monkeypatch.setattr(
+        analyze, "lexicon_cache", LexiconCache(str(tmp_path / "lexicon_cache"))
+    )
+    return {
+        DefaultLexicon.name: DefaultLexicon(),
+        **{name: Lexicon(name, words) for name, words in CUSTOM_LEXICA.items()},
+    }
+
+
+def test_score_batch_matches_vader(
+    lexica: Dict[str, Union[Lexicon, DefaultLexicon]],
+) -> None:
+    texts = make_texts(3000)
+    scores = score_batch(texts, lexica)
+    assert scores.shape == (len(texts), len(lexica), len(SCORE_FIELDS))
+
+    tolerance = np.array([TOLERANCE[field] for field in SCORE_FIELDS])
+    for index, lexicon in enumerate(lexica.values()):
+        analyzer = CustomSentimentIntensityAnalyzer(compile_lexicon(lexicon))
+        reference = np.array(
+            [
+                [analyzer.polarity_scores(text)[field] for field in SCORE_FIELDS]
+                for text in texts
+            ]
+        )
+        difference = np.abs(scores[:, index] - reference)
+        # Rounding error aside, the scores are VADER's
+        assert (difference <= tolerance + 1e-12).all()
@@ -0,0 +1,59 @@
+"""Extending a Reddit corpus stored in the legacy comments.pickle.gz format"""
+
+import datetime
+from typing import Any, Dict, Optional
+
+import compress_pickle
+import pytest
+
+import pognlp.constants as constants
+import pognlp.model.corpus as corpus_module
+from pognlp.model.corpus import Corpus, RedditCorpus
+
+from test_corpus_resume import (
+    COMPILE_PARAMS,
+    END,
+    START,
+    SUBREDDITS,
+    FakePushshiftAPI,
+    make_comments,
+    stored_ids,
+)
+
+OLD_END = START + datetime.timedelta(days=5)
+
+
+def test_extend_legacy_corpus(monkeypatch: pytest.MonkeyPatch, tmp_path: Any) -> None:
+    monkeypatch.setattr(constants, "corpora_path", str(tmp_path))
+    comments = make_comments()
+    old_end_epoch = int(OLD_END.timestamp())
+    old_comments = [
+        comment for comment in comments if comment.created_utc < old_end_epoch
+    ]
+    budget: Dict[str, Optional[int]] = {"remaining": None}
+    monkeypatch.setattr(
+        corpus_module,
+        "make_pushshift_api",
+        lambda *_: FakePushshiftAPI(comments, budget),
+    )
+
+    legacy = RedditCorpus(
+        "legacy",
+        SUBREDDITS,
+        START,
+        OLD_END,
+        document_count=len(old_comments),
+        compiled=True,
+    )
+    with open(legacy.comments_pickle_path, "wb") as pickle_file:
+        compress_pickle.dump(old_comments, pickle_file, compression="gzip")
+
+    corpus = Corpus.load("legacy")
+    assert isinstance(corpus, RedditCorpus)
+    corpus.extend(COMPILE_PARAMS, new_end_time=END)
+
+    ids = stored_ids(corpus)
+    assert len(ids) == len(set(ids))
+    assert sorted(ids) == sorted(comment.id for comment in comments)
+    assert corpus.document_count == len(comments)
+    assert corpus.stats.document_count == len(comments)
@@ -0,0 +1,134 @@
+"""Resuming an interrupted Reddit corpus download"""
+
+import datetime
+import random
+import threading
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional
+
+import pytest
+import rtoml as toml
+
+import pognlp.constants as constants
+import pognlp.model.corpus as corpus_module
+from pognlp.model.corpus import Corpus, RedditCorpus
+from pognlp.stats import STATS_NAME
+import pognlp.store as store
+
+SUBREDDITS = ["aww", "news", "pics"]
+START = datetime.datetime(2021, 3, 1)
+END = datetime.datetime(2021, 3, 11)
+
+COMPILE_PARAMS = {
+    "client_id": "",
+    "client_secret": "",
+    "window_days": 3,
+    "workers": 2,
+    "shard_size": 10,
+    "requests_per_minute": 60000,
+}
+
+
+def make_comments(seed: int = 0) -> List[SimpleNamespace]:
+    """Comments like Pushshift's, several of them sharing each timestamp so
+    that resuming has to skip the ones it already stored"""
+    rng = random.Random(seed)
+    start, end = int(START.timestamp()), int(END.timestamp())
+    comments = []
+    for index in range(600):
+        subreddit = rng.choice(SUBREDDITS)
+        comments.append(
+            SimpleNamespace(
+                body=f"comment {index} " + "word " * rng.randrange(20),
+                created_utc=start + rng.randrange(0, end - start, 3600),
+                score=rng.randrange(-20, 200),
+                id=f"c{index}",
+                link_id=f"t3_s{index % 17}",
+                subreddit=SimpleNamespace(display_name=subreddit),
+                author=SimpleNamespace(name=f"user{index % 31}"),
+                parent_id=f"t3_s{index % 17}",
+            )
+        )
+    return sorted(comments, key=lambda comment: comment.created_utc)
+
+
+class FakePushshiftAPI:
+    """Stand-in for the Pushshift search endpoint that fails once a shared
+    budget of comments has been served. A budget of None never runs out."""
+
+    def __init__(
+        self, comments: List[SimpleNamespace], budget: Dict[str, Optional[int]]
+    ):
+        self.comments = comments
+        self.budget = budget
+        self.lock = threading.Lock()
+
+    def search_comments(
+        self, after: int, before: int, subreddit: str, **_: Any
+    ) -> Iterator[SimpleNamespace]:
+        for comment in self.comments:
+            if (
+                comment.subreddit.display_name != subreddit
+                or not after < comment.created_utc < before
+            ):
+                continue
+            with self.lock:
+                remaining = self.budget["remaining"]
+                if remaining == 0:
+                    raise ConnectionError("Pushshift went away")
+                if remaining is not None:
+                    self.budget["remaining"] = remaining - 1
+            yield comment
+
+
+def compile_corpus(
+    monkeypatch: pytest.MonkeyPatch, name: str, fail_after: Optional[int]
+) -> RedditCorpus:
+    """Compile a corpus from the fake API, retrying after each failure the
+    way a user would, until it succeeds"""
+    comments = make_comments()
+    budget: Dict[str, Optional[int]] = {"remaining": fail_after}
+    monkeypatch.setattr(
+        corpus_module,
+        "make_pushshift_api",
+        lambda *_: FakePushshiftAPI(comments, budget),
+    )
+    RedditCorpus(name, SUBREDDITS, START, END)
+    for _ in range(100):
+        budget["remaining"] = fail_after
+        corpus = Corpus.load(name)
+        assert isinstance(corpus, RedditCorpus)
+        try:
+            corpus.compile(COMPILE_PARAMS)
+            return corpus
+        except ConnectionError:
+            pass
+    raise AssertionError("The download never finished.")
+
+
+def stored_ids(corpus: RedditCorpus) -> List[str]:
+    return [
+        row["id"]
+        for row in store.iterate_rows(corpus.store_path, corpus.shards, ["id"])
+    ]
+
+
+def test_resume(monkeypatch: pytest.MonkeyPatch, tmp_path: Any) -> None:
+    monkeypatch.setattr(constants, "corpora_path", str(tmp_path))
+    # Small batches, so that failures happen between checkpoints
+    monkeypatch.setattr(corpus_module, "FETCH_BATCH_SIZE", 4)
+
+    uninterrupted = compile_corpus(monkeypatch, "uninterrupted", None)
+    resumed = compile_corpus(monkeypatch, "resumed", 45)
+
+    expected_ids = stored_ids(uninterrupted)
+    ids = stored_ids(resumed)
+    assert len(ids) == len(set(ids))
+    assert sorted(ids) == sorted(expected_ids)
+    assert sorted(ids) == sorted(comment.id for comment in make_comments())
+    assert resumed.document_count == len(ids)
+
+    with open(tmp_path / "uninterrupted" / STATS_NAME, encoding="utf-8") as file:
+        expected_stats = toml.load(file)
+    with open(tmp_path / "resumed" / STATS_NAME, encoding="utf-8") as file:
+        assert toml.load(file) == expected_stats
@@ -0,0 +1,111 @@
+"""The document cache: merging segments, and reports run with it giving the
+same results as without"""
+
+import os
+import random
+from typing import Any, Dict, List, Tuple
+
+import pytest
+
+import pognlp.document_cache as document_cache
+from pognlp.document_cache import LemmaTable, ScoreTable, document_key
+from pognlp.model.corpus import RedditCorpus
+from pognlp.model.lexicon import Lexicon
+from pognlp.model.report import DocumentAnalyzer, Report
+
+LEXICON_NAMES = ["VADER Default Lexicon", "joy", "toxic"]
+
+
+def test_compaction(monkeypatch: pytest.MonkeyPatch, tmp_path: Any) -> None:
+    monkeypatch.setattr(document_cache, "MAX_SEGMENTS", 3)
+    rng = random.Random(0)
+    words = ["good", "bad", "ugly", "", "ünïcode", "very long " * 10]
+    lemmas = LemmaTable(str(tmp_path / "lemmas"))
+    scores = ScoreTable(str(tmp_path / "scores"))
+    expected_lemmas: Dict[bytes, List[str]] = {}
+    expected_scores: Dict[bytes, Tuple[float, float, float, float]] = {}
+    for flush in range(10):
+        # Some documents are cached again, as by runs in parallel
+        for index in rng.sample(range(300), 40):
+            key = document_key(f"c{index}", "")
+            value = [rng.choice(words) for _ in range(rng.randrange(5))]
+            expected_lemmas.setdefault(key, value)
+            lemmas.add(key, expected_lemmas[key])
+            score = (rng.random(), rng.random(), rng.random(), float(flush))
+            expected_scores.setdefault(key, score)
+            scores.add(key, expected_scores[key])
+        lemmas.flush()
+        scores.flush()
+        assert len(lemmas.segments) <= 3 and len(scores.segments) <= 3
+
+    keys = [document_key(f"c{index}", "") for index in range(300)]
+    for table, expected, columns in (
+        (lemmas, expected_lemmas, 4),
+        (scores, expected_scores, 2),
+    ):
+        # Merged segments' files are gone
+        assert len(os.listdir(table.directory)) == len(table.segments) * columns
+        reloaded = type(table)(table.directory)
+        assert reloaded.lookup(keys) == [expected.get(key) for key in keys]
+
+
+def run(report: Report, **kwargs: Any) -> Dict[str, bytes]:
+    """Run a report and get the contents of its results table's files and
+    of its frequencies"""
+    report.run(**kwargs)
+    contents = {}
+    for name in os.listdir(report.results_path):
+        with open(os.path.join(report.results_path, name), "rb") as results_file:
+            contents[name] = results_file.read()
+    with open(report.frequency_path, "rb") as frequency_file:
+        contents["frequencies"] = frequency_file.read()
+    return contents
+
+
+def segments(corpus: RedditCorpus) -> Dict[str, List[str]]:
+    """The segments of each table of a corpus' cache"""
+    return {
+        table: sorted(os.listdir(os.path.join(corpus.cache_directory, table)))
+        for table in os.listdir(corpus.cache_directory)
+    }
+
+
+@pytest.mark.parametrize("backend", ["vader", "numpy"])
+def test_cached_run(report_corpus: RedditCorpus, backend: str) -> None:
+    report = Report("report", report_corpus.name, LEXICON_NAMES)
+    uncached = run(report, backend=backend, use_cache=False)
+    assert not os.path.exists(report_corpus.cache_directory)
+    # Filling the cache, then reading from it
+    assert run(report, backend=backend) == uncached
+    assert run(report, backend=backend) == uncached
+
+
+def test_edited_lexicon(
+    report_corpus: RedditCorpus, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    report = Report("report", report_corpus.name, LEXICON_NAMES)
+    run(report)
+    before = segments(report_corpus)
+    assert len(before) == 1 + len(LEXICON_NAMES)
+
+    Lexicon("toxic", [("kill", -2), ("hate", -3.5), ("die", -2), ("awful", -2)])
+    scored: List[Tuple[str, ...]] = []
+    score = DocumentAnalyzer.score
+
+    def spy(analyzer: DocumentAnalyzer, bodies: List[str], names: Any) -> Any:
+        scored.append(names)
+        return score(analyzer, bodies, names)
+
+    monkeypatch.setattr(DocumentAnalyzer, "score", spy)
+    cached = run(report)
+    assert scored and set(scored) == {("toxic",)}
+
+    after = segments(report_corpus)
+    # The new version of the lexicon has its own table, the old one's was
+    # pruned, and the others are as they were
+    assert len(after) == len(before)
+    assert len(set(after) - set(before)) == 1
+    assert all(after[table] == before[table] for table in set(after) & set(before))
+
+    monkeypatch.setattr(DocumentAnalyzer, "score", score)
+    assert cached == run(report, use_cache=False)
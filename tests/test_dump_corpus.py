@@ -0,0 +1,115 @@
+"""Compiling corpora from Pushshift's monthly comment dumps"""
+
+import datetime
+import io
+import json
+import random
+from typing import Any, Dict, List
+
+import pytest
+import zstandard
+
+import pognlp.model.corpus as corpus_module
+from pognlp.model.corpus import PushshiftDumpCorpus, iterate_dump_chunks
+import pognlp.store as store
+
+START = datetime.datetime(2021, 3, 5)
+END = datetime.datetime(2021, 3, 20)
+SUBREDDITS = ["aww", "News"]
+
+
+def make_dump_comments(seed: int = 0) -> List[Dict[str, Any]]:
+    """Comments of March 2021 like the dumps', some of them in odd shapes"""
+    rng = random.Random(seed)
+    month_start = int(datetime.datetime(2021, 3, 1).timestamp())
+    month_end = int(datetime.datetime(2021, 4, 1).timestamp())
+    comments = []
+    for index in range(500):
+        comment: Dict[str, Any] = {
+            "body": rng.choice(
+                ["short", "multi\nline\n\nbody", "ünïcode ✓ " * 30, "", "[deleted]"]
+            ),
+            "created_utc": rng.randrange(month_start, month_end),
+            "score": rng.randrange(-50, 500),
+            "id": f"d{index}",
+            "link_id": f"t3_s{index % 13}",
+            "subreddit": rng.choice(["aww", "AWW", "news", "pics", "askreddit"]),
+            "author": rng.choice(["someone", "[deleted]", None]),
+            "parent_id": f"t1_d{index - 1}",
+            # Dumps have many more fields
+            "gilded": 0,
+            "distinguished": None,
+        }
+        if index % 7 == 0:
+            # Some older dumps store timestamps as strings
+            comment["created_utc"] = str(comment["created_utc"])
+        if index % 11 == 0:
+            del comment["score"]
+        comments.append(comment)
+    comments.sort(key=lambda comment: int(comment["created_utc"]))
+    return comments
+
+
+def write_dump(path: Any, comments: List[Dict[str, Any]]) -> None:
+    ndjson = "".join(json.dumps(comment) + "\n" for comment in comments)
+    with open(path, "wb") as dump_file:
+        dump_file.write(zstandard.ZstdCompressor().compress(ndjson.encode("utf-8")))
+
+
+def expected_rows(comments: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """The comments that belong in the corpus, filtered one by one"""
+    start, end = int(START.timestamp()), int(END.timestamp())
+    subreddits = {subreddit.lower() for subreddit in SUBREDDITS}
+    return [
+        {
+            "body": comment["body"],
+            "created_utc": int(comment["created_utc"]),
+            "score": int(comment.get("score") or 0),
+            "id": comment["id"],
+            "link_id": comment["link_id"][3:],
+            "subreddit": comment["subreddit"],
+            "author": (
+                "" if comment["author"] in (None, "[deleted]") else comment["author"]
+            ),
+            "parent_id": comment["parent_id"],
+        }
+        for comment in comments
+        if start <= int(comment["created_utc"]) < end
+        and comment["subreddit"].lower() in subreddits
+    ]
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_compile(storage: Any, monkeypatch: pytest.MonkeyPatch, processes: int) -> None:
+    # Small chunks, so that many comments are split across them
+    monkeypatch.setattr(corpus_module, "DUMP_CHUNK_SIZE", 1000)
+    comments = make_dump_comments()
+    dump_path = storage / "RC_2021-03.zst"
+    write_dump(dump_path, comments)
+    # A dump of a month outside the time range isn't even opened
+    other_path = storage / "RC_2020-01.zst"
+    other_path.write_bytes(b"not zstd")
+
+    corpus = PushshiftDumpCorpus(
+        "dump", [str(other_path), str(dump_path)], SUBREDDITS, START, END
+    )
+    corpus.compile({"shard_size": 20, "processes": processes})
+
+    expected = expected_rows(comments)
+    assert 0 < len(expected) < len(comments)
+    rows = list(store.iterate_rows(corpus.store_path, corpus.shards))
+    assert rows == expected
+    assert corpus.document_count == len(expected)
+    assert corpus.stats.document_count == len(expected)
+
+
+def test_chunks(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(corpus_module, "DUMP_CHUNK_SIZE", 7)
+    lines = [b'{"a": 1}', b"", b'{"body": "' + b"x" * 30 + b'"}', b"{}"]
+    for ndjson in (b"\n".join(lines), b"\n".join(lines) + b"\n", b""):
+        compressed = zstandard.ZstdCompressor().compress(ndjson)
+        chunks = list(iterate_dump_chunks(io.BytesIO(compressed)))
+        assert b"".join(chunks) == ndjson
+        # Each chunk but the last ends at a line break, so no line is split
+        assert all(chunk.endswith(b"\n") for chunk in chunks[:-1])
+        assert all(chunk for chunk in chunks)
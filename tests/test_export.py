@@ -0,0 +1,116 @@
+"""Exporting results as TSV in the format of the old output.tsv"""
+
+import datetime
+import os
+import shutil
+from typing import Any, Dict, List
+
+from pognlp.model.report import OUTPUT_NAME, Report
+from pognlp.results_table import ResultsTable, ResultsWriter, column_kinds, write_tsv
+
+# output.tsv as Report.run wrote it before results were columnar, of ROWS
+GOLDEN_PATH = os.path.join(os.path.dirname(__file__), "data", "output.tsv")
+
+SCORE_COLUMNS = ["joy positive", "joy neutral", "joy negative", "joy compound"]
+
+FIELDNAMES = [
+    "body",
+    "timestamp",
+    "score",
+    "comment ID",
+    "submission ID",
+    "subreddit",
+    *SCORE_COLUMNS,
+]
+
+NAN = float("nan")
+
+# Small scores, NaN, and a body with a tab, a newline and quotes
+ROWS: List[Dict[str, Any]] = [
+    dict(zip(FIELDNAMES, values))
+    for values in [
+        (
+            "plain",
+            datetime.datetime(2021, 3, 1, 5),
+            12,
+            "c1",
+            "s1",
+            "aww",
+            0.0,
+            1.0,
+            0.0,
+            0.0001,
+        ),
+        (
+            'tab\tand\nnewline "quoted"',
+            datetime.datetime(2021, 3, 1, 23, 59, 59),
+            -3,
+            "c2",
+            "s1",
+            "news",
+            0.123,
+            0.877,
+            0.0,
+            -0.0001,
+        ),
+        ("", datetime.datetime(2021, 3, 2), 0, "c3", "s2", "pics", NAN, NAN, NAN, NAN),
+        (
+            "ünïcode ✓",
+            datetime.datetime(2021, 3, 3, 12, 30),
+            100000,
+            "c4",
+            "s3",
+            "aww",
+            0.5,
+            0.25,
+            0.25,
+            -0.9999,
+        ),
+        (
+            "small",
+            datetime.datetime(2021, 3, 4, 1, 2, 3),
+            1,
+            "c5",
+            "s4",
+            "news",
+            0.001,
+            0.998,
+            0.001,
+            0.0005,
+        ),
+        (
+            "big",
+            datetime.datetime(2021, 3, 5),
+            7,
+            "c6",
+            "s5",
+            "pics",
+            0.348,
+            0.652,
+            0.0,
+            0.9991,
+        ),
+    ]
+]
+
+
+def read(path: str) -> bytes:
+    with open(path, "rb") as tsv_file:
+        return tsv_file.read()
+
+
+def test_write_tsv(tmp_path: Any) -> None:
+    results_path = str(tmp_path / "results")
+    with ResultsWriter(results_path, column_kinds(FIELDNAMES, SCORE_COLUMNS)) as writer:
+        for row in ROWS:
+            writer.append(row)
+    write_tsv(ResultsTable(results_path), str(tmp_path / "output.tsv"))
+    assert read(str(tmp_path / "output.tsv")) == read(GOLDEN_PATH)
+
+
+def test_migrated_report(storage: Any) -> None:
+    # A report run before results were columnar
+    report = Report("old", "corpus", ["joy"], complete=True)
+    shutil.copy(GOLDEN_PATH, os.path.join(report.directory, OUTPUT_NAME))
+    report.export_tsv(str(storage / "export.tsv"))
+    assert read(str(storage / "export.tsv")) == read(GOLDEN_PATH)
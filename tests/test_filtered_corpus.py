@@ -0,0 +1,93 @@
+"""Filtered views of a Reddit corpus reading the same rows as a full scan"""
+
+import datetime
+from typing import Any, Dict, List, Optional
+
+import pytest
+
+from pognlp.model.corpus import Corpus, FilteredRedditCorpus, RedditCorpus
+import pognlp.store as store
+
+from test_corpus_resume import COMPILE_PARAMS, END, START
+
+DAY = datetime.timedelta(days=1)
+
+# Subreddits, start and end of each view. Comments are created on the hour,
+# so some of them are right on the time bounds.
+VIEWS: Dict[str, Dict[str, Any]] = {
+    "everything": {},
+    "aww": {"subreddits": ["AWW"]},
+    "two": {"subreddits": ["news", "pics"]},
+    "none": {"subreddits": ["nothing"]},
+    "week": {"start_time": START + 2 * DAY, "end_time": START + 9 * DAY},
+    "since": {"subreddits": ["pics"], "start_time": START + 5 * DAY},
+    "until": {"subreddits": ["aww", "news"], "end_time": START + 3 * DAY},
+    "later": {"start_time": END},
+}
+
+
+def full_scan(
+    parent: RedditCorpus,
+    subreddits: Optional[List[str]] = None,
+    start_time: Optional[datetime.datetime] = None,
+    end_time: Optional[datetime.datetime] = None,
+) -> List[str]:
+    """IDs of the rows matching a filter, checking every row of the parent"""
+    wanted = None if subreddits is None else {name.lower() for name in subreddits}
+    start = int(start_time.timestamp()) if start_time else None
+    end = int(end_time.timestamp()) if end_time else None
+    return [
+        row["id"]
+        for row in store.iterate_rows(parent.store_path, parent.shards)
+        if (wanted is None or row["subreddit"].lower() in wanted)
+        and (start is None or row["created_utc"] >= start)
+        and (end is None or row["created_utc"] < end)
+    ]
+
+
+def assert_views_match(parent: RedditCorpus) -> None:
+    for name, view_filter in VIEWS.items():
+        view = Corpus.load(name)
+        assert isinstance(view, FilteredRedditCorpus)
+        expected = full_scan(parent, **view_filter)
+        ids = [document["comment ID"] for document in view.iterate_documents()]
+        assert ids == expected, name
+        assert view.document_count == len(expected), name
+        stats = view.load_stats()
+        assert stats is not None and stats.document_count == len(expected), name
+
+        # Shards skipped by their summaries have no matching rows, and the
+        # index finds the same rows as checking each one
+        row_filter = view.row_filter
+        expected_ids = set(expected)
+        for summary in parent.shards:
+            shard = store.open_shard(parent.store_path, summary)
+            rows = [
+                index
+                for index, row in enumerate(shard.iterate_rows(["id"]))
+                if row["id"] in expected_ids
+            ]
+            assert shard.select(row_filter).tolist() == rows
+            if not row_filter.matches_summary(summary):
+                assert not rows
+
+
+def test_filtered_views(report_corpus: RedditCorpus) -> None:
+    for name, view_filter in VIEWS.items():
+        FilteredRedditCorpus(name, report_corpus.name, **view_filter).compile({})
+    assert_views_match(report_corpus)
+
+    report_corpus.extend(COMPILE_PARAMS, END + 2 * DAY)
+    parent = Corpus.load(report_corpus.name)
+    assert isinstance(parent, RedditCorpus)
+    assert_views_match(parent)
+    assert Corpus.load("later").document_count > 0
+
+
+@pytest.mark.parametrize("name", ["aww", "week"])
+def test_refresh(report_corpus: RedditCorpus, name: str) -> None:
+    FilteredRedditCorpus(name, report_corpus.name, **VIEWS[name]).compile({})
+    report_corpus.extend(COMPILE_PARAMS, END + 2 * DAY)
+    view = Corpus.load(name)
+    view.refresh()
+    assert view.document_count == len(full_scan(report_corpus, **VIEWS[name]))
@@ -0,0 +1,68 @@
+"""Incremental report runs giving the same output as full runs"""
+
+import datetime
+from typing import Any, List
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pognlp.model.corpus import RedditCorpus
+from pognlp.model.lexicon import Lexicon
+from pognlp.model.report import Report
+from pognlp.rollups import GROUPINGS
+from pognlp.sketches import ARRAY_NAMES
+
+from test_corpus_resume import COMPILE_PARAMS, END
+
+LEXICON_NAMES = ["VADER Default Lexicon", "joy", "toxic"]
+
+
+def assert_same_output(report: Report, expected: Report) -> None:
+    pd.testing.assert_frame_equal(report.get_results(), expected.get_results())
+    pd.testing.assert_frame_equal(report.get_frequencies(), expected.get_frequencies())
+
+    rollups, expected_rollups = report.get_rollups(), expected.get_rollups()
+    assert rollups is not None and expected_rollups is not None
+    for grouping in GROUPINGS:
+        pd.testing.assert_frame_equal(
+            rollups.totals(grouping), expected_rollups.totals(grouping)
+        )
+
+    sketches, expected_sketches = report.get_sketches(), expected.get_sketches()
+    assert sketches is not None and expected_sketches is not None
+    for name in ARRAY_NAMES:
+        np.testing.assert_array_equal(
+            getattr(sketches, name), getattr(expected_sketches, name)
+        )
+    for score, histograms in expected_sketches.histograms.items():
+        np.testing.assert_array_equal(sketches.histograms[score], histograms)
+
+
+@pytest.mark.parametrize("use_cache", [True, False])
+def test_incremental_run(
+    report_corpus: RedditCorpus, monkeypatch: pytest.MonkeyPatch, use_cache: bool
+) -> None:
+    report = Report("incremental", report_corpus.name, LEXICON_NAMES)
+    report.run(incremental=True, use_cache=use_cache)
+    document_count = report_corpus.document_count
+
+    report_corpus.extend(COMPILE_PARAMS, END + datetime.timedelta(days=2))
+    assert report_corpus.document_count > document_count
+    Lexicon("joy", [("good", 1.5), ("love", 3), ("sweet", 2), ("at least", 1)])
+
+    full_runs: List[Any] = []
+    run_full = Report.run_full
+
+    def spy(*args: Any, **kwargs: Any) -> Any:
+        full_runs.append(args)
+        return run_full(*args, **kwargs)
+
+    monkeypatch.setattr(Report, "run_full", spy)
+    report.run(incremental=True, use_cache=use_cache)
+    assert not full_runs
+
+    monkeypatch.setattr(Report, "run_full", run_full)
+    full = Report("full", report_corpus.name, LEXICON_NAMES)
+    full.run(use_cache=False)
+    assert_same_output(report, full)
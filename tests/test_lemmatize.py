@@ -0,0 +1,44 @@
+"""Reporting a missing spaCy model or lookup table"""
+
+import sys
+from typing import Any
+
+import pytest
+
+import pognlp.lemmatize as lemmatize
+from pognlp.model.corpus import RedditCorpus
+from pognlp.model.report import Report
+
+
+def missing_lookups(*_: Any) -> None:
+    # What spaCy raises without spacy-lookups-data
+    raise ValueError("[E955] Can't find table(s) lemma_lookup for language 'en'")
+
+
+def test_missing_lookups(
+    report_corpus: RedditCorpus, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(lemmatize, "load_lookups", missing_lookups)
+    report = Report("report", report_corpus.name, ["joy"])
+    with pytest.raises(ValueError) as error:
+        report.run(lemmatizer="lookup")
+    message = str(error.value)
+    assert "spacy-lookups-data" in message and '"rule"' in message
+    assert not report.complete and not report.in_progress.get()
+    assert report.progress.get() is None
+
+    # Rule lemmatization still works
+    report.run(lemmatizer="rule")
+    assert report.complete
+
+
+def test_missing_model(
+    report_corpus: RedditCorpus, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # Makes importing it raise ImportError
+    monkeypatch.setitem(sys.modules, "en_core_web_sm", None)
+    report = Report("report", report_corpus.name, ["joy"])
+    with pytest.raises(ValueError) as error:
+        report.run()
+    assert "en_core_web_sm" in str(error.value)
+    assert not report.complete
@@ -0,0 +1,98 @@
+"""Agreement of the phrase matcher with counting entries one by one"""
+
+import random
+from typing import Counter, List, Sequence, Tuple
+
+from pognlp.lemmatize import Lemmatizer
+from pognlp.phrase_matcher import PhraseMatcher
+
+Entry = Tuple[Tuple[str, ...], str]
+
+
+def brute_force(entries: Sequence[Entry], lemmas: List[str]) -> Counter[str]:
+    """Count each entry at each position of `lemmas`"""
+    counts = Counter[str]()
+    for entry_lemmas, key in set(entries):
+        size = len(entry_lemmas)
+        for start in range(len(lemmas) - size + 1):
+            if tuple(lemmas[start : start + size]) == entry_lemmas:
+                counts[key] += 1
+    return counts
+
+
+def count(matcher: PhraseMatcher, lemmas: List[str]) -> Counter[str]:
+    counts = Counter[str]()
+    matcher.count(lemmas, counts)
+    return +counts
+
+
+def make_matcher(entries: Sequence[Entry]) -> PhraseMatcher:
+    matcher = PhraseMatcher()
+    for lemmas, key in entries:
+        matcher.add(lemmas, key)
+    return matcher
+
+
+def test_edge_cases() -> None:
+    entries: List[Entry] = [
+        (("kill",), "kill"),
+        (("kill", "you"), "kill you"),
+        (("kill", "you", "all"), "kill you all"),
+        (("you", "all"), "you all"),
+        (("a", "a"), "a a"),
+        (("a", "b", "a"), "a b a"),
+        (("b", "a", "b"), "b a b"),
+        # Added twice, counted once
+        (("you",), "you"),
+        (("you",), "you"),
+    ]
+    matcher = make_matcher(entries)
+    documents = [
+        [],
+        ["kill", "you", "all"],
+        ["kill", "kill", "you", "you", "all"],
+        ["a", "a", "a", "a"],
+        ["a", "b", "a", "b", "a"],
+        # Lemmas only match whole
+        ["skill", "your"],
+        ["kil", "lyou"],
+        ["kill", "your", "skill", "you"],
+    ]
+    for lemmas in documents:
+        assert count(matcher, lemmas) == brute_force(entries, lemmas), lemmas
+    assert count(matcher, ["a", "a", "a", "a"]) == {"a a": 3}
+    assert count(matcher, ["skill", "your"]) == {}
+
+
+def test_random() -> None:
+    rng = random.Random(0)
+    vocabulary = ["a", "b", "c", "d", "e", "kill", "you"]
+    for _ in range(200):
+        entries: List[Entry] = []
+        for _ in range(rng.randint(1, 12)):
+            entry = tuple(rng.choice(vocabulary) for _ in range(rng.randint(1, 4)))
+            entries.append((entry, " ".join(entry)))
+        matcher = make_matcher(entries)
+        for _ in range(10):
+            lemmas = [rng.choice(vocabulary) for _ in range(rng.randint(0, 40))]
+            assert count(matcher, lemmas) == brute_force(entries, lemmas)
+        # Entries added after counting started count too
+        entries.append((("e", "e"), "e e"))
+        matcher.add(("e", "e"), "e e")
+        lemmas = [rng.choice(vocabulary) for _ in range(40)]
+        assert count(matcher, lemmas) == brute_force(entries, lemmas)
+
+
+def test_lemmatized_text() -> None:
+    lemmatizer = Lemmatizer()
+    matcher = PhraseMatcher()
+    for entry in ("kill you", "kill"):
+        lemmas = lemmatizer.lemmas(lemmatizer.nlp(entry))
+        matcher.add(lemmas, " ".join(lemmas))
+
+    def count_text(text: str) -> Counter[str]:
+        return count(matcher, lemmatizer.lemmas(lemmatizer.nlp(text)))
+
+    assert count_text("I'll KILL you, kill you!") == {"kill you": 2, "kill": 2}
+    assert count_text("What a skill your kid has, skillyou") == {}
+    assert count_text("kills you") == {"kill you": 1, "kill": 1}
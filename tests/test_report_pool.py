@@ -0,0 +1,110 @@
+"""Running reports in a pool of worker processes"""
+
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+import pytest
+
+from pognlp.model.corpus import RedditCorpus
+from pognlp.model.lexicon import Lexicon
+import pognlp.model.report as report_module
+from pognlp.model.report import PartialResult, Report
+from pognlp.phrase_matcher import PhraseMatcher
+from pognlp.run_state import RunState
+import pognlp.util as util
+
+LEXICON_NAMES = ["VADER Default Lexicon", "joy", "toxic"]
+
+# Long enough to start the workers, short of hanging the tests forever
+TIMEOUT = 120
+
+
+def run(report: Report, **kwargs: Any) -> Dict[str, Any]:
+    """Run a report and get its results, frequencies and documents"""
+    report.run(**kwargs)
+    with open(report.frequency_path, encoding="utf-8") as frequency_file:
+        frequencies = frequency_file.read()
+    state = RunState.load(report.directory)
+    assert state is not None
+    return {
+        "results": report.get_results(),
+        "frequencies": frequencies,
+        "documents": state.documents.tolist(),
+    }
+
+
+@pytest.mark.parametrize("use_cache", [False, True])
+def test_pool_matches_one_process(
+    report_corpus: RedditCorpus, monkeypatch: pytest.MonkeyPatch, use_cache: bool
+) -> None:
+    # Many small chunks, so that workers finish them out of order
+    monkeypatch.setattr(report_module, "CHUNK_SIZE", 25)
+    expected = run(
+        Report("one", report_corpus.name, LEXICON_NAMES), use_cache=use_cache
+    )
+    pooled = run(
+        Report("pool", report_corpus.name, LEXICON_NAMES),
+        use_cache=use_cache,
+        processes=3,
+    )
+    assert pooled["results"].equals(expected["results"])
+    assert pooled["frequencies"] == expected["frequencies"]
+    assert pooled["documents"] == expected["documents"]
+    if use_cache:
+        # The workers' results were cached
+        assert os.listdir(report_corpus.cache_directory)
+        cached = run(Report("cached", report_corpus.name, LEXICON_NAMES), processes=3)
+        assert cached["results"].equals(expected["results"])
+
+
+def drain(results: Iterable[PartialResult]) -> Optional[BaseException]:
+    """Consume results in a thread, failing if that takes more than TIMEOUT
+    seconds. Returns the exception raised, if any."""
+    raised: List[BaseException] = []
+
+    def target() -> None:
+        try:
+            for _ in results:
+                pass
+        except Exception as error:  # pylint: disable=broad-except
+            raised.append(error)
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(TIMEOUT)
+    assert not thread.is_alive(), "The pool hung."
+    return raised[0] if raised else None
+
+
+def analyzer_args(backend: str = "vader") -> Any:
+    return (
+        {"joy": Lexicon.load("joy")},
+        RedditCorpus.document_metadata_fields,
+        PhraseMatcher(),
+        False,
+        backend,
+        "rule",
+        None,
+    )
+
+
+def test_worker_exception(
+    report_corpus: RedditCorpus, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(report_module, "CHUNK_SIZE", 50)
+    report = Report("report", report_corpus.name, LEXICON_NAMES)
+    documents = list(report_corpus.iterate_documents())
+    # A document the workers can't analyze, a few chunks in
+    del documents[175]["body"]
+    reporter = util.ProgressReporter(lambda _: None, total=len(documents))
+    error = drain(report.run_in_pool(documents, 2, 64, analyzer_args(), reporter))
+    assert isinstance(error, KeyError)
+
+
+def test_worker_initializer_exception(report_corpus: RedditCorpus) -> None:
+    report = Report("report", report_corpus.name, LEXICON_NAMES)
+    documents = list(report_corpus.iterate_documents())
+    reporter = util.ProgressReporter(lambda _: None, total=len(documents))
+    error = drain(report.run_in_pool(documents, 2, 64, analyzer_args("nope"), reporter))
+    assert isinstance(error, ValueError) and "backend" in str(error)
@@ -0,0 +1,98 @@
+"""Caching loaded report results in memory"""
+
+import os
+from typing import Any, Callable, List
+
+import pandas as pd
+import pytest
+
+from pognlp.model.corpus import RedditCorpus
+from pognlp.model.lexicon import Lexicon
+import pognlp.model.report as report_module
+from pognlp.model.report import Report
+from pognlp.results_cache import ResultsCache
+
+
+def make_loader(loads: List[str], name: str, rows: int = 100) -> Callable[[], Any]:
+    def load() -> pd.DataFrame:
+        loads.append(name)
+        return pd.DataFrame({"value": range(rows)})
+
+    return load
+
+
+def test_tokens() -> None:
+    cache = ResultsCache()
+    loads: List[str] = []
+    first = cache.get("report", "key", 1, make_loader(loads, "first"))
+    # Callers may assign columns to what they get
+    first["other"] = 0
+    again = cache.get("report", "key", 1, make_loader(loads, "again"))
+    assert loads == ["first"]
+    assert list(again.columns) == ["value"]
+
+    cache.get("report", "key", 2, make_loader(loads, "new token"))
+    cache.get("report", "other key", 2, make_loader(loads, "other key"))
+    cache.get("other report", "key", 2, make_loader(loads, "other report"))
+    assert loads == ["first", "new token", "other key", "other report"]
+    # Replaced, not kept alongside
+    assert len(cache.entries) == 3
+
+    cache.discard("report")
+    assert list(cache.entries) == [("other report", "key")]
+    assert cache.size == sum(entry.size for entry in cache.entries.values())
+
+
+def test_eviction() -> None:
+    size = int(pd.DataFrame({"value": range(100)}).memory_usage(deep=True).sum())
+    cache = ResultsCache(memory_budget=2 * size)
+    loads: List[str] = []
+    for key in ("a", "b", "a", "c", "a", "b"):
+        cache.get("report", key, 0, make_loader(loads, key))
+    # "b" was the least recently used when "c" came in, and then "c"
+    assert loads == ["a", "b", "c", "b"]
+    assert set(cache.entries) == {("report", "a"), ("report", "b")}
+    assert cache.size == 2 * size
+
+    # Too big to cache at all, and evicts nothing
+    cache.get("report", "big", 0, make_loader(loads, "big", rows=1000))
+    cache.get("report", "big", 0, make_loader(loads, "big", rows=1000))
+    assert loads[-2:] == ["big", "big"]
+    assert len(cache.entries) == 2
+
+
+@pytest.fixture
+def cache(monkeypatch: pytest.MonkeyPatch) -> ResultsCache:
+    cache = ResultsCache()
+    monkeypatch.setattr(report_module, "results_cache", cache)
+    return cache
+
+
+def test_report_invalidation(report_corpus: RedditCorpus, cache: ResultsCache) -> None:
+    report = Report("report", report_corpus.name, ["joy", "toxic"])
+    report.run()
+    frequencies = report.get_frequencies()
+    results = report.get_results(["joy compound"])
+    assert report.get_frequencies().equals(frequencies)
+    assert report.get_results(["joy compound"]).equals(results)
+    assert len(cache.entries) == 2
+
+    # A new run changes the results
+    Lexicon("joy", [("good", -2), ("happy", 1)])
+    report.run()
+    assert not report.get_frequencies().equals(frequencies)
+    assert not report.get_results(["joy compound"]).equals(results)
+    pd.testing.assert_frame_equal(
+        report.get_results(["joy compound"]),
+        report.get_results()[["joy compound"]],
+    )
+
+    # So does rewriting the file, e.g. by a run in another process
+    frequencies = report.get_frequencies()
+    edited = frequencies.iloc[:1]
+    edited.to_csv(report.frequency_path, sep="\t", index=False)
+    os.utime(report.frequency_path, ns=(0, 0))
+    pd.testing.assert_frame_equal(report.get_frequencies(), edited)
+
+    report.delete()
+    assert not cache.entries
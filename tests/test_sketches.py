@@ -0,0 +1,78 @@
+"""Sketches don't depend on whether rows were just scored or read back"""
+
+import random
+from typing import Any, Dict, List
+
+import numpy as np
+
+from pognlp.results_table import ResultsTable, ResultsWriter
+from pognlp.sketches import ARRAY_NAMES, Sketches
+
+LEXICON_NAMES = ["joy", "toxic"]
+
+COLUMNS = {
+    f"{name} {score}": "float32"
+    for name in LEXICON_NAMES
+    for score in ("positive", "neutral", "negative", "compound")
+}
+
+
+def make_rows(count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Rows of scores rounded like VADER's"""
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(count):
+        row = {}
+        for name in LEXICON_NAMES:
+            pos, neg = rng.random() / 2, rng.random() / 2
+            row[f"{name} positive"] = round(pos, 3)
+            row[f"{name} neutral"] = round(1 - pos - neg, 3)
+            row[f"{name} negative"] = round(neg, 3)
+            row[f"{name} compound"] = round(rng.uniform(-1, 1), 4)
+        rows.append(row)
+    return rows
+
+
+def write(directory: str, rows: List[Dict[str, Any]]) -> Sketches:
+    """Write rows to a results table, sketching them on the way"""
+    sketches = Sketches(LEXICON_NAMES)
+    with ResultsWriter(directory, COLUMNS, on_flush=(sketches.add_block,)) as writer:
+        for row in rows:
+            writer.append(row)
+    return sketches
+
+
+def assert_equal(sketches: Sketches, expected: Sketches) -> None:
+    for name in ARRAY_NAMES:
+        np.testing.assert_array_equal(getattr(sketches, name), getattr(expected, name))
+    for score, histograms in expected.histograms.items():
+        np.testing.assert_array_equal(sketches.histograms[score], histograms)
+
+
+def test_reused_rows(tmp_path: Any) -> None:
+    rows = make_rows(10000)
+    scored = write(str(tmp_path / "scored"), rows)
+    # Like an incremental run, which copies rows over from the last results
+    table = ResultsTable(str(tmp_path / "scored"))
+    reused = write(str(tmp_path / "reused"), table.take(range(len(rows))))
+
+    assert_equal(reused, scored)
+    assert_equal(Sketches.from_table(table), scored)
+    assert reused.summary().equals(scored.summary())
+
+
+def test_bin_edges() -> None:
+    sketches = Sketches(["joy"])
+    sketches.add_block(
+        {
+            "joy positive": np.array([0.352, 0.999], dtype=np.float32),
+            "joy neutral": np.array([0.599, 0.0], dtype=np.float32),
+            "joy negative": np.array([0.049, 0.001], dtype=np.float32),
+            "joy compound": np.array([-0.0001, 0.0001], dtype=np.float32),
+        }
+    )
+    counts = sketches.histograms["pos"][0]
+    assert counts[352] == 1 and counts[999] == 1
+    assert sketches.histograms["neu"][0][599] == 1
+    assert sketches.histograms["compound"][0][999] == 1
+    assert sketches.histograms["compound"][0][1000] == 1
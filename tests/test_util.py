@@ -0,0 +1,97 @@
+"""Progress reporting"""
+
+from typing import List
+
+import pytest
+
+from pognlp.util import Progress, ProgressReporter
+
+
+class FakeClock:
+    """A clock that only moves when told to"""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_throttling() -> None:
+    clock = FakeClock()
+    reports: List[Progress] = []
+    reporter = ProgressReporter(reports.append, total=1000, interval=0.5, clock=clock)
+
+    # Reported at 0%, then not again until 1%...
+    for done in range(10):
+        reporter.update(done)
+    assert [report.done for report in reports] == [0]
+    reporter.update(10)
+    assert [report.done for report in reports] == [0, 10]
+
+    # ...or until the interval has passed
+    clock.now += 0.4
+    reporter.update(11)
+    clock.now += 0.1
+    reporter.update(12)
+    reporter.advance()
+    assert [report.done for report in reports] == [0, 10, 12]
+
+    # The end is always reported, even if nothing changed
+    reporter.finish()
+    reporter.finish()
+    assert [report.done for report in reports] == [0, 10, 12, 13, 13]
+
+
+def test_unknown_total() -> None:
+    clock = FakeClock()
+    reports: List[Progress] = []
+    reporter = ProgressReporter(reports.append, unit="bytes", clock=clock)
+    # With no percentage to change, only the interval triggers reports
+    reporter.update(5)
+    clock.now += 0.1
+    reporter.advance(5)
+    assert not reports
+    clock.now += 1
+    reporter.advance(5)
+    reporter.advance(5)
+    assert [report.done for report in reports] == [15]
+    assert reports[-1].percent is None and reports[-1].eta is None
+    assert reports[-1].describe() == "15 bytes, 14 bytes/s, 0:00:01 elapsed"
+
+
+def test_rate_and_eta() -> None:
+    clock = FakeClock()
+    reports: List[Progress] = []
+    # Resuming a task that was 200 units in
+    reporter = ProgressReporter(reports.append, total=1000, initial=200, clock=clock)
+    clock.now += 10
+    reporter.update(450)
+    progress = reports[-1]
+    assert progress.elapsed == 10
+    # The 200 units done before don't count towards the rate
+    assert progress.rate == 25
+    assert progress.eta == 22
+    assert progress.percent == 45
+    assert progress.describe() == (
+        "450 docs (45%), 25 docs/s, 0:00:10 elapsed, 0:00:22 left"
+    )
+
+    clock.now += 20
+    reporter.update(1000)
+    assert reports[-1].eta == 0 and reports[-1].percent == 100
+
+
+@pytest.mark.parametrize(
+    "progress, percent, eta",
+    [
+        # No time has passed, so there's no rate to go by
+        (Progress(0, 100, 0.0, 0.0), 0, None),
+        # More done than expected, e.g. documents added while running
+        (Progress(120, 100, 2.0, 60.0), 100, 0.0),
+        (Progress(0, 0, 1.0, 0.0), 0, None),
+    ],
+)
+def test_progress_edge_cases(progress: Progress, percent: int, eta: float) -> None:
+    assert progress.percent == percent
+    assert progress.eta == eta